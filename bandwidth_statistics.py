@@ -1,3 +1,7 @@
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from scheduler import PeriodicScheduler
+from streaming_stats import SlidingWindows, WindowStatistics, DEFAULT_WINDOWS
 
 
 class BandwidthStatistics:
@@ -9,4 +13,120 @@ class BandwidthStatistics:
         self.average_network_use = avg_use
         self.total_use = total_use
         self.total_duration = total_duration
+        # how well the checks followed their schedule
+        self.missed_checks = 0
+        self.average_check_jitter: float = 0
+        self.max_check_jitter: float = 0
+        # statistics of the speed over the last minutes, one per sliding window
+        self.windows: List[WindowStatistics] = []
+
+    def set_scheduling(self, scheduler: PeriodicScheduler):
+        """
+        :param scheduler: the scheduler of the checks the statistics come from
+        """
+        self.missed_checks = scheduler.missed_ticks
+        self.average_check_jitter = scheduler.average_jitter()
+        self.max_check_jitter = scheduler.max_jitter
+
+
+class BandwidthStatisticsAccumulator:
+    """
+    Keeps the few samples get_bandwidth_stats needs (the first one and the two latest ones) so the lifetime
+    statistics stay exact even when the history they come from doesn't keep every sample.
+    The samples must be added in chronological order.
+    """
+
+    def __init__(self, windows: Optional[List[float]] = None):
+        """
+        :param windows: the durations in seconds of the sliding windows over which the speed statistics are
+            computed, DEFAULT_WINDOWS if None
+        """
+        self.first: Optional[Tuple[int, float]] = None
+        self.previous: Optional[Tuple[int, float]] = None
+        self.last: Optional[Tuple[int, float]] = None
+        self.windows = SlidingWindows([])
+        self.set_windows(DEFAULT_WINDOWS if windows is None else windows)
+
+    def set_windows(self, windows: List[float]):
+        """
+        Changes the sliding windows over which the speed statistics are computed, the new windows start empty
+        """
+        self.windows = SlidingWindows(windows)
+
+    def add(self, timestamp: int, total_use: float):
+        """
+        :param timestamp: the time of the sample in seconds
+        :param total_use: the total network use in Kbits since the start of the monitoring
+        """
+        if self.first is None:
+            self.first = (timestamp, total_use)
+        self.previous = self.last
+        self.last = (timestamp, total_use)
+        if self.previous is not None and timestamp > self.previous[0]:
+            speed = (total_use - self.previous[1]) / (timestamp - self.previous[0])
+            self.windows.add(timestamp, speed)
+
+    def get_statistics(self, expected_duration_between_checks: float) -> BandwidthStatistics:
+        """
+        :param expected_duration_between_checks: the time expected between two checks, used to estimate the speed
+            when there is only one sample
+        :return: the statistics of all the samples added so far, the same as get_bandwidth_stats would return
+        """
+        first_time, _ = self.first
+        last_time, total = self.last
+        if self.previous is not None:
+            previous_time, previous_total = self.previous
+            current_use = total - previous_total
+            current_speed = current_use / (last_time - previous_time)
+            avg = total / (last_time - first_time)
+        else:
+            current_use = total
+            current_speed = current_use / expected_duration_between_checks
+            avg = current_speed
+        stats = BandwidthStatistics(current_use, last_time, current_speed, avg, last_time - first_time, total)
+        stats.windows = self.windows.get_statistics()
+        return stats
+
+
+class CumulativeCounter:
+    """
+    Turns the successive readings of a network counter into a use that only goes up, even when the counter is reset
+    (reboot, interface removed and created again) or wraps around: in that case the counter is considered to have
+    restarted from 0, so only the use between the restart and the reading is counted.
+    """
+
+    def __init__(self, initial_value: Optional[float] = None):
+        """
+        :param initial_value: the reading from which the use is counted, if None the use is counted from the first
+            reading given to update
+        """
+        self.previous = initial_value
+        self.total: float = 0
+
+    def update(self, value: float) -> float:
+        """
+        :param value: the new reading of the counter
+        :return: the total use since the initial reading
+        """
+        if self.previous is not None:
+            self.total += value - self.previous if value >= self.previous else value
+        self.previous = value
+        return self.total
+
+
+def stitch_resets(samples: Iterable[Tuple[float, Union[int, float]]]) -> Iterator[Tuple[float, float]]:
+    """
+    Makes the total use of a bandwidth history go up only, in a single pass: files written by several runs of the
+    program (or before the counters were reset) contain several segments each starting again from 0, each segment
+    is shifted by the total reached at the end of the previous ones
 
+    :param samples: the (timestamp, total use) samples of a history, in chronological order
+    :return: the samples with a total use that never decreases
+    """
+    offset: float = 0
+    previous: Optional[float] = None
+    for timestamp, total_use in samples:
+        if previous is not None and total_use < previous:
+            offset += previous
+        previous = total_use
+        yield timestamp, total_use + offset
@@ -0,0 +1,108 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from array import array
+from datetime import datetime
+from typing import Callable, Tuple
+
+from connection_statistics import ConnectionStatisticsAccumulator
+from history_store import CsvHistoryWriter, InvalidRowsCounter, read_history
+from vectorized_stats import numpy, get_disconnection_stats_array
+
+# Measures how long the statistics of big internet histories take to compute with each implementation, on
+# generated histories with a check every 10 seconds and about 1% of failed checks, and how fast csv files are read.
+
+
+def generate_history(nb_samples: int, seed: int = 0) -> Tuple[array, array]:
+    """
+    :return: the timestamps and the pings of a generated history
+    """
+    generator = random.Random(seed)
+    timestamps = array("d", range(1_700_000_000, 1_700_000_000 + 10 * nb_samples, 10))
+    pings = array("q", [-1 if generator.random() < 0.01 else generator.randint(10, 80) for _ in range(nb_samples)])
+    return timestamps, pings
+
+
+def measure(function: Callable, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def run_accumulator(timestamps: array, pings: array):
+    accumulator = ConnectionStatisticsAccumulator([])
+    for sample in zip(timestamps, pings):
+        accumulator.add(*sample)
+    accumulator.get_statistics()
+
+
+def write_csv(path: str, timestamps: array, pings: array, saving_as_datetime: bool):
+    writer = CsvHistoryWriter(path, saving_as_datetime, flush_every_sample=False)
+    for timestamp, ping in zip(timestamps, pings):
+        writer.append(timestamp, ping)
+    writer.close()
+
+
+def run_csv_reader(path: str):
+    invalid_rows = InvalidRowsCounter()
+    for _ in read_history(path, invalid_rows):
+        pass
+
+
+def run_strptime_reader(path: str):
+    # what reading a datetime file would cost by parsing the datetimes with strptime
+    with open(path, "r") as f:
+        for line in f:
+            time_field, value = line.split(",")
+            datetime.strptime(time_field, "%Y-%m-%d %H:%M:%S").timestamp(), int(value)
+
+
+def run_batch(history: list):
+    # imported here since utils needs psutil, which the other implementations don't
+    from utils import get_disconnection_stats
+    get_disconnection_stats(history, 10)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compares the time taken to compute the statistics of an internet "
+                                                 "history by the pure python implementations and by the numpy one.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10 ** 6, 10 ** 7],
+                        help="The numbers of samples of the histories to generate.")
+    parser.add_argument("--csv-rows", type=int, default=10 ** 6,
+                        help="The number of rows of the csv files whose reading speed is measured, 0 to skip it.")
+    args = parser.parse_args()
+
+    if numpy is None:
+        print("numpy is not installed, only the pure python implementations are measured")
+
+    # the speedups are relative to get_disconnection_stats, the implementation used before the others existed
+    print(f"{'samples':>10} {'implementation':<28} {'time':>9} {'speedup':>8}")
+    for size in args.sizes:
+        timestamps, pings = generate_history(size)
+        history = list(zip(timestamps, pings))
+        reference = measure(run_batch, history)
+        # get_disconnection_stats needs the history as a list of tuples, which takes a lot of memory
+        del history
+        print(f"{size:>10} {'get_disconnection_stats':<28} {reference:>8.3f}s {1:>7.1f}x")
+        duration = measure(run_accumulator, timestamps, pings)
+        print(f"{size:>10} {'accumulator (pure python)':<28} {duration:>8.3f}s {reference / duration:>7.1f}x")
+        if numpy is not None:
+            duration = measure(get_disconnection_stats_array, numpy.frombuffer(timestamps, dtype=numpy.float64),
+                               numpy.frombuffer(pings, dtype=numpy.int64))
+            print(f"{size:>10} {'numpy':<28} {duration:>8.3f}s {reference / duration:>7.1f}x")
+
+    if args.csv_rows > 0:
+        timestamps, pings = generate_history(args.csv_rows)
+        print(f"\n{'rows':>10} {'csv reader':<28} {'time':>9} {'rows/s':>10}")
+        with tempfile.TemporaryDirectory() as directory:
+            for name, saving_as_datetime, reader in [("timestamps", False, run_csv_reader),
+                                                     ("datetimes", True, run_csv_reader),
+                                                     ("datetimes (strptime)", True, run_strptime_reader)]:
+                path = os.path.join(directory, f"{saving_as_datetime}.csv")
+                if not os.path.exists(path):
+                    write_csv(path, timestamps, pings, saving_as_datetime)
+                duration = measure(reader, path)
+                print(f"{args.csv_rows:>10} {name:<28} {duration:>8.3f}s {args.csv_rows / duration:>10.0f}")
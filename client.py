@@ -1,3 +1,5 @@
+from typing import Dict, List, Tuple
+
 from bandwidth_statistics import BandwidthStatistics
 from connection_statistics import ConnectionStatistics
 
@@ -9,4 +11,20 @@ class Client:
         pass
 
     def update_bandwidth_statistics(self, stats: BandwidthStatistics):
-        pass
\ No newline at end of file
+        pass
+
+    def update_targets_statistics(self, stats: Dict[str, ConnectionStatistics]):
+        pass
+
+    def update_interfaces_statistics(self, stats: Dict[str, BandwidthStatistics]):
+        pass
+
+    def update_internet_history(self, points: List[Tuple[float, float]]):
+        pass
+
+    def update_bandwidth_history(self, points: List[Tuple[float, float]]):
+        pass
+
+    def update_file_loaded(self, file_path: str, nb_rows: int, time_to_first_display: float,
+                           nb_invalid_rows: int = 0):
+        pass
@@ -1,3 +1,9 @@
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from outage_index import OutageIndex
+from scheduler import PeriodicScheduler
+from streaming_stats import LatencyStatistics, LatencyWindows, DEFAULT_WINDOWS
+
 
 class ConnectionStatistics:
 
@@ -16,3 +22,146 @@ class ConnectionStatistics:
         self.min_ping = min_ping
         self.max_ping = max_ping
         self.average_ping = average_ping
+        # how well the checks followed their schedule
+        self.missed_checks = 0
+        self.average_check_jitter: float = 0
+        self.max_check_jitter: float = 0
+        # percentiles, jitter and loss of the pings over the whole life of the program and over the last minutes
+        self.latency: Optional[LatencyStatistics] = None
+        self.latency_windows: List[LatencyStatistics] = []
+        # current interarrival jitter as estimated in RFC 3550
+        self.jitter: float = 0
+
+    def set_scheduling(self, scheduler: PeriodicScheduler):
+        """
+        :param scheduler: the scheduler of the checks the statistics come from
+        """
+        self.missed_checks = scheduler.missed_ticks
+        self.average_check_jitter = scheduler.average_jitter()
+        self.max_check_jitter = scheduler.max_jitter
+
+
+class ConnectionStatisticsAccumulator:
+    """
+    Keeps running totals over a history of pings so that the statistics can be updated in constant time each time a
+    new sample is added, instead of iterating over the whole history like get_disconnection_stats does.
+    The samples must be added in chronological order and the statistics produced are the same as the ones
+    get_disconnection_stats would return on the same history.
+    """
+
+    def __init__(self, windows: Optional[List[float]] = None):
+        """
+        :param windows: the durations in seconds of the sliding windows over which the latency statistics are
+            computed, DEFAULT_WINDOWS if None
+        """
+        self.nb_samples = 0
+        self.first_time = 0
+        self.last_time = 0
+        self.last_ping = -1
+
+        # disconnection periods, including the one we are currently in
+        self.outages = OutageIndex()
+
+        # duration of the latest state, computed the same way as in get_disconnection_stats
+        self.connected = False
+        self.latest_duration: float = 0
+        self.previous_time = 0
+
+        self.min_ping = -1
+        self.max_ping = -1
+        self.total_ping = 0
+        self.nb_pings = 0
+
+        self.latency = LatencyWindows([])
+        self.set_windows(DEFAULT_WINDOWS if windows is None else windows)
+
+    def set_windows(self, windows: List[float]):
+        """
+        Changes the sliding windows over which the latency statistics are computed, all the statistics of the
+        latency start again from scratch
+        """
+        self.latency = LatencyWindows(windows)
+
+    def add(self, timestamp: int, ping: int):
+        """
+        Updates the statistics with a new sample
+
+        :param timestamp: the time of the check in seconds, must be greater or equal to the previous ones
+        :param ping: the time it took to establish the connection, negative if it was not possible to connect
+        """
+        if self.nb_samples == 0:
+            self.first_time = timestamp
+            # we set the initial value at the opposite of the first, so it starts by "resetting"
+            self.connected = ping < 0
+
+        self.outages.add(timestamp, ping)
+
+        # duration of the latest state
+        if self.connected and ping < 0 or not self.connected and ping > 0:
+            self.latest_duration = 0
+            self.connected = ping > 0
+        else:
+            self.latest_duration += timestamp - self.previous_time
+        self.previous_time = timestamp
+
+        # pings
+        if ping > 0:
+            self.max_ping = max(self.max_ping, ping)
+            self.min_ping = min(self.min_ping, ping) if self.nb_pings > 0 else ping
+            self.total_ping += ping
+            self.nb_pings += 1
+
+        self.latency.add(timestamp, ping)
+
+        self.nb_samples += 1
+        self.last_time = timestamp
+        self.last_ping = ping
+
+    def get_statistics(self) -> ConnectionStatistics:
+        """
+        :return: the statistics of all the samples added so far
+        """
+        # the disconnection we are in is not over, so like in get_disconnection_stats the index estimates its
+        # duration with the last sample we got
+        nb_disconnection = self.outages.count()
+        start_longest, longest = self.outages.longest() or (0, 0)
+        average_time: float = self.outages.total_duration() / nb_disconnection if nb_disconnection > 0 else 0
+
+        average_disconnection_per_hour: float = 0
+        total_history_duration: float = (self.last_time - self.first_time) / 3600
+        if total_history_duration > 0:
+            average_disconnection_per_hour = nb_disconnection / total_history_duration
+
+        average_ping = self.total_ping / self.nb_pings if self.nb_pings else 0
+
+        stats = ConnectionStatistics(self.last_ping, self.last_time if self.nb_samples else -1,
+                                     int(self.latest_duration), longest, start_longest, average_time,
+                                     nb_disconnection, average_disconnection_per_hour, self.min_ping, self.max_ping,
+                                     average_ping)
+        stats.latency, stats.latency_windows = self.latency.get_statistics()
+        stats.jitter = self.latency.jitter
+        return stats
+
+
+def iter_disconnected_periods(samples: Iterable[Tuple[float, int]]) -> Iterator[Tuple[float, float]]:
+    """
+    Finds the disconnection periods of a history in a single pass, the same way get_next_disconnected_period does
+    but without needing the whole history in memory: a period starts at the first failed check and ends at the next
+    successful one, or at the last check of the history if there's none
+
+    :param samples: the (timestamp, ping) pairs of the history, in chronological order, a negative ping meaning the
+        check failed
+    :return: an iterator over the start and end timestamps of the disconnection periods
+    """
+    start: Optional[float] = None
+    last_time: Optional[float] = None
+    for timestamp, ping in samples:
+        if ping < 0:
+            if start is None:
+                start = timestamp
+        elif start is not None:
+            yield start, timestamp
+            start = None
+        last_time = timestamp
+    if start is not None:
+        yield start, last_time
@@ -1,23 +1,68 @@
 import asyncio
+import os
+import signal
+import sys
+import time
 from asyncio import AbstractEventLoop
 from datetime import datetime
 import curses
-from typing import Optional
+from typing import Optional, List, Dict, Union
 
 from bandwidth_statistics import BandwidthStatistics
 from client import Client
 from connection_statistics import ConnectionStatistics
-from utils import duration_to_str, kbits_to_str, ping_to_str
+from rollups import Rollups
+from streaming_stats import LatencyStatistics
+from utils import duration_to_str, kbits_to_str, ping_to_str, window_to_str, internet_rollups, bandwidth_rollups
+
+SPARKLINE_CHARACTERS = " ▁▂▃▄▅▆▇█"
+# used when the terminal can't display the characters above
+ASCII_SPARKLINE_CHARACTERS = " .:-=+*#@"
+
+
+def sparkline(rollups: Rollups, width: int, characters: str = SPARKLINE_CHARACTERS) -> str:
+    """
+    Draws the whole history of the rollups on one line of text, each character representing the highest value
+    over an equal part of the time range
+
+    :param rollups: the rollups of the history to draw
+    :param width: the number of characters of the line
+    :param characters: the characters used to draw, from the lowest value to the highest
+    :return: the line of text
+    """
+    time_range = rollups.time_range()
+    if time_range is None or width <= 0 or time_range[1] <= time_range[0]:
+        return ""
+    start, end = time_range
+    columns = [0.] * width
+    for timestamp, value in rollups.get_points(start, end, (end - start) / width):
+        column = min(width - 1, max(0, int((timestamp - start) / (end - start) * width)))
+        columns[column] = max(columns[column], value)
+    highest = max(columns)
+    if highest <= 0:
+        return characters[0] * width
+    return "".join(characters[round(value / highest * (len(characters) - 1))] for value in columns)
 
 
 class ConsoleClient(Client):
 
+    # the maximum number of times per second the screen is updated
+    MAX_REFRESH_RATE = 4
+
     def __init__(self, connection: bool, bandwidth: bool, loop: AbstractEventLoop):
 
         self.current_connection_statistics: Optional[ConnectionStatistics] = None
         self.current_bandwidth_statistics: Optional[BandwidthStatistics] = None
+        self.current_targets_statistics: Dict[str, ConnectionStatistics] = {}
+        self.current_interfaces_statistics: Dict[str, BandwidthStatistics] = {}
         self.loop = loop
-        self.line_cursor = 0
+        self.loaded_files: List[str] = []
+        # the lines being written and the lines currently displayed on the terminal
+        self.lines: List[str] = []
+        self.displayed_lines: List[str] = []
+        self.update_scheduled = False
+        self.last_update: float = 0
+        self.whole_screen = None
 
         if connection or bandwidth:
             self.whole_screen = curses.initscr()
@@ -27,27 +72,110 @@ class ConsoleClient(Client):
             self.start_user_input_thread()
 
     def start_user_input_thread(self):
-
-        self.loop.create_task(self.user_input_thread())
+        self.whole_screen.nodelay(True)
+        try:
+            # the keys are read as soon as stdin has something to read, so the program is completely asleep between
+            # two checks instead of waking up regularly to poll the keyboard
+            self.loop.add_reader(sys.stdin.fileno(), self.read_user_input)
+        except (NotImplementedError, OSError, ValueError):
+            # the event loops of windows (and some kinds of stdin) can't watch stdin, so we poll it instead
+            self.loop.create_task(self.user_input_thread())
+            return
+        if hasattr(signal, "SIGWINCH"):
+            # curses only notices that the terminal was resized when reading a key, which doesn't happen anymore
+            # while no key is pressed
+            self.loop.add_signal_handler(signal.SIGWINCH, self.terminal_resized)
 
     async def user_input_thread(self):
-        # sets negative timeout so getch becomes blocking
-        self.whole_screen.timeout(-1)
-        self.whole_screen.nodelay(True)
+        while True:
+            self.read_user_input()
+            await asyncio.sleep(0.5)
+
+    def read_user_input(self):
         while True:
             h = self.whole_screen.getch()
+            if h == -1:
+                return
             if h == ord('q'):
                 self.closing()
-            await asyncio.sleep(0.5)
+                return
+            elif h == curses.KEY_RESIZE:
+                self.redraw()
+
+    def terminal_resized(self):
+        columns, rows = os.get_terminal_size(sys.stdout.fileno())
+        curses.resizeterm(rows, columns)
+        self.redraw()
+
+    def redraw(self):
+        # everything has to be redrawn
+        self.displayed_lines = []
+        self.whole_screen.clear()
+        self.request_update()
 
     def write_line(self, string: str):
-        self.whole_screen.addstr(self.line_cursor, 0, string)
-        self.whole_screen.clrtoeol() # overwrite the old stuff
-        self.line_cursor += 1
+        self.lines.append(string)
+
+    def draw_lines(self):
+        """
+        Only rewrites the lines of the terminal that changed since the last update, the terminal is then updated
+        with a single write
+        """
+        rows, columns = self.whole_screen.getmaxyx()
+        # we can't write in the last column of the last line without moving the cursor out of the screen, so lines
+        # are cut one character before the end
+        lines = [line[:columns - 1] for line in self.lines[:rows]]
+        for index in range(max(len(lines), len(self.displayed_lines))):
+            line = lines[index] if index < len(lines) else ""
+            if index < len(self.displayed_lines) and self.displayed_lines[index] == line:
+                continue
+            self.whole_screen.move(index, 0)
+            self.whole_screen.clrtoeol() # overwrite the old stuff
+            if line:
+                self.whole_screen.addstr(index, 0, line)
+        self.displayed_lines = lines
+        self.whole_screen.noutrefresh()
+        curses.doupdate()
+
+    def request_update(self):
+        """
+        Updates the screen, at most MAX_REFRESH_RATE times per second: all the updates requested in the meantime
+        are drawn at once
+        """
+        if self.update_scheduled or self.whole_screen is None:
+            return
+        self.update_scheduled = True
+        delay = self.last_update + 1 / self.MAX_REFRESH_RATE - time.monotonic()
+        self.loop.call_later(max(0., delay), self.update_screen)
+
+    def write_sparkline(self, title: str, rollups: Rollups):
+        _, columns = self.whole_screen.getmaxyx()
+        try:
+            SPARKLINE_CHARACTERS.encode(self.whole_screen.encoding)
+            characters = SPARKLINE_CHARACTERS
+        except UnicodeEncodeError:
+            characters = ASCII_SPARKLINE_CHARACTERS
+        self.write_line(title + sparkline(rollups, columns - len(title) - 1, characters))
+
+    def write_latency(self, title: str, latency: Optional[LatencyStatistics]):
+        if latency is None:
+            return
+        self.write_line(f"{title}: "
+                        f"median ping {ping_to_str(latency.p50)} "
+                        f"95th percentile {ping_to_str(latency.p95)} "
+                        f"99th percentile {ping_to_str(latency.p99)} "
+                        f"jitter {latency.jitter:.1f}ms "
+                        f"loss {latency.loss_ratio * 100:.2f}%")
+
+    def write_scheduling(self, stats: Union[ConnectionStatistics, BandwidthStatistics]):
+        self.write_line(f"Missed checks: {stats.missed_checks} "
+                        f"Average check delay: {stats.average_check_jitter * 1000:.1f}ms "
+                        f"Highest check delay: {stats.max_check_jitter * 1000:.1f}ms")
 
     def update_screen(self):
-        self.whole_screen.clear()
-        self.line_cursor = 0
+        self.update_scheduled = False
+        self.last_update = time.monotonic()
+        self.lines = []
         if self.current_connection_statistics:
             self.write_line(f"Current state: "
                             f"{'connected' if self.current_connection_statistics.currently_connected else 'not connected'} "
@@ -61,6 +189,24 @@ class ConsoleClient(Client):
             self.write_line(f"Lowest ping: {ping_to_str(self.current_connection_statistics.min_ping)}")
             self.write_line(f"Highest ping: {ping_to_str(self.current_connection_statistics.max_ping)}")
             self.write_line(f"Average ping: {ping_to_str(self.current_connection_statistics.average_ping)}")
+            self.write_line(f"Current jitter: {self.current_connection_statistics.jitter:.1f}ms")
+            self.write_latency("Since the start", self.current_connection_statistics.latency)
+            for window in self.current_connection_statistics.latency_windows:
+                self.write_latency(f"Last {window_to_str(window.duration)}", window)
+            self.write_scheduling(self.current_connection_statistics)
+            self.write_sparkline("Ping history: ", internet_rollups)
+            self.write_line("")
+
+        for target, stats in self.current_targets_statistics.items():
+            self.write_line(f"{target}: {'connected' if stats.currently_connected else 'not connected'} "
+                            f"for {duration_to_str(stats.current_duration)} "
+                            f"Ping: {ping_to_str(stats.current_ping)} "
+                            f"Disconnections: {stats.nb_disconnection} "
+                            f"Longest: {duration_to_str(stats.longest_duration)} "
+                            f"Average ping: {ping_to_str(stats.average_ping)} "
+                            f"95th percentile: {ping_to_str(stats.latency.p95) if stats.latency else '-'} "
+                            f"Loss: {stats.latency.loss_ratio * 100 if stats.latency else 0:.2f}%")
+        if self.current_targets_statistics:
             self.write_line("")
 
         if self.current_bandwidth_statistics:
@@ -69,21 +215,62 @@ class ConsoleClient(Client):
             self.write_line(f"Average network use: {kbits_to_str(self.current_bandwidth_statistics.average_network_use)}/second")
             self.write_line(f"Total network use: {kbits_to_str(self.current_bandwidth_statistics.total_use)}")
             self.write_line(f"Total monitoring duration: {duration_to_str(self.current_bandwidth_statistics.total_duration)}")
+            for window in self.current_bandwidth_statistics.windows:
+                self.write_line(f"Last {window_to_str(window.duration)}: "
+                                f"peak {kbits_to_str(window.peak)}/second "
+                                f"median {kbits_to_str(window.p50)}/second "
+                                f"95th percentile {kbits_to_str(window.p95)}/second "
+                                f"moving average {kbits_to_str(window.ewma)}/second")
+            self.write_scheduling(self.current_bandwidth_statistics)
+            self.write_sparkline("Speed history: ", bandwidth_rollups)
+            self.write_line("")
+
+        for interface, stats in self.current_interfaces_statistics.items():
+            self.write_line(f"{interface}: {kbits_to_str(stats.current_network_speed)}/second "
+                            f"Average: {kbits_to_str(stats.average_network_use)}/second "
+                            f"Total: {kbits_to_str(stats.total_use)}")
+        if self.current_interfaces_statistics:
+            self.write_line("")
+
+        for loaded_file in self.loaded_files:
+            self.write_line(loaded_file)
+        if self.loaded_files:
             self.write_line("")
 
         self.write_line("To exit, press 'q'")
 
-        self.whole_screen.refresh()
+        self.draw_lines()
 
     def update_internet_statistics(self, stats: ConnectionStatistics):
         self.current_connection_statistics = stats
-        self.update_screen()
+        self.request_update()
 
     def update_bandwidth_statistics(self, stats: BandwidthStatistics):
         self.current_bandwidth_statistics = stats
-        self.update_screen()
+        self.request_update()
+
+    def update_targets_statistics(self, stats: Dict[str, ConnectionStatistics]):
+        self.current_targets_statistics = stats
+        self.request_update()
+
+    def update_interfaces_statistics(self, stats: Dict[str, BandwidthStatistics]):
+        self.current_interfaces_statistics = stats
+        self.request_update()
+
+    def update_file_loaded(self, file_path: str, nb_rows: int, time_to_first_display: float,
+                           nb_invalid_rows: int = 0):
+        skipped = f" ({nb_invalid_rows} invalid rows skipped)" if nb_invalid_rows else ""
+        self.loaded_files.append(f"Loaded {nb_rows} rows from {file_path}{skipped}, "
+                                 f"first display after {time_to_first_display:.2f}s")
+        self.request_update()
 
     def closing(self):
+        try:
+            self.loop.remove_reader(sys.stdin.fileno())
+            if hasattr(signal, "SIGWINCH"):
+                self.loop.remove_signal_handler(signal.SIGWINCH)
+        except (NotImplementedError, OSError, ValueError):
+            pass
         curses.nocbreak()
         curses.echo()
         curses.endwin()
@@ -0,0 +1,143 @@
+from bisect import bisect_left
+from typing import List, Sequence, Tuple
+
+# Functions reducing the number of points of a series before drawing it, while keeping its visual aspect:
+# there's no point in drawing more points than the number of pixels available.
+
+
+def lttb(points: Sequence[Tuple[float, float]], threshold: int) -> List[Tuple[float, float]]:
+    """
+    Downsamples the points with the Largest-Triangle-Three-Buckets algorithm: the points are split in threshold
+    buckets and from each bucket we keep the point forming the largest triangle with the point kept in the previous
+    bucket and the average of the next bucket, which keeps the peaks of the series
+
+    :param points: the points to downsample, ordered by x
+    :param threshold: the number of points wanted
+    :return: at most threshold points taken from the points given, the first and last are always kept
+    """
+    nb_points = len(points)
+    if threshold >= nb_points or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (nb_points - 2) / (threshold - 2)
+    selected = 0
+    for i in range(threshold - 2):
+        # average point of the next bucket
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, nb_points)
+        average_x = 0.
+        average_y = 0.
+        for x, y in points[next_start:next_end]:
+            average_x += x
+            average_y += y
+        average_x /= next_end - next_start
+        average_y /= next_end - next_start
+
+        selected_x, selected_y = points[selected]
+        largest_area = -1.
+        for j in range(int(i * bucket_size) + 1, next_start):
+            x, y = points[j]
+            # twice the area of the triangle, we only compare them
+            area = abs((selected_x - average_x) * (y - selected_y) - (selected_x - x) * (average_y - selected_y))
+            if area > largest_area:
+                largest_area = area
+                next_selected = j
+        sampled.append(points[next_selected])
+        selected = next_selected
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def min_max(points: Sequence[Tuple[float, float]], start: float, end: float, nb_buckets: int) \
+        -> List[Tuple[float, float]]:
+    """
+    Downsamples the points by splitting the time range in nb_buckets buckets of equal duration (typically one per
+    pixel) and keeping only the lowest and highest points of each bucket, so no spike is lost
+
+    :param points: the points to downsample, ordered by x
+    :param start: the start of the time range represented
+    :param end: the end of the time range represented
+    :param nb_buckets: the number of buckets
+    :return: at most 2 * nb_buckets points taken from the points given, ordered by x
+    """
+    if len(points) <= 2 * nb_buckets or end <= start or nb_buckets <= 0:
+        return list(points)
+
+    sampled = []
+    bucket = -1
+    lowest = highest = None
+    for point in points:
+        current = min(nb_buckets - 1, max(0, int((point[0] - start) / (end - start) * nb_buckets)))
+        if current != bucket:
+            if lowest is not None:
+                sampled += sorted({lowest, highest})
+            bucket = current
+            lowest = highest = point
+        elif point[1] < lowest[1]:
+            lowest = point
+        elif point[1] > highest[1]:
+            highest = point
+    sampled += sorted({lowest, highest})
+    return sampled
+
+
+class IncrementalDecimation:
+    """
+    The decimated points of a series whose time range grows at its end as samples arrive. The time range is split in
+    buckets of a fixed duration: the points of the buckets that are complete are decimated once and kept, only the
+    points after them are decimated again at each rendering. When the time range has grown so much that there are
+    too many buckets for the pixels, a new decimation of the whole range is needed (see is_valid_for).
+    """
+
+    # number of complete buckets decimated together, lttb keeps the first and last points of each group
+    GROUP_BUCKETS = 16
+
+    def __init__(self, start: float, end: float, nb_buckets: int, use_lttb: bool):
+        """
+        :param start: the start of the time range represented
+        :param end: the end of the time range represented when the decimation is created
+        :param nb_buckets: the number of buckets of the time range, typically one per pixel
+        :param use_lttb: whether the points are downsampled with lttb, with min_max otherwise
+        """
+        self.start = start
+        self.end = end
+        self.nb_buckets = nb_buckets
+        self.bucket_duration = (end - start) / nb_buckets
+        self.use_lttb = use_lttb
+        # the decimated points of the complete buckets, and the time where the next bucket starts
+        self.kept: List[Tuple[float, float]] = []
+        self.kept_end = start
+
+    def is_valid_for(self, start: float, end: float, nb_buckets: int) -> bool:
+        """
+        :return: True if the decimation can be continued for this time range, False if the range was zoomed or
+            resized, or grew too much since the decimation was created
+        """
+        return (start == self.start and nb_buckets == self.nb_buckets and self.end <= end
+                and end - start <= 2 * (self.end - self.start))
+
+    def decimate(self, points: Sequence[Tuple[float, float]], start: float, end: float) -> List[Tuple[float, float]]:
+        if self.bucket_duration <= 0:
+            return list(points)
+        nb_buckets = max(1, round((end - start) / self.bucket_duration))
+        if self.use_lttb:
+            return lttb(points, nb_buckets)
+        return min_max(points, start, end, nb_buckets)
+
+    def points(self, tail: Sequence[Tuple[float, float]], end: float) -> List[Tuple[float, float]]:
+        """
+        :param tail: the points of the series from kept_end to end (both included), ordered by x
+        :param end: the end of the time range represented
+        :return: the decimated points of the series from the start of the time range to end
+        """
+        # the buckets before the one of the last point are complete, they're kept once there are enough of them
+        nb_complete = int((end - self.kept_end) / self.bucket_duration) if self.bucket_duration > 0 else 0
+        if nb_complete >= self.GROUP_BUCKETS:
+            complete_end = self.kept_end + nb_complete * self.bucket_duration
+            nb_complete_points = bisect_left(tail, (complete_end, -float("inf")))
+            self.kept += self.decimate(tail[:nb_complete_points], self.kept_end, complete_end)
+            self.kept_end = complete_end
+            tail = tail[nb_complete_points:]
+        return self.kept + self.decimate(tail, self.kept_end, end)
@@ -0,0 +1,359 @@
+import argparse
+import gzip
+import mmap
+import struct
+from datetime import datetime
+from typing import Callable, Iterator, Tuple, Optional, Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Binary history files start with a small header (a magic number telling what kind of data is stored followed by
+# the version of the format), then contain fixed size records appended one after the other, so they can be
+# memory-mapped and read without any parsing
+HEADER = struct.Struct("<4sI")
+# version 1 stored the timestamps as integers, version 2 stores them as floats to keep the sub-second precision
+FORMAT_VERSION = 2
+
+INTERNET_MAGIC = b"HTNI"
+BANDWIDTH_MAGIC = b"HTNB"
+
+# the records of each kind of file for each version of the format:
+# timestamp in seconds and ping in ms for internet files, timestamp in seconds and cumulative use in Kbits for
+# bandwidth files
+RECORDS = {
+    (INTERNET_MAGIC, 1): struct.Struct("<qi"),
+    (BANDWIDTH_MAGIC, 1): struct.Struct("<qd"),
+    (INTERNET_MAGIC, 2): struct.Struct("<di"),
+    (BANDWIDTH_MAGIC, 2): struct.Struct("<dd"),
+}
+
+# numpy equivalents of the records, used to get views on the memory-mapped files
+DTYPES = {
+    (INTERNET_MAGIC, 1): [("timestamp", "<i8"), ("ping", "<i4")],
+    (BANDWIDTH_MAGIC, 1): [("timestamp", "<i8"), ("use", "<f8")],
+    (INTERNET_MAGIC, 2): [("timestamp", "<f8"), ("ping", "<i4")],
+    (BANDWIDTH_MAGIC, 2): [("timestamp", "<f8"), ("use", "<f8")],
+}
+
+FILE_FORMATS = ["csv", "binary"]
+
+# the first bytes of a gzip file, the closed segments of rotated files can be compressed with gzip
+GZIP_MAGIC = b"\x1f\x8b"
+# the size of the chunks read at once from a compressed binary file
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def is_compressed(path: str) -> bool:
+    """
+    :return: True if the history file is compressed with gzip
+    """
+    with open(path, "rb") as f:
+        return f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+
+def open_history_file(path: str, mode: str = "rb"):
+    """
+    Opens a history file for reading, decompressing it on the fly if it's compressed
+
+    :param mode: "rb" or "rt"
+    """
+    if is_compressed(path):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def get_binary_format(path: str) -> Optional[Tuple[bytes, int]]:
+    """
+    :param path: the path of a history file, compressed or not
+    :return: the magic number and the version of the file if it's a binary history file, None otherwise (csv file)
+    """
+    with open_history_file(path) as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    magic, version = HEADER.unpack(header)
+    if magic not in [INTERNET_MAGIC, BANDWIDTH_MAGIC]:
+        return None
+    if (magic, version) not in RECORDS:
+        raise ValueError(f"Unsupported version {version} of the binary history format in {path}")
+    return magic, version
+
+
+def get_binary_kind(path: str) -> Optional[bytes]:
+    """
+    :param path: the path of a history file
+    :return: the magic number of the file if it's a binary history file, None otherwise (csv file)
+    """
+    binary_format = get_binary_format(path)
+    return binary_format[0] if binary_format else None
+
+
+def timestamp_to_str(timestamp: float) -> str:
+    """
+    :return: the timestamp written with at most a millisecond precision, and without decimals if it's an integer
+    """
+    return f"{timestamp:.3f}".rstrip("0").rstrip(".")
+
+
+def parse_time(value: str) -> float:
+    """
+    :param value: a timestamp or a datetime in ISO format
+    :return: the timestamp of the time given
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is neither a timestamp nor a datetime")
+
+
+class CsvHistoryWriter:
+    """
+    Appends samples to a csv file, one line per sample composed of the time (timestamp or datetime) and the value
+    """
+
+    def __init__(self, path: str, saving_as_datetime: bool, flush_every_sample: bool = True):
+        self.file = open(path, "a")
+        self.saving_as_datetime = saving_as_datetime
+        self.flush_every_sample = flush_every_sample
+
+    def append(self, timestamp: float, value: Union[int, float]):
+        time = datetime.fromtimestamp(timestamp) if self.saving_as_datetime else timestamp_to_str(timestamp)
+        self.file.write(f"{time},{round(value)}\n")
+        if self.flush_every_sample:
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class BinaryHistoryWriter:
+    """
+    Appends samples to a binary history file as fixed size records
+    """
+
+    def __init__(self, path: str, magic: bytes, flush_every_sample: bool = True):
+        self.flush_every_sample = flush_every_sample
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(magic, FORMAT_VERSION))
+            version = FORMAT_VERSION
+        else:
+            binary_format = get_binary_format(path)
+            if binary_format is None or binary_format[0] != magic:
+                self.file.close()
+                raise ValueError(f"{path} is not a binary history file of the same kind")
+            # we keep appending in the version of the file
+            version = binary_format[1]
+        self.record = RECORDS[(magic, version)]
+
+    def append(self, timestamp: float, value: Union[int, float]):
+        if self.record.format[1] == "q":
+            timestamp = round(timestamp)
+        self.file.write(self.record.pack(timestamp, value))
+        if self.flush_every_sample:
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def open_history_writer(path: str, magic: bytes, file_format: str, saving_as_datetime: bool,
+                        flush_every_sample: bool = True) -> Union[CsvHistoryWriter, BinaryHistoryWriter]:
+    """
+    :param path: the path of the file to append to
+    :param magic: the kind of data saved (INTERNET_MAGIC or BANDWIDTH_MAGIC)
+    :param file_format: one of FILE_FORMATS
+    :param saving_as_datetime: for csv files, whether the time is saved as a datetime instead of a timestamp
+    :param flush_every_sample: whether the file is flushed after each sample so it's always up to date on disk
+    :return: a writer with an append(timestamp, value) method
+    """
+    if file_format == "binary":
+        return BinaryHistoryWriter(path, magic, flush_every_sample)
+    return CsvHistoryWriter(path, saving_as_datetime, flush_every_sample)
+
+
+class BinaryHistoryReader:
+    """
+    Memory-maps a binary history file so its records can be accessed without copying nor parsing the file.
+    The views returned by the reader are only valid until it's closed.
+    """
+
+    def __init__(self, path: str):
+        binary_format = get_binary_format(path)
+        if binary_format is None:
+            raise ValueError(f"{path} is not a binary history file")
+        if is_compressed(path):
+            raise ValueError(f"{path} is compressed and can't be memory-mapped")
+        self.magic, self.version = binary_format
+        self.record = RECORDS[binary_format]
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        # an incomplete last record (if the program was killed while writing it) is ignored
+        self.nb_records = (len(self.map) - HEADER.size) // self.record.size
+
+    def __len__(self) -> int:
+        return self.nb_records
+
+    def __iter__(self) -> Iterator[Tuple[float, Union[int, float]]]:
+        view = memoryview(self.map)[HEADER.size:HEADER.size + self.nb_records * self.record.size]
+        try:
+            yield from self.record.iter_unpack(view)
+        finally:
+            view.release()
+
+    def as_array(self):
+        """
+        :return: a numpy structured array viewing the records of the file, its columns are "timestamp" and "ping"
+            or "use" depending on the kind of file
+        """
+        if numpy is None:
+            raise RuntimeError("numpy is required to get an array view of a binary history file")
+        return numpy.frombuffer(self.map, dtype=numpy.dtype(DTYPES[(self.magic, self.version)]), count=self.nb_records,
+                                offset=HEADER.size)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class InvalidRowsCounter:
+    """
+    Counts the rows skipped while reading csv files, to be given as on_invalid_row to the readers
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, path: str, row_number: int, line: str):
+        self.count += 1
+
+
+class CsvHistoryReader:
+    """
+    Reads a csv history file line by line, whether its time is saved as timestamps or as datetimes (both can be
+    mixed in a file appended by several runs). The rows that can't be parsed are skipped and counted, including a
+    last line without end of line, cut when the program was killed while writing it.
+    """
+
+    def __init__(self, path: str, on_invalid_row: Optional[Callable[[str, int, str], None]] = None,
+                 round_values: bool = False):
+        """
+        :param path: the path of the file to read, compressed or not
+        :param on_invalid_row: called with the path, the number and the content of every row skipped
+        :param round_values: whether the values with decimals are rounded, for the histories whose values are
+            integers (the pings of internet files)
+        """
+        self.path = path
+        self.on_invalid_row = on_invalid_row
+        self.round_values = round_values
+        self.nb_invalid = 0
+
+    def invalid_row(self, row_number: int, line: str):
+        self.nb_invalid += 1
+        if self.on_invalid_row is not None:
+            self.on_invalid_row(self.path, row_number, line.rstrip("\n"))
+
+    def __iter__(self) -> Iterator[Tuple[float, Union[int, float]]]:
+        # datetimes are written with str(datetime), which fromisoformat parses in C much faster than strptime
+        parse_datetime = datetime.fromisoformat
+        with open_history_file(self.path, "rt") as f:
+            for row_number, line in enumerate(f, 1):
+                try:
+                    time, value = line.split(",")
+                    # a datetime starts with the year followed by a dash, a timestamp has more than 4 digits
+                    timestamp = parse_datetime(time).timestamp() if time[4:5] == "-" else float(time)
+                    try:
+                        number = int(value)
+                    except ValueError:
+                        # the values may have decimals if the file was edited by another program
+                        number = round(float(value)) if self.round_values else float(value)
+                except ValueError:
+                    # empty lines aren't worth reporting
+                    if line.strip():
+                        self.invalid_row(row_number, line)
+                    continue
+                if line[-1] != "\n":
+                    self.invalid_row(row_number, line)
+                    continue
+                yield timestamp, number
+
+
+def read_history(path: str, on_invalid_row: Optional[Callable[[str, int, str], None]] = None,
+                 round_values: bool = False) -> Iterator[Tuple[float, Union[int, float]]]:
+    """
+    Reads a history file, in csv or binary format and compressed or not, one sample at a time. The rows of a csv file
+    that can't be parsed are skipped.
+
+    :param path: the path of the file to read
+    :param on_invalid_row: called with the path, the number and the content of every csv row skipped
+    :param round_values: whether the values with decimals of a csv file are rounded (see CsvHistoryReader)
+    :return: an iterator over the pairs of timestamp and value stored in the file
+    """
+    binary_format = get_binary_format(path)
+    if binary_format is not None and is_compressed(path):
+        yield from read_compressed_binary_history(path, RECORDS[binary_format])
+    elif binary_format is not None:
+        with BinaryHistoryReader(path) as reader:
+            yield from reader
+    else:
+        yield from CsvHistoryReader(path, on_invalid_row, round_values)
+
+
+def read_compressed_binary_history(path: str, record: struct.Struct) \
+        -> Iterator[Tuple[float, Union[int, float]]]:
+    """
+    Reads a compressed binary history file by chunks of records, since it can't be memory-mapped
+    """
+    chunk_size = READ_CHUNK_SIZE - READ_CHUNK_SIZE % record.size
+    with gzip.open(path, "rb") as f:
+        f.read(HEADER.size)
+        while True:
+            chunk = f.read(chunk_size)
+            # an incomplete last record is ignored, like in the uncompressed files
+            complete = len(chunk) - len(chunk) % record.size
+            yield from record.iter_unpack(memoryview(chunk)[:complete])
+            if len(chunk) < chunk_size:
+                break
+
+
+def convert_history(source: str, destination: str, magic: Optional[bytes] = None, saving_as_datetime: bool = False) \
+        -> int:
+    """
+    Converts a csv history file into a binary one or a binary history file into a csv one, depending on the format
+    of the source file. The converted data is appended to the destination file.
+
+    :param source: the path of the file to convert
+    :param destination: the path of the converted file
+    :param magic: the kind of data stored in the source if it is a csv file (INTERNET_MAGIC or BANDWIDTH_MAGIC)
+    :param saving_as_datetime: when converting to csv, whether the time is saved as a datetime instead of a timestamp
+    :return: the number of samples converted
+    """
+    source_kind = get_binary_kind(source)
+    if source_kind is None:
+        if magic is None:
+            raise ValueError("The kind of data stored in a csv file must be given to convert it")
+        writer = open_history_writer(destination, magic, "binary", False, False)
+    else:
+        writer = open_history_writer(destination, source_kind, "csv", saving_as_datetime, False)
+    nb_samples = 0
+    try:
+        # the pings of the binary internet files are integers
+        for timestamp, value in read_history(source, round_values=source_kind is None and magic == INTERNET_MAGIC):
+            writer.append(timestamp, value)
+            nb_samples += 1
+    finally:
+        writer.close()
+    return nb_samples
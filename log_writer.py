@@ -0,0 +1,183 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple, Union
+
+from history_store import open_history_writer
+from segments import SegmentSummary, summarize_file, append_to_index, compress_segment
+
+# the format of the suffix of the segments of each rotation period, which is also the key telling when it changes
+PERIOD_FORMATS = {"day": "%Y-%m-%d", "hour": "%Y-%m-%d_%H"}
+
+# every writer opened, so they can all be committed and synced when the program stops, with the outage indexes
+# being saved (see OutageIndex.save_to)
+open_writers: list = []
+
+
+class GroupCommit:
+    """
+    Saves samples in groups instead of one at a time: the samples are kept in memory and written at once when
+    commit_records samples are waiting or commit_interval seconds after the first of them arrived, whichever comes
+    first. The samples waiting are lost if the program is killed, so commit_interval is the maximum duration of data
+    that can be lost. Subclasses implement write to save a group.
+    """
+
+    def __init__(self, commit_records: int = 100, commit_interval: float = 60):
+        """
+        :param commit_records: the number of samples waiting that triggers a commit, 1 to write every sample
+            right away
+        :param commit_interval: the maximum time in seconds a sample waits before being written, 0 for no limit
+        """
+        self.commit_records = max(1, commit_records)
+        self.commit_interval = commit_interval
+        self.pending: List[Tuple[float, Union[int, float]]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        open_writers.append(self)
+
+    def append(self, timestamp: float, value: Union[int, float]):
+        self.pending.append((timestamp, value))
+        if len(self.pending) >= self.commit_records:
+            self.commit()
+        elif self.timer is None and self.commit_interval > 0:
+            try:
+                self.timer = asyncio.get_running_loop().call_later(self.commit_interval, self.commit)
+            except RuntimeError:
+                # not called from an event loop, the samples are only written when enough of them are waiting
+                pass
+
+    def commit(self):
+        """
+        Writes all the samples waiting at once
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            self.write(self.pending)
+        self.pending.clear()
+
+    def write(self, samples: List[Tuple[float, Union[int, float]]]):
+        raise NotImplementedError
+
+    def close(self):
+        self.commit()
+        if self in open_writers:
+            open_writers.remove(self)
+
+
+class GroupCommitWriter(GroupCommit):
+    """
+    Appends samples to a history file in groups (see GroupCommit), with a single write to the disk for each group.
+    The file can also be rotated: it's renamed with a date as suffix (the day or hour of its data for the periodic
+    rotation, the time of the rotation otherwise) and a new file is started when it gets bigger than max_bytes or
+    when the period changes. Each closed file (segment) is added to the index of the file with its time range and a
+    summary of its values, and can be compressed with gzip.
+    """
+
+    def __init__(self, path: str, magic: bytes, file_format: str, saving_as_datetime: bool,
+                 commit_records: int = 100, commit_interval: float = 60, max_bytes: int = 0,
+                 rotate_period: Optional[str] = None, compress: bool = False):
+        """
+        :param path: the path of the file to append to
+        :param magic: the kind of data saved (INTERNET_MAGIC or BANDWIDTH_MAGIC)
+        :param file_format: one of FILE_FORMATS
+        :param saving_as_datetime: for csv files, whether the time is saved as a datetime instead of a timestamp
+        :param commit_records: the number of samples waiting that triggers a commit, 1 to write every sample
+            right away
+        :param commit_interval: the maximum time in seconds a sample waits before being written, 0 for no limit
+        :param max_bytes: the size in bytes above which the file is rotated, 0 for no limit
+        :param rotate_period: a key of PERIOD_FORMATS to rotate the file when the day or the hour changes, None to
+            only rotate it on its size
+        :param compress: whether the closed segments are compressed with gzip
+        """
+        self.path = path
+        self.magic = magic
+        self.file_format = file_format
+        self.saving_as_datetime = saving_as_datetime
+        self.max_bytes = max_bytes
+        self.rotate_period = rotate_period
+        self.compress = compress
+        self.writer = open_history_writer(path, magic, file_format, saving_as_datetime, flush_every_sample=False)
+        self.rotating = max_bytes > 0 or rotate_period is not None
+        # the summary of the current segment, only needed when the file is rotated, taken from the file if it already
+        # has data
+        self.segment = SegmentSummary(os.path.basename(path))
+        # the period of the data in the file, for the periodic rotation
+        self.current_period: Optional[str] = None
+        if self.rotating and os.path.getsize(path) > 0:
+            self.segment = summarize_file(path)
+            last_time = self.segment.end if self.segment.end is not None else os.path.getmtime(path)
+            self.current_period = self.period_of(last_time)
+        super().__init__(commit_records, commit_interval)
+
+    def period_of(self, timestamp: float) -> Optional[str]:
+        if self.rotate_period is None:
+            return None
+        return datetime.fromtimestamp(timestamp).strftime(PERIOD_FORMATS[self.rotate_period])
+
+    def write(self, samples: List[Tuple[float, Union[int, float]]]):
+        for timestamp, value in samples:
+            if self.rotating:
+                self.rotate_if_needed(timestamp)
+                self.segment.add(timestamp, value)
+            self.writer.append(timestamp, value)
+        self.writer.file.flush()
+
+    def rotate_if_needed(self, timestamp: float):
+        period = self.period_of(timestamp)
+        if self.current_period is None:
+            self.current_period = period
+        too_big = self.max_bytes > 0 and self.writer.file.tell() >= self.max_bytes
+        if too_big or period != self.current_period:
+            self.rotate()
+        self.current_period = period
+
+    def rotate(self):
+        self.sync()
+        self.writer.close()
+        suffix = self.current_period if self.rotate_period else datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        rotated_path = f"{self.path}.{suffix}"
+        index = 1
+        # the compressed segments must not be overwritten either
+        while os.path.exists(rotated_path) or os.path.exists(f"{rotated_path}.gz"):
+            rotated_path = f"{self.path}.{suffix}.{index}"
+            index += 1
+        os.rename(self.path, rotated_path)
+        self.segment.path = os.path.basename(f"{rotated_path}.gz" if self.compress else rotated_path)
+        append_to_index(self.path, self.segment)
+        self.segment = SegmentSummary(os.path.basename(self.path))
+        if self.compress:
+            self.compress_in_background(rotated_path)
+        self.writer = open_history_writer(self.path, self.magic, self.file_format, self.saving_as_datetime,
+                                          flush_every_sample=False)
+
+    @staticmethod
+    def compress_in_background(path: str):
+        """
+        Compresses a closed segment in a thread so the checks aren't delayed, the readers use the uncompressed
+        segment until it's done
+        """
+        try:
+            asyncio.get_running_loop().run_in_executor(None, compress_segment, path)
+        except RuntimeError:
+            compress_segment(path)
+
+    def sync(self):
+        """
+        Makes sure everything written to the file is on the disk
+        """
+        self.writer.file.flush()
+        os.fsync(self.writer.file.fileno())
+
+    def close(self):
+        super().close()
+        self.sync()
+        self.writer.close()
+
+
+def close_all_writers():
+    """
+    Commits the samples waiting in every writer and syncs the files on the disk, called when the program stops
+    """
+    for writer in list(open_writers):
+        writer.close()
@@ -0,0 +1,240 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from bandwidth_statistics import BandwidthStatisticsAccumulator, stitch_resets
+from connection_statistics import ConnectionStatistics, ConnectionStatisticsAccumulator
+from history_store import get_binary_kind, is_compressed, BinaryHistoryReader, InvalidRowsCounter
+from outage_index import get_outages_path
+from rollups import ROLLUP_SUFFIXES
+from segments import index_path, read_index, read_history_range
+from vectorized_stats import numpy, history_to_arrays, get_disconnection_stats_array
+
+# Summarizes many internet and bandwidth files (for example the files of several probes) in parallel, one process
+# per file, with the same statistics as the ones shown when reading a file with -rif or -rbf. When numpy is installed
+# the statistics of the internet files are computed in bulk with it.
+
+INTERNET_COLUMNS = ["probe", "path", "nb_samples", "start", "end", "nb_disconnections", "longest_disconnection",
+                    "start_longest_disconnection", "average_disconnection", "disconnections_per_hour", "min_ping",
+                    "average_ping", "max_ping", "p50_ping", "p95_ping", "p99_ping", "jitter", "loss_ratio", "invalid_rows",
+                    "error"]
+BANDWIDTH_COLUMNS = ["probe", "path", "nb_samples", "start", "end", "duration", "total_use", "average_speed",
+                     "invalid_rows", "error"]
+
+
+def list_files(paths: List[str]) -> List[str]:
+    """
+    :param paths: files or directories, the files of a directory are taken except the rollups, the disconnection
+        periods and the indexes of segments saved next to them. The segments of a rotated file are not listed, they
+        are read with their file (see read_history_range), which is listed even if all its data is in segments.
+    :return: the paths of the files to analyze
+    """
+    rollup_suffixes = tuple(f".{suffix}.csv" for suffix in ROLLUP_SUFFIXES.values()) + (index_path(""),
+                                                                                         get_outages_path(""))
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = set(name for name in os.listdir(path) if os.path.isfile(os.path.join(path, name)))
+            for name in list(names):
+                if name.endswith(index_path("")):
+                    base = name[:-len(index_path(""))]
+                    names.add(base)
+                    for segment in read_index(os.path.join(path, base)):
+                        names.discard(segment.path)
+                        # a segment whose compression didn't finish may still be there uncompressed
+                        if segment.path.endswith(".gz"):
+                            names.discard(segment.path[:-len(".gz")])
+            files += sorted(os.path.join(path, name) for name in names if not name.endswith(rollup_suffixes))
+        else:
+            files.append(path)
+    return files
+
+
+def get_probe_name(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def get_internet_statistics_numpy(path: str, invalid_rows: InvalidRowsCounter) \
+        -> Tuple[int, float, Optional[ConnectionStatistics]]:
+    """
+    Computes the statistics of an internet file and of its segments in bulk with numpy, uncompressed binary files
+    without segments are used directly from their memory-mapped records
+
+    :param invalid_rows: counts the rows of a csv file that are skipped
+    :return: the number of samples of the file, the time of the first one and the statistics of the file
+    """
+    if os.path.exists(path) and not read_index(path) and get_binary_kind(path) is not None \
+            and not is_compressed(path):
+        with BinaryHistoryReader(path) as reader:
+            records = reader.as_array()
+            if len(records) == 0:
+                return 0, 0, None
+            stats = get_disconnection_stats_array(records["timestamp"], records["ping"])
+            start = records["timestamp"][0].item()
+            # the views on the file must be released before it's closed
+            del records
+            return len(reader), start, stats
+    timestamps, pings = history_to_arrays(read_history_range(path, on_invalid_row=invalid_rows))
+    if len(pings) == 0:
+        return 0, 0, None
+    return len(pings), timestamps[0].item(), get_disconnection_stats_array(timestamps, pings)
+
+
+def analyze_internet_file(path: str) -> Dict[str, Union[str, float, None]]:
+    """
+    :param path: the path of a file saved with --internet-file
+    :return: a row of statistics of the file, with an error message instead if it couldn't be read
+    """
+    row: Dict[str, Union[str, float, None]] = {"probe": get_probe_name(path), "path": path}
+    invalid_rows = InvalidRowsCounter()
+    try:
+        if numpy is not None:
+            nb_samples, start, stats = get_internet_statistics_numpy(path, invalid_rows)
+        else:
+            # only the statistics over the whole file are wanted, no sliding window
+            accumulator = ConnectionStatisticsAccumulator([])
+            for timestamp, ping in read_history_range(path, on_invalid_row=invalid_rows):
+                accumulator.add(timestamp, ping)
+            nb_samples = accumulator.nb_samples
+            start = accumulator.first_time
+            stats = accumulator.get_statistics() if nb_samples else None
+    except Exception as e:
+        # the file is reported as not readable instead of stopping the analysis of the other files
+        row["error"] = f"{type(e).__name__}: {e}"
+        return row
+    row["nb_samples"] = nb_samples
+    row["invalid_rows"] = invalid_rows.count
+    if nb_samples == 0:
+        return row
+    row.update({
+        "start": start,
+        "end": stats.current_time,
+        "nb_disconnections": stats.nb_disconnection,
+        "longest_disconnection": stats.longest_duration,
+        "start_longest_disconnection": stats.start_longest,
+        "average_disconnection": stats.average_duration,
+        "disconnections_per_hour": stats.average_nb_disc_hour,
+        "min_ping": stats.min_ping,
+        "average_ping": stats.average_ping,
+        "max_ping": stats.max_ping,
+        "p50_ping": stats.latency.p50,
+        "p95_ping": stats.latency.p95,
+        "p99_ping": stats.latency.p99,
+        "jitter": stats.latency.jitter,
+        "loss_ratio": stats.latency.loss_ratio,
+    })
+    return row
+
+
+def analyze_bandwidth_file(path: str, expected_delay: float) -> Dict[str, Union[str, float, None]]:
+    """
+    :param path: the path of a file saved with --bandwidth-file
+    :param expected_delay: the expected delay between two checks, used when the file contains a single sample
+    :return: a row of statistics of the file, with an error message instead if it couldn't be read
+    """
+    row: Dict[str, Union[str, float, None]] = {"probe": get_probe_name(path), "path": path}
+    accumulator = BandwidthStatisticsAccumulator([])
+    nb_samples = 0
+    invalid_rows = InvalidRowsCounter()
+    try:
+        for timestamp, use in stitch_resets(read_history_range(path, on_invalid_row=invalid_rows)):
+            accumulator.add(timestamp, use)
+            nb_samples += 1
+    except Exception as e:
+        # the file is reported as not readable instead of stopping the analysis of the other files
+        row["error"] = f"{type(e).__name__}: {e}"
+        return row
+    row["nb_samples"] = nb_samples
+    row["invalid_rows"] = invalid_rows.count
+    if nb_samples == 0:
+        return row
+    stats = accumulator.get_statistics(expected_delay)
+    row.update({
+        "start": accumulator.first[0],
+        "end": stats.current_time,
+        "duration": stats.total_duration,
+        "total_use": stats.total_use,
+        "average_speed": stats.average_network_use,
+    })
+    return row
+
+
+def write_rows(output, output_format: str, rows: Dict[str, List[dict]]):
+    """
+    :param output: the file to write to
+    :param output_format: json or csv, in csv each kind of file gets its own table, separated by an empty line
+    :param rows: the rows of statistics of each kind of file
+    """
+    if output_format == "json":
+        json.dump(rows, output, indent=2)
+        output.write("\n")
+        return
+    columns = {"internet": INTERNET_COLUMNS, "bandwidth": BANDWIDTH_COLUMNS}
+    first = True
+    for kind, kind_rows in rows.items():
+        if not first:
+            output.write("\n")
+        first = False
+        writer = csv.DictWriter(output, fieldnames=columns[kind], lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(kind_rows)
+
+
+def analyze(internet_files: List[str], bandwidth_files: List[str], expected_delay: float,
+            workers: Optional[int] = None) -> Dict[str, List[dict]]:
+    """
+    Analyzes the files in parallel, each file is read by one process
+
+    :return: the rows of statistics of the internet files and of the bandwidth files, sorted by probe name
+    """
+    rows = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        internet_rows = executor.map(analyze_internet_file, internet_files)
+        bandwidth_rows = executor.map(analyze_bandwidth_file, bandwidth_files, [expected_delay] * len(bandwidth_files))
+        if internet_files:
+            rows["internet"] = sorted(internet_rows, key=lambda row: row["probe"])
+        if bandwidth_files:
+            rows["bandwidth"] = sorted(bandwidth_rows, key=lambda row: row["probe"])
+    return rows
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Computes the statistics of many internet and bandwidth files in "
+                                                 "parallel and outputs a table comparing them, with one row per "
+                                                 "file. The name of a file (without extension) is used as the name "
+                                                 "of its probe.")
+    parser.add_argument("--internet", nargs="+", default=[],
+                        help="Internet files (saved with --internet-file) or directories containing them.")
+    parser.add_argument("--bandwidth", nargs="+", default=[],
+                        help="Bandwidth files (saved with --bandwidth-file) or directories containing them.")
+    parser.add_argument("--format", default="json", choices=["json", "csv"], help="The format of the output.")
+    parser.add_argument("-o", "--output", type=str, required=False,
+                        help="The file in which the output is written, by default it's printed.")
+    parser.add_argument("--workers", type=int, required=False,
+                        help="The number of processes reading the files, by default the number of cores.")
+    parser.add_argument("-db", "--delay-bandwidth", default=10, type=float,
+                        help="The delay between two checks of the bandwidth files, only used for files containing "
+                             "a single sample.")
+    args = parser.parse_args()
+
+    internet_files = list_files(args.internet)
+    bandwidth_files = list_files(args.bandwidth)
+    if not internet_files and not bandwidth_files:
+        print("You have to give at least one internet or bandwidth file to analyze")
+        exit(-1)
+
+    start = time.perf_counter()
+    rows = analyze(internet_files, bandwidth_files, args.delay_bandwidth, args.workers)
+    if args.output:
+        with open(args.output, "w", newline="") as output:
+            write_rows(output, args.format, rows)
+    else:
+        write_rows(sys.stdout, args.format, rows)
+    print(f"Analyzed {len(internet_files) + len(bandwidth_files)} files in {time.perf_counter() - start:.2f}s",
+          file=sys.stderr)
@@ -16,6 +16,12 @@ if __name__ == "__main__":
         print("You have to pick at least one of those options: internet_real_time, file_internet, "
               "bandwidth_real_time, file_bandwidth, read_internet_file, read_bandwidth_file")
         exit(-1)
+    elif args.database and not args.internet_real_time and not args.internet_file \
+            and not args.bandwidth_real_time and not args.bandwidth_file:
+        # the database only chooses where the checks are saved, it doesn't start them
+        print("You have to pick at least one of those options with database: internet_real_time, file_internet, "
+              "bandwidth_real_time, file_bandwidth")
+        exit(-1)
     else:
 
         try:
@@ -0,0 +1,25 @@
+import argparse
+import time
+
+from history_store import convert_history, INTERNET_MAGIC, BANDWIDTH_MAGIC
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Converts an internet or bandwidth file from the csv format to the "
+                                                 "binary format or from the binary format to the csv format, "
+                                                 "depending on the format of the source file. The converted data "
+                                                 "is appended to the destination file.")
+    parser.add_argument("source", help="The file to convert")
+    parser.add_argument("destination", help="The file in which the converted data is written")
+    parser.add_argument("--bandwidth", action="store_true", help="Use this option when the source is a csv "
+                                                                 "bandwidth file, by default csv files are "
+                                                                 "considered to be internet files.")
+    parser.add_argument("--datetime", action="store_true", help="Use to save the time in the converted csv file "
+                                                                "in the format of a datetime instead of the "
+                                                                "default timestamp.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    nb_samples = convert_history(args.source, args.destination,
+                                 BANDWIDTH_MAGIC if args.bandwidth else INTERNET_MAGIC, args.datetime)
+    print(f"Converted {nb_samples} samples in {time.perf_counter() - start:.2f}s")
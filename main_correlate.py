@@ -0,0 +1,178 @@
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import sys
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from connection_statistics import iter_disconnected_periods
+from main_analyze import list_files, get_probe_name
+from segments import read_history_range
+
+# Compares the disconnections of several probes to tell the outages seen by every probe at the same time (most
+# likely an outage of the internet provider) from the ones seen by a single probe (most likely its Wi-Fi or its own
+# connection). The files are read at the same time and merged on their timestamps, so only the current position in
+# each file is kept in memory whatever their size.
+
+# kinds of events of the merged timeline, at the same time the ends are processed before the starts
+OUTAGE_END = 0
+MONITORING_END = 1
+MONITORING_START = 2
+OUTAGE_START = 3
+
+# name used for the periods during which every monitoring probe was disconnected
+ALL_PROBES = "*"
+
+COLUMNS = ["probe", "start", "end", "duration", "others_down_duration", "all_down_duration", "classification"]
+
+
+class Outage:
+    """
+    A disconnection period of a probe, with how long other probes were disconnected during it
+    """
+
+    def __init__(self, probe: str, start: float):
+        self.probe = probe
+        self.start = start
+        self.end = start
+        # time during which at least one other probe was also disconnected
+        self.others_down_duration: float = 0
+        # time during which every probe monitoring at that moment was disconnected
+        self.all_down_duration: float = 0
+
+    def classification(self) -> str:
+        """
+        :return: global if at some point every probe was disconnected, partial if only some other probes were
+            disconnected during the outage, local if no other probe was
+        """
+        if self.probe == ALL_PROBES or self.all_down_duration > 0:
+            return "global"
+        if self.others_down_duration > 0:
+            return "partial"
+        return "local"
+
+    def to_dict(self) -> dict:
+        return {"probe": self.probe, "start": self.start, "end": self.end, "duration": self.end - self.start,
+                "others_down_duration": self.others_down_duration, "all_down_duration": self.all_down_duration,
+                "classification": self.classification()}
+
+
+def probe_events(path: str, probe: int) -> Iterator[Tuple[float, int, int]]:
+    """
+    :param path: the path of an internet file, read with its segments
+    :param probe: the index of the probe the file comes from
+    :return: the events of the file in chronological order: (time, kind of event, probe)
+    """
+    samples = read_history_range(path)
+    first = next(samples, None)
+    if first is None:
+        return
+    yield first[0], MONITORING_START, probe
+    last = first[0]
+
+    def follow_samples():
+        # keeps the time of the latest sample read, for the end of the monitoring
+        nonlocal last
+        for sample in itertools.chain([first], samples):
+            last = sample[0]
+            yield sample
+
+    for start, end in iter_disconnected_periods(follow_samples()):
+        yield start, OUTAGE_START, probe
+        yield end, OUTAGE_END, probe
+    yield last, MONITORING_END, probe
+
+
+def correlate_outages(paths: List[str], names: Optional[List[str]] = None) -> Iterator[Outage]:
+    """
+    Merges the timelines of several internet files and follows which probes are disconnected at each moment
+
+    :param paths: the internet files of the probes
+    :param names: the names of the probes, by default the names of the files
+    :return: the outages of each probe, plus the periods during which every monitoring probe was disconnected (with
+        ALL_PROBES as probe), each one given as soon as it's over
+    """
+    names = names if names else [get_probe_name(path) for path in paths]
+    # the outage each probe is in, if any
+    outages: List[Optional[Outage]] = [None] * len(paths)
+    monitoring = set()
+    down = set()
+    all_down: Optional[Outage] = None
+    previous_time: Optional[float] = None
+
+    for timestamp, kind, probe in heapq.merge(*[probe_events(path, i) for i, path in enumerate(paths)]):
+        # the state hasn't changed since the previous event, we add its duration to the outages in progress
+        if previous_time is not None and timestamp > previous_time and len(down) > 1:
+            duration = timestamp - previous_time
+            everyone = down == monitoring
+            for i in down:
+                outages[i].others_down_duration += duration
+                if everyone:
+                    outages[i].all_down_duration += duration
+        previous_time = timestamp
+
+        if kind == OUTAGE_START:
+            outages[probe] = Outage(names[probe], timestamp)
+            down.add(probe)
+        elif kind == OUTAGE_END:
+            outage = outages[probe]
+            outage.end = timestamp
+            outages[probe] = None
+            down.discard(probe)
+            yield outage
+        elif kind == MONITORING_START:
+            monitoring.add(probe)
+        else:
+            monitoring.discard(probe)
+
+        # periods where every probe is disconnected, only when there's more than one probe to compare
+        everyone_down = len(monitoring) > 1 and down == monitoring
+        if everyone_down and all_down is None:
+            all_down = Outage(ALL_PROBES, timestamp)
+        elif not everyone_down and all_down is not None:
+            all_down.end = timestamp
+            all_down.others_down_duration = all_down.all_down_duration = timestamp - all_down.start
+            # several events at the same time can make everyone look disconnected for no time at all
+            if all_down.end > all_down.start:
+                yield all_down
+            all_down = None
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compares the disconnections recorded in the internet files of "
+                                                 "several probes, and classifies each one as global (every probe "
+                                                 "was disconnected at the same time), partial (some other probes "
+                                                 "were disconnected) or local (only this probe was). The periods "
+                                                 "during which every probe was disconnected are also listed, with * "
+                                                 "as probe. The files are read together, without loading them in "
+                                                 "memory.")
+    parser.add_argument("files", nargs="+", help="Internet files (saved with --internet-file) or directories "
+                                                 "containing them, the name of a file is used as name of its probe.")
+    parser.add_argument("--format", default="csv", choices=["csv", "json"],
+                        help="The format of the output, json writes one object per line.")
+    parser.add_argument("-o", "--output", type=str, required=False,
+                        help="The file in which the output is written, by default it's printed.")
+    args = parser.parse_args()
+
+    files = list_files(args.files)
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = csv.DictWriter(output, fieldnames=COLUMNS, lineterminator="\n")
+    if args.format == "csv":
+        writer.writeheader()
+
+    start = time.perf_counter()
+    counts = {"global": 0, "partial": 0, "local": 0}
+    for outage in correlate_outages(files):
+        if outage.probe != ALL_PROBES:
+            counts[outage.classification()] += 1
+        if args.format == "csv":
+            writer.writerow(outage.to_dict())
+        else:
+            output.write(json.dumps(outage.to_dict()) + "\n")
+    if args.output:
+        output.close()
+    print(f"Compared {len(files)} files in {time.perf_counter() - start:.2f}s: {counts['global']} global, "
+          f"{counts['partial']} partial and {counts['local']} local outages", file=sys.stderr)
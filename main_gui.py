@@ -1,4 +1,5 @@
 import asyncio
+import signal
 import sys
 import threading
 from typing import Optional
@@ -22,13 +23,27 @@ if __name__ == "__main__":
         print("You have to pick at least one of those options: internet_real_time, file_internet, "
               "bandwidth_real_time, file_bandwidth, read_internet_file, read_bandwidth_file")
         exit(-1)
+    elif args.database and not args.internet_real_time and not args.internet_file \
+            and not args.bandwidth_real_time and not args.bandwidth_file:
+        # the database only chooses where the checks are saved, it doesn't start them
+        print("You have to pick at least one of those options with database: internet_real_time, file_internet, "
+              "bandwidth_real_time, file_bandwidth")
+        exit(-1)
     else:
-        thread = threading.Thread(target=main_loop, args=(widget, args, asyncio.get_event_loop()))
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=main_loop, args=(widget, args, loop), daemon=True)
         thread.start()
 
+    # the application is quit on SIGTERM and SIGINT so the loop below is stopped and writes the samples waiting in
+    # memory, the handler runs as soon as Qt gives the hand back to python (at the next refresh of the widget)
+    signal.signal(signal.SIGTERM, lambda *_: app.quit())
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
     widget.show()
     ret = app.exec()
 
-    asyncio.get_event_loop().stop()
+    if thread:
+        # the loop runs in another thread, so it must be asked to stop from its own thread
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
     sys.exit(ret)
 
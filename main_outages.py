@@ -0,0 +1,80 @@
+import argparse
+import csv
+import os
+import sys
+from datetime import datetime
+
+from history_store import parse_time
+from outage_index import OutageIndex, get_outages_path
+from segments import read_history_range
+from sqlite_store import is_database, load_outages
+
+# Lists the disconnection periods of an internet file or database, or counts them per hour. The periods saved next to
+# the file (or in the database) while the program ran are used when they exist, so the pings don't have to be read
+# again.
+
+COLUMNS = ["start", "end", "duration", "nb_failed_checks"]
+HISTOGRAM_COLUMNS = ["hour", "nb_disconnections", "total_duration"]
+
+
+def load_index(path: str, scan: bool = False) -> OutageIndex:
+    """
+    :param path: an internet file saved with --internet-file or a database saved with --database
+    :param scan: whether the periods are found again from the pings even if they were saved
+    :return: the index of the disconnection periods of the file
+    """
+    if is_database(path):
+        return load_outages(path)
+    if not scan and os.path.exists(get_outages_path(path)):
+        return OutageIndex.load(get_outages_path(path))
+    index = OutageIndex()
+    for timestamp, ping in read_history_range(path):
+        index.add(timestamp, ping)
+    # the period in progress at the end of the file ends with its last check, like in the statistics
+    current = index.current()
+    if current is not None:
+        index.add_outage(current[0], current[1], current[3])
+    return index
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Lists the disconnection periods of an internet file (saved with "
+                                                 "--internet-file) or of a database (saved with --database), or counts "
+                                                 "them per hour.")
+    parser.add_argument("path", help="The internet file or the database.")
+    parser.add_argument("--from", dest="time_from", type=parse_time, required=False,
+                        help="Only the disconnections starting from this time, a timestamp or a datetime.")
+    parser.add_argument("--to", dest="time_to", type=parse_time, required=False,
+                        help="Only the disconnections starting before this time, a timestamp or a datetime.")
+    parser.add_argument("--min-duration", default=0, type=float,
+                        help="Only the disconnections lasting at least this number of seconds.")
+    parser.add_argument("--per-hour", action="store_true",
+                        help="Output the number and the total duration of the disconnections of each hour instead.")
+    parser.add_argument("--scan", action="store_true",
+                        help="Find the disconnections from the pings of the file even if they were saved next to "
+                             "it, for files saved by older versions.")
+    args = parser.parse_args()
+
+    index = load_index(args.path, args.scan)
+    writer = csv.writer(sys.stdout, lineterminator="\n")
+    if args.per_hour:
+        if len(index) == 0:
+            sys.exit(0)
+        start = args.time_from if args.time_from is not None else index.starts[0]
+        end = args.time_to if args.time_to is not None else index.starts[-1] + 1
+        writer.writerow(HISTOGRAM_COLUMNS)
+        for hour, nb_disconnections, total_duration in index.per_bucket(start, end):
+            writer.writerow([datetime.fromtimestamp(hour), nb_disconnections, total_duration])
+    else:
+        writer.writerow(COLUMNS)
+        for outage_start, outage_end, duration, nb_samples in index.between(args.time_from, args.time_to,
+                                                                            args.min_duration):
+            writer.writerow([datetime.fromtimestamp(outage_start), datetime.fromtimestamp(outage_end), duration,
+                             nb_samples])
+    nb_disconnections, total_duration = index.summary_between(args.time_from, args.time_to)
+    longest = index.longest()
+    print(f"{nb_disconnections} disconnections for {total_duration:.0f}s in total"
+          + (f", the longest of the whole history lasted {longest[1]:.0f}s from {datetime.fromtimestamp(longest[0])}"
+             if longest else ""),
+          file=sys.stderr)
@@ -0,0 +1,202 @@
+from array import array
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+from log_writer import open_writers
+
+# The disconnection periods of an internet history, kept as they happen so the questions about them (the longest
+# one, the ones of a time range, how many per hour) are answered with binary searches on their starts instead of
+# scanning every ping again.
+
+
+def get_outages_path(raw_path: str) -> str:
+    """
+    :param raw_path: the path of an internet file
+    :return: the path of the file in which its disconnection periods are saved
+    """
+    return f"{raw_path}.outages.csv"
+
+
+class OutageIndex:
+    """
+    The disconnection periods of a history in chronological order. A period starts at the first failed check and
+    ends at the next successful one, like iter_disconnected_periods finds them. The periods that are over are stored
+    in columns sorted by start, with the running total of their durations so the total over any range of periods is
+    a difference of two totals.
+    """
+
+    def __init__(self):
+        self.starts = array("d")
+        self.ends = array("d")
+        self.nb_samples = array("q")
+        # total duration of the periods before each period, plus the total of all of them at the end
+        self.cumulative_durations = array("d", [0])
+        # index of the longest period over, the first one if several have the same duration
+        self.longest_index: Optional[int] = None
+        # the period in progress: its start and its number of failed checks
+        self.current_start: Optional[float] = None
+        self.current_samples = 0
+        self.last_time: Optional[float] = None
+        self.saving_file = None
+
+    def save_to(self, saving_path: str):
+        """
+        From now on, the periods are appended to this file as soon as they're over, and the one in progress is
+        appended when the index is closed, like close_all_writers does when the program stops
+        """
+        self.saving_file = open(saving_path, "a")
+        open_writers.append(self)
+
+    @staticmethod
+    def load(path: str) -> "OutageIndex":
+        """
+        :param path: a file in which periods were saved (see save_to)
+        :return: the index of the periods of the file
+        """
+        index = OutageIndex()
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    start, end, _, nb_samples = line.split(",")
+                    index.add_outage(float(start), float(end), int(nb_samples))
+                except ValueError:
+                    # a line cut by a crash while it was written
+                    continue
+        return index
+
+    def __len__(self) -> int:
+        """
+        :return: the number of periods that are over
+        """
+        return len(self.starts)
+
+    def add(self, timestamp: float, ping: int) -> Optional[int]:
+        """
+        Follows the disconnections with a new check, in chronological order
+
+        :param ping: negative if the check failed
+        :return: the index of the period the check ended, None if it didn't end one
+        """
+        self.last_time = timestamp
+        if ping < 0:
+            if self.current_start is None:
+                self.current_start = timestamp
+            self.current_samples += 1
+        elif self.current_start is not None:
+            self.add_outage(self.current_start, timestamp, self.current_samples)
+            self.current_start = None
+            self.current_samples = 0
+            return len(self.starts) - 1
+        return None
+
+    def add_outage(self, start: float, end: float, nb_samples: int):
+        """
+        Adds a period that is over, after all the periods already added
+        """
+        duration = end - start
+        if duration > (self.duration(self.longest_index) if self.longest_index is not None else 0):
+            self.longest_index = len(self.starts)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.nb_samples.append(nb_samples)
+        self.cumulative_durations.append(self.cumulative_durations[-1] + duration)
+        if self.saving_file:
+            self.write_outage(start, end, duration, nb_samples)
+
+    def write_outage(self, start: float, end: float, duration: float, nb_samples: int):
+        self.saving_file.write(f"{start},{end},{duration},{nb_samples}\n")
+        self.saving_file.flush()
+
+    def duration(self, index: int) -> float:
+        return self.ends[index] - self.starts[index]
+
+    def get(self, index: int) -> Tuple[float, float, float, int]:
+        """
+        :return: the start, end, duration and number of failed checks of a period that is over
+        """
+        return self.starts[index], self.ends[index], self.duration(index), self.nb_samples[index]
+
+    def current(self) -> Optional[Tuple[float, float, float, int]]:
+        """
+        :return: the period in progress, ending at the latest check for now, None if the last check succeeded
+        """
+        if self.current_start is None:
+            return None
+        return self.current_start, self.last_time, self.last_time - self.current_start, self.current_samples
+
+    def longest(self) -> Optional[Tuple[float, float]]:
+        """
+        :return: the start and the duration of the longest period, counting the one in progress, None if no period
+            lasted more than 0s
+        """
+        longest = None
+        if self.longest_index is not None:
+            longest = self.starts[self.longest_index], self.duration(self.longest_index)
+        current = self.current()
+        if current is not None and current[2] > (longest[1] if longest else 0):
+            longest = current[0], current[2]
+        return longest
+
+    def count(self) -> int:
+        """
+        :return: the number of periods, counting the one in progress
+        """
+        return len(self.starts) + (self.current_start is not None)
+
+    def total_duration(self) -> float:
+        """
+        :return: the total duration of the periods, counting the one in progress
+        """
+        current = self.current()
+        return self.cumulative_durations[-1] + (current[2] if current else 0)
+
+    def range_indexes(self, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[int, int]:
+        """
+        :return: the indexes of the first period starting at start or after, and of the first one starting at end or
+            after (None for no limit)
+        """
+        first = bisect_left(self.starts, start) if start is not None else 0
+        last = bisect_left(self.starts, end) if end is not None else len(self.starts)
+        return first, max(first, last)
+
+    def between(self, start: Optional[float] = None, end: Optional[float] = None,
+                min_duration: float = 0) -> List[Tuple[float, float, float, int]]:
+        """
+        :return: the periods over starting between start (included) and end (excluded), lasting at least
+            min_duration seconds
+        """
+        first, last = self.range_indexes(start, end)
+        return [self.get(i) for i in range(first, last) if self.duration(i) >= min_duration]
+
+    def summary_between(self, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[int, float]:
+        """
+        :return: the number and the total duration of the periods over starting between start (included) and end
+            (excluded), without going through them
+        """
+        first, last = self.range_indexes(start, end)
+        return last - first, self.cumulative_durations[last] - self.cumulative_durations[first]
+
+    def per_bucket(self, start: float, end: float, resolution: float = 3600) -> List[Tuple[float, int, float]]:
+        """
+        :return: for each bucket of resolution seconds between start and end, its start, the number of periods over
+            starting in it and their total duration
+        """
+        buckets = []
+        bucket_start = start - start % resolution
+        while bucket_start < end:
+            buckets.append((bucket_start, *self.summary_between(bucket_start, bucket_start + resolution)))
+            bucket_start += resolution
+        return buckets
+
+    def close(self):
+        """
+        Stops saving the periods, the one in progress is saved as ending at the latest check
+        """
+        if self.saving_file:
+            current = self.current()
+            if current is not None:
+                self.write_outage(*current)
+            self.saving_file.close()
+            self.saving_file = None
+        if self in open_writers:
+            open_writers.remove(self)
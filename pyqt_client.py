@@ -1,25 +1,30 @@
 import datetime
+import queue
 from typing import Optional, List, Tuple, Dict
 
 from PySide6.QtCharts import QChart, QLineSeries, QDateTimeAxis, QValueAxis, QLogValueAxis
-from PySide6.QtCore import QDateTime, Qt
+from PySide6.QtCore import QDateTime, Qt, QPointF, QTimer
 from PySide6.QtGui import QColor, QPalette
 
 from bandwidth_statistics import BandwidthStatistics
 from client import Client
 
-from PySide6.QtWidgets import QApplication, QWidget
+from PySide6.QtWidgets import QApplication, QWidget, QGridLayout, QLabel
 
 # Important:
 # You need to run the following command to generate the qt_client.py file
 #     pyside6-uic form.ui -o qt_client.py, or
 #     pyside2-uic form.ui -o qt_client.py
 from connection_statistics import ConnectionStatistics
+from decimation import IncrementalDecimation
 from qt_client import Ui_QtClientWidget
+from ring_buffer import TimeSeriesRingBuffer
+from streaming_stats import LatencyStatistics
 
 
 # This class loads the pyqt_client into a qt window and takes care of filling it with proper data
-from utils import duration_to_str, kbits_to_str, check_internet_loop, check_bandwidth_usage, ping_to_str
+from utils import duration_to_str, kbits_to_str, check_internet_loop, check_bandwidth_usage, ping_to_str, \
+    window_to_str
 
 
 class PyQtClient(QWidget, Client):
@@ -28,6 +33,8 @@ class PyQtClient(QWidget, Client):
     SPEED_COLOR = QColor(0, 255, 0)
     CONNECTED_COLOR = QColor(0, 255, 0)
     NOT_CONNECTED_COLOR = QColor(255, 0, 0)
+    # the maximum number of times per second the display is refreshed
+    REFRESH_RATE = 4
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -38,6 +45,8 @@ class PyQtClient(QWidget, Client):
         self.end_time: Optional[int] = None
         self.chart = self.ui.view_data.chart()
         self.series: Dict[str, QLineSeries] = {}
+        # the series drawn on the speed axis, the other ones are drawn on the ping axis
+        self.speed_series = {"Speed"}
 
         self.chart.setAnimationOptions(QChart.AnimationOption.NoAnimation)
 
@@ -49,6 +58,27 @@ class PyQtClient(QWidget, Client):
         self.add_speed_y_axis()
         self.min_speed = -1
         self.min_ping = -1
+        self.add_latency_layout()
+
+        # the updates received are only applied to the display when it is refreshed, everything below is only
+        # accessed by the Qt thread, except the queue
+        self.updates = queue.SimpleQueue()
+        self.latest_internet_statistics: Optional[ConnectionStatistics] = None
+        self.latest_bandwidth_statistics: Optional[BandwidthStatistics] = None
+        self.pending_points: Dict[str, List[Tuple[float, float]]] = {}
+        self.pending_history: Dict[str, List[Tuple[float, float]]] = {}
+        self.pending_window_title: Optional[str] = None
+        self.point_buffers: Dict[str, List[QPointF]] = {}
+        # the decimated points of each series, continued with the new points while the time range only grows
+        self.decimations: Dict[str, IncrementalDecimation] = {}
+        # every point received is kept here, the series only contain the points drawn for the visible range
+        self.data: Dict[str, TimeSeriesRingBuffer] = {}
+        self.series_to_render = set()
+        self.axis_x.rangeChanged.connect(self.render_all_series)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000 // self.REFRESH_RATE)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
         # TODO: set an icon or remove the icon from title bar
 
 
@@ -75,6 +105,31 @@ class PyQtClient(QWidget, Client):
         self.series["Speed"].attachAxis(self.speed_axis_y)
         self.series["Speed"].setColor(self.SPEED_COLOR)
 
+    def add_latency_layout(self):
+        # the latency statistics are not part of the generated ui, their grid is built here: one row for the whole
+        # life of the program and one for each sliding window, added when the first statistics are received
+        self.layout_latency = QGridLayout()
+        for column, title in enumerate(["Median ping", "95th percentile", "99th percentile", "Jitter", "Loss"], 1):
+            label = QLabel(title, self)
+            label.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            self.layout_latency.addWidget(label, 0, column)
+        self.label_jitter = QLabel(self)
+        self.layout_latency.addWidget(self.label_jitter, 0, 0)
+        self.latency_labels: Dict[str, List[QLabel]] = {}
+        self.ui.verticalLayout.addLayout(self.layout_latency)
+
+    def show_latency(self, title: str, latency: LatencyStatistics):
+        if title not in self.latency_labels:
+            row = len(self.latency_labels) + 1
+            self.latency_labels[title] = [QLabel(self) for _ in range(6)]
+            for column, label in enumerate(self.latency_labels[title]):
+                label.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.layout_latency.addWidget(label, row, column)
+        values = [title, ping_to_str(latency.p50), ping_to_str(latency.p95), ping_to_str(latency.p99),
+                  f"{latency.jitter:.1f}ms", f"{latency.loss_ratio * 100:.2f}%"]
+        for label, value in zip(self.latency_labels[title], values):
+            label.setText(value)
+
     def add_date_axis(self):
         self.axis_x.setTickCount(7)
         self.axis_x.setFormat("dd-MM h:mm:ss")
@@ -103,10 +158,102 @@ class PyQtClient(QWidget, Client):
             self.ui.label_end_time.setText(str(datetime.datetime.fromtimestamp(timestamp)))
             self.axis_x.setMax(QDateTime.fromSecsSinceEpoch(timestamp))
 
+    # The update methods are called from the thread running the asyncio loop, they must not touch the widgets: they
+    # only put the update in a queue that the Qt thread drains when it refreshes the display
+
     def update_internet_statistics(self, stats: ConnectionStatistics):
+        self.updates.put(("internet", stats))
+
+    def update_bandwidth_statistics(self, stats: BandwidthStatistics):
+        self.updates.put(("bandwidth", stats))
+
+    def update_targets_statistics(self, stats: Dict[str, ConnectionStatistics]):
+        self.updates.put(("targets", stats))
+
+    def update_interfaces_statistics(self, stats: Dict[str, BandwidthStatistics]):
+        self.updates.put(("interfaces", stats))
+
+    def update_internet_history(self, points: List[Tuple[float, float]]):
+        self.updates.put(("history", ("Ping", points)))
+
+    def update_bandwidth_history(self, points: List[Tuple[float, float]]):
+        self.updates.put(("history", ("Speed", points)))
+
+    def update_file_loaded(self, file_path: str, nb_rows: int, time_to_first_display: float,
+                           nb_invalid_rows: int = 0):
+        skipped = f", {nb_invalid_rows} invalid rows skipped" if nb_invalid_rows else ""
+        self.updates.put(("title", f"How's the network? - loaded {nb_rows} rows from {file_path} "
+                                   f"(first display after {time_to_first_display:.2f}s{skipped})"))
+
+    def collect_updates(self):
+        """
+        Empties the queue of updates and merges them with the ones not applied yet: only the latest statistics are
+        kept, while the new points are accumulated, so a burst of updates results in a single refresh
+        """
+        while True:
+            try:
+                kind, update = self.updates.get_nowait()
+            except queue.Empty:
+                return
+            if kind == "internet":
+                self.latest_internet_statistics = update
+                self.pending_points.setdefault("Ping", []).append((update.current_time, max(0, update.current_ping)))
+            elif kind == "bandwidth":
+                self.latest_bandwidth_statistics = update
+                self.pending_points.setdefault("Speed", []).append((update.current_time,
+                                                                    update.current_network_speed))
+            elif kind == "targets":
+                for target, target_stats in update.items():
+                    self.pending_points.setdefault(target, []).append((target_stats.current_time,
+                                                                       max(0, target_stats.current_ping)))
+            elif kind == "interfaces":
+                for interface, interface_stats in update.items():
+                    self.speed_series.add(interface)
+                    self.pending_points.setdefault(interface, []).append((interface_stats.current_time,
+                                                                          interface_stats.current_network_speed))
+            elif kind == "history":
+                self.set_pending_history(*update)
+            elif kind == "title":
+                self.pending_window_title = update
+
+    def set_pending_history(self, name: str, points: List[Tuple[float, float]]):
+        if not points:
+            return
+        self.pending_history[name] = points
+        # the points waiting to be appended are now part of the history, except the ones that came after it
+        self.pending_points[name] = [point for point in self.pending_points.get(name, []) if point[0] > points[-1][0]]
+
+    def refresh(self):
+        """
+        Called REFRESH_RATE times per second to apply all the updates received since the last refresh at once,
+        so the chart is laid out at most once per refresh whatever the number of updates
+        """
+        self.collect_updates()
+
+        if self.pending_window_title:
+            self.setWindowTitle(self.pending_window_title)
+            self.pending_window_title = None
 
-        self.update_time(stats.current_time)
+        if self.latest_internet_statistics:
+            self.show_internet_statistics(self.latest_internet_statistics)
+            self.latest_internet_statistics = None
+        if self.latest_bandwidth_statistics:
+            self.show_bandwidth_statistics(self.latest_bandwidth_statistics)
+            self.latest_bandwidth_statistics = None
 
+        pending_history, self.pending_history = self.pending_history, {}
+        for name, points in pending_history.items():
+            self.replace_points(name, points)
+        pending_points, self.pending_points = self.pending_points, {}
+        for name, points in pending_points.items():
+            if points:
+                self.append_points(name, points)
+
+        for name in self.series_to_render:
+            self.render_series(name)
+        self.series_to_render.clear()
+
+    def show_internet_statistics(self, stats: ConnectionStatistics):
         # TODO: add colors
         connected_palette = QPalette()
         if stats.currently_connected:
@@ -128,27 +275,98 @@ class PyQtClient(QWidget, Client):
         self.ui.label_highest_ping.setText(f"{ping_to_str(stats.max_ping)}")
         self.ui.label_average_ping.setText(f"{ping_to_str(stats.average_ping)}")
 
-        self.series["Ping"].append(stats.current_time, stats.current_ping if stats.current_ping > 0 else 0)
-        if self.min_ping < 0:
-            self.min_ping = max(0, stats.current_ping)
-        self.min_ping = min(self.min_ping, max(0, stats.current_ping))
-        self.ping_axis_y.setMin(self.min_ping)
-        self.ping_axis_y.setMax(max(self.ping_axis_y.max(), stats.current_ping))
-        self.chart.removeSeries(self.series["Ping"])
-        self.chart.addSeries(self.series["Ping"])
+        self.label_jitter.setText(f"Current jitter: {stats.jitter:.1f}ms")
+        if stats.latency is not None:
+            self.show_latency("Since the start", stats.latency)
+        for window in stats.latency_windows:
+            self.show_latency(f"Last {window_to_str(window.duration)}", window)
 
-
-    def update_bandwidth_statistics(self, stats: BandwidthStatistics):
-        self.update_time(stats.current_time)
+    def show_bandwidth_statistics(self, stats: BandwidthStatistics):
         self.ui.label_current_use.setText(f"{kbits_to_str(stats.current_network_use)}")
         self.ui.label_current_speed.setText(f"{kbits_to_str(stats.current_network_speed)}/second")
         self.ui.label_average_use.setText(f"{kbits_to_str(stats.average_network_use)}/second")
         self.ui.label_total_use.setText(f"{kbits_to_str(stats.total_use)}")
-        self.series["Speed"].append(stats.current_time, stats.current_network_speed)
-        if self.min_speed < 0:
-            self.min_speed = max(0, stats.current_network_speed)
-        self.min_speed = min(self.min_speed, stats.current_network_speed)
-        self.speed_axis_y.setMin(self.min_speed)
-        self.speed_axis_y.setMax(max(self.speed_axis_y.max(), stats.current_network_speed))
-        self.chart.removeSeries(self.series["Speed"])
-        self.chart.addSeries(self.series["Speed"])
+
+    def get_series(self, name: str) -> QLineSeries:
+        if name not in self.series:
+            # each target gets its own ping series, drawn on the same axis as the aggregated ping, and each interface
+            # its own speed series
+            self.add_timeseries(name)
+            self.series[name].attachAxis(self.speed_axis_y if name in self.speed_series else self.ping_axis_y)
+        return self.series[name]
+
+    def update_y_axis(self, name: str, values: List[float]):
+        if name in self.speed_series:
+            if self.min_speed < 0:
+                self.min_speed = max(0, min(values))
+            self.min_speed = min(self.min_speed, min(values))
+            self.speed_axis_y.setMin(self.min_speed)
+            self.speed_axis_y.setMax(max(self.speed_axis_y.max(), max(values)))
+        else:
+            if self.min_ping < 0:
+                self.min_ping = min(values)
+            self.min_ping = min(self.min_ping, min(values))
+            self.ping_axis_y.setMin(self.min_ping)
+            self.ping_axis_y.setMax(max(self.ping_axis_y.max(), max(values)))
+
+    def get_data(self, name: str) -> TimeSeriesRingBuffer:
+        if name not in self.data:
+            self.data[name] = TimeSeriesRingBuffer("d", "d")
+        return self.data[name]
+
+    def append_points(self, name: str, points: List[Tuple[float, float]]):
+        data = self.get_data(name)
+        for point in points:
+            data.append(point)
+        decimation = self.decimations.get(name)
+        if decimation is not None and points[0][0] < decimation.kept_end:
+            # the points kept are decimated again if one of them may have changed
+            del self.decimations[name]
+        self.series_to_render.add(name)
+        self.update_time(int(min(timestamp for timestamp, _ in points)))
+        self.update_time(int(max(timestamp for timestamp, _ in points)))
+        self.update_y_axis(name, [value for _, value in points])
+
+    def replace_points(self, name: str, points: List[Tuple[float, float]]):
+        data = self.data[name] = TimeSeriesRingBuffer("d", "d")
+        for point in points:
+            data.append(point)
+        self.decimations.pop(name, None)
+        self.series_to_render.add(name)
+        self.update_time(int(points[0][0]))
+        self.update_time(int(points[-1][0]))
+        self.update_y_axis(name, [value for _, value in points])
+
+    def render_all_series(self):
+        self.series_to_render.update(self.data.keys())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.render_all_series()
+
+    def render_series(self, name: str):
+        """
+        Replaces the points of the series by the points of its data in the visible time range, decimated so there
+        are no more points than pixels to draw them. While the time range only grows with new samples, only the new
+        points are decimated; the whole range is decimated again when it's zoomed or the chart is resized.
+        """
+        start = self.axis_x.min().toSecsSinceEpoch()
+        end = self.axis_x.max().toSecsSinceEpoch()
+        width = max(1, int(self.chart.plotArea().width()))
+        decimation = self.decimations.get(name)
+        if decimation is None or not decimation.is_valid_for(start, end, width):
+            # for pings we keep the lowest and highest value of each pixel (min_max), so the disconnections (drawn
+            # as 0) and the ping spikes are always visible
+            decimation = self.decimations[name] = IncrementalDecimation(start, end, width, name in self.speed_series)
+        # the points kept by the decimation don't change, their QPointF are already set from the last rendering
+        nb_unchanged = len(decimation.kept)
+        points = decimation.points(self.get_data(name).slice(decimation.kept_end, end), end)
+
+        # the QPointF of the buffer are reused from one rendering to the other instead of being created each time
+        buffer = self.point_buffers.setdefault(name, [])
+        while len(buffer) < len(points):
+            buffer.append(QPointF())
+        for point, (timestamp, value) in zip(buffer[nb_unchanged:], points[nb_unchanged:]):
+            point.setX(timestamp)
+            point.setY(value)
+        self.get_series(name).replace(buffer[:len(points)])
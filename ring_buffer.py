@@ -0,0 +1,128 @@
+from array import array
+from typing import Iterator, Tuple, Union, List
+
+
+class TimeSeriesRingBuffer:
+    """
+    Stores a history of (timestamp, value) samples in two typed arrays used as a circular buffer, which takes a
+    few bytes per sample instead of a python tuple per sample.
+    The oldest samples are dropped once the buffer contains more than max_size samples or once they are older
+    than max_age seconds compared to the latest sample. When both are 0 the history is kept forever.
+    Samples must be appended in chronological order.
+    """
+
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, value_typecode: str = "d", time_typecode: str = "d", max_size: int = 0, max_age: float = 0):
+        """
+        :param value_typecode: the array typecode used to store the values
+        :param time_typecode: the array typecode used to store the timestamps
+        :param max_size: the maximum number of samples kept, 0 for no limit
+        :param max_age: the maximum age in seconds of the samples kept, 0 for no limit
+        """
+        self.max_size = max_size
+        self.max_age = max_age
+        self.timestamps = array(time_typecode, [0]) * self.INITIAL_CAPACITY
+        self.values = array(value_typecode, [0]) * self.INITIAL_CAPACITY
+        # index in the arrays of the oldest sample
+        self.start = 0
+        self.size = 0
+
+    def set_retention(self, max_size: int = 0, max_age: float = 0):
+        """
+        Changes the retention of the buffer, and drops the samples that are not retained anymore
+
+        :param max_size: the maximum number of samples kept, 0 for no limit
+        :param max_age: the maximum age in seconds of the samples kept, 0 for no limit
+        """
+        self.max_size = max_size
+        self.max_age = max_age
+        if self.size > 0:
+            self.evict(self[-1][0])
+        while 0 < self.max_size < self.size:
+            self.pop_oldest()
+
+    def capacity(self) -> int:
+        return len(self.timestamps)
+
+    def grow(self):
+        # we double the capacity (without going over the max size) and move the samples at the start of the arrays
+        new_capacity = self.capacity() * 2
+        if self.max_size > 0:
+            new_capacity = min(new_capacity, self.max_size)
+        timestamps = array(self.timestamps.typecode, [0]) * new_capacity
+        values = array(self.values.typecode, [0]) * new_capacity
+        first_part = min(self.size, self.capacity() - self.start)
+        timestamps[:first_part] = self.timestamps[self.start:self.start + first_part]
+        values[:first_part] = self.values[self.start:self.start + first_part]
+        timestamps[first_part:self.size] = self.timestamps[:self.size - first_part]
+        values[first_part:self.size] = self.values[:self.size - first_part]
+        self.timestamps = timestamps
+        self.values = values
+        self.start = 0
+
+    def pop_oldest(self):
+        self.start = (self.start + 1) % self.capacity()
+        self.size -= 1
+
+    def evict(self, now: float):
+        """
+        Drops the samples older than max_age seconds compared to now
+        """
+        if self.max_age > 0:
+            while self.size > 0 and now - self.timestamps[self.start] > self.max_age:
+                self.pop_oldest()
+
+    def append(self, sample: Tuple[Union[int, float], Union[int, float]]):
+        timestamp, value = sample
+        self.evict(timestamp)
+        if 0 < self.max_size <= self.size:
+            self.pop_oldest()
+        if self.size == self.capacity():
+            self.grow()
+        index = (self.start + self.size) % self.capacity()
+        self.timestamps[index] = timestamp
+        self.values[index] = value
+        self.size += 1
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> Tuple[Union[int, float], Union[int, float]]:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("ring buffer index out of range")
+        index = (self.start + index) % self.capacity()
+        return self.timestamps[index], self.values[index]
+
+    def __iter__(self) -> Iterator[Tuple[Union[int, float], Union[int, float]]]:
+        for i in range(self.size):
+            index = (self.start + i) % self.capacity()
+            yield self.timestamps[index], self.values[index]
+
+    def index_of(self, timestamp: float, after: bool = False) -> int:
+        """
+        Finds by binary search the position of a timestamp in the buffer
+
+        :param timestamp: the timestamp to look for
+        :param after: if True, the samples with exactly this timestamp are considered to be before it
+        :return: the index of the first sample whose timestamp is greater or equal (greater if after is True) to the
+            one given
+        """
+        low = 0
+        high = self.size
+        while low < high:
+            middle = (low + high) // 2
+            current = self.timestamps[(self.start + middle) % self.capacity()]
+            if current < timestamp or after and current == timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def slice(self, start: float, end: float) -> List[Tuple[Union[int, float], Union[int, float]]]:
+        """
+        :return: the samples whose timestamp is between start and end (both included)
+        """
+        return [self[i] for i in range(self.index_of(start), self.index_of(end, after=True))]
@@ -0,0 +1,472 @@
+import math
+import os
+from collections import deque
+from typing import List, Optional, Tuple, Deque, Union
+
+from log_writer import GroupCommit
+from ring_buffer import TimeSeriesRingBuffer
+
+# resolutions in seconds of the rollup tiers kept in addition to the raw history
+ROLLUP_RESOLUTIONS = [60, 3600]
+ROLLUP_SUFFIXES = {60: "1m", 3600: "1h"}
+# number of closed buckets kept in memory for each resolution (one week of minutes, one year of hours)
+ROLLUP_MAX_BUCKETS = {60: 7 * 24 * 60, 3600: 365 * 24}
+# the size of the end of a rollup file read to find its last line
+LAST_LINES_SIZE = 4096
+
+
+def get_rollup_path(raw_path: str, resolution: int) -> str:
+    """
+    :param raw_path: the path of the raw history file
+    :param resolution: the resolution of the rollup tier
+    :return: the path of the file in which the rollup tier of the raw file is saved
+    """
+    return f"{raw_path}.{ROLLUP_SUFFIXES.get(resolution, f'{resolution}s')}.csv"
+
+
+class PingRollup:
+    """
+    Summary of the pings of one bucket of time
+    """
+
+    def __init__(self, start: int, resolution: int, nb_samples: int, min_ping: float, max_ping: float,
+                 mean_ping: float, p95_ping: float, loss_ratio: float):
+        self.start = start
+        self.resolution = resolution
+        self.nb_samples = nb_samples
+        self.min_ping = min_ping
+        self.max_ping = max_ping
+        self.mean_ping = mean_ping
+        self.p95_ping = p95_ping
+        self.loss_ratio = loss_ratio
+
+    def to_csv(self) -> str:
+        return f"{self.start},{self.nb_samples},{self.min_ping:.0f},{self.max_ping:.0f},{self.mean_ping:.1f}," \
+               f"{self.p95_ping:.0f},{self.loss_ratio:.4f}"
+
+    @staticmethod
+    def from_csv(line: str, resolution: int) -> "PingRollup":
+        start, nb_samples, min_ping, max_ping, mean_ping, p95_ping, loss_ratio = line.split(",")
+        return PingRollup(int(start), resolution, int(nb_samples), float(min_ping), float(max_ping),
+                          float(mean_ping), float(p95_ping), float(loss_ratio))
+
+    def nb_successful(self) -> int:
+        return round(self.nb_samples * (1 - self.loss_ratio))
+
+    def merge(self, other: "PingRollup") -> "PingRollup":
+        """
+        :param other: the summary of other samples of the same bucket
+        :return: the summary of the samples of both, whose 95th percentile is the highest of both (the samples
+            aren't known anymore to compute it exactly)
+        """
+        nb_samples = self.nb_samples + other.nb_samples
+        successful = [rollup for rollup in [self, other] if rollup.nb_successful() > 0]
+        nb_successful = sum(rollup.nb_successful() for rollup in successful)
+        loss_ratio = 1 - nb_successful / nb_samples if nb_samples else 0
+        if not successful:
+            return PingRollup(self.start, self.resolution, nb_samples, -1, -1, -1, -1, loss_ratio)
+        return PingRollup(self.start, self.resolution, nb_samples, min(rollup.min_ping for rollup in successful),
+                          max(rollup.max_ping for rollup in successful),
+                          sum(rollup.mean_ping * rollup.nb_successful() for rollup in successful) / nb_successful,
+                          max(rollup.p95_ping for rollup in successful), loss_ratio)
+
+
+class BandwidthRollup:
+    """
+    Summary of the network use of one bucket of time
+    """
+
+    def __init__(self, start: int, resolution: int, nb_samples: int, kbits: float, duration: float):
+        self.start = start
+        self.resolution = resolution
+        self.nb_samples = nb_samples
+        self.kbits = kbits
+        # the time actually covered by the samples of the bucket
+        self.duration = duration
+
+    def speed(self) -> float:
+        return self.kbits / self.duration if self.duration > 0 else 0
+
+    def to_csv(self) -> str:
+        return f"{self.start},{self.nb_samples},{self.kbits:.0f},{self.duration:.0f}"
+
+    @staticmethod
+    def from_csv(line: str, resolution: int) -> "BandwidthRollup":
+        start, nb_samples, kbits, duration = line.split(",")
+        return BandwidthRollup(int(start), resolution, int(nb_samples), float(kbits), float(duration))
+
+    def merge(self, other: "BandwidthRollup") -> "BandwidthRollup":
+        """
+        :param other: the summary of other samples of the same bucket
+        :return: the summary of the samples of both
+        """
+        return BandwidthRollup(self.start, self.resolution, self.nb_samples + other.nb_samples,
+                               self.kbits + other.kbits, self.duration + other.duration)
+
+
+class PingBucket:
+
+    rollup_type = PingRollup
+
+    def __init__(self, start: int, resolution: int):
+        self.start = start
+        self.resolution = resolution
+        self.pings: List[int] = []
+        self.nb_samples = 0
+
+    def add(self, ping: int):
+        self.nb_samples += 1
+        if ping >= 0:
+            self.pings.append(ping)
+
+    def finish(self) -> PingRollup:
+        self.pings.sort()
+        loss_ratio = 1 - len(self.pings) / self.nb_samples
+        if not self.pings:
+            return PingRollup(self.start, self.resolution, self.nb_samples, -1, -1, -1, -1, loss_ratio)
+        # nearest rank percentile
+        p95 = self.pings[max(0, math.ceil(0.95 * len(self.pings)) - 1)]
+        return PingRollup(self.start, self.resolution, self.nb_samples, self.pings[0], self.pings[-1],
+                          sum(self.pings) / len(self.pings), p95, loss_ratio)
+
+
+class BandwidthBucket:
+
+    rollup_type = BandwidthRollup
+
+    def __init__(self, start: int, resolution: int):
+        self.start = start
+        self.resolution = resolution
+        self.kbits: float = 0
+        self.duration: float = 0
+        self.nb_samples = 0
+
+    def add(self, kbits: float, duration: float):
+        self.nb_samples += 1
+        self.kbits += kbits
+        self.duration += duration
+
+    def finish(self) -> BandwidthRollup:
+        return BandwidthRollup(self.start, self.resolution, self.nb_samples, self.kbits, self.duration)
+
+
+def read_last_line(path: str) -> Tuple[int, str]:
+    """
+    :return: the position in the file of the start of its last complete line and that line, (0, "") if the file
+        has no complete line. A line cut at the end of the file by a crash is not counted.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        # the lines of the rollups are short, the last ones are in the end of the file
+        f.seek(max(0, size - LAST_LINES_SIZE))
+        tail = f.read()
+    end = tail.rfind(b"\n") + 1
+    if end == 0:
+        return 0, ""
+    start = tail.rfind(b"\n", 0, end - 1) + 1
+    return size - len(tail) + start, tail[start:end].decode()
+
+
+class RollupWriter(GroupCommit):
+    """
+    Appends the closed buckets of a rollup tier to its file in groups (see GroupCommit). When the writer is closed,
+    the bucket being filled is written too, so the last minutes aren't lost when the program stops. When the program
+    starts again before the end of that bucket, the bucket is merged with the one of the file when it's written
+    instead of appearing twice.
+    """
+
+    def __init__(self, path: str, tier: "RollupTier", commit_records: int = 100, commit_interval: float = 60):
+        """
+        :param path: the path of the file to append to
+        :param tier: the tier whose buckets are saved
+        """
+        self.tier = tier
+        # the last bucket of the file and its position, if the program stopped before its end
+        self.resumed = None
+        self.resumed_position = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.resumed_position, line = read_last_line(path)
+            # a line cut by a crash is removed, so the next buckets aren't appended to it
+            os.truncate(path, self.resumed_position + len(line))
+            try:
+                self.resumed = tier.bucket_type.rollup_type.from_csv(line, tier.resolution)
+            except ValueError:
+                pass
+        self.file = open(path, "a")
+        super().__init__(commit_records, commit_interval)
+
+    def write(self, samples: List[Tuple[float, Union[PingRollup, BandwidthRollup]]]):
+        rollups = [rollup for _, rollup in samples]
+        if self.resumed is not None:
+            if rollups[0].start == self.resumed.start:
+                rollups[0] = self.resumed.merge(rollups[0])
+                self.file.truncate(self.resumed_position)
+            self.resumed = None
+        self.file.write("".join(f"{rollup.to_csv()}\n" for rollup in rollups))
+        self.file.flush()
+
+    def close(self):
+        if self.tier.bucket is not None:
+            self.pending.append((self.tier.bucket.start, self.tier.bucket.finish()))
+        super().close()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+class RollupTier:
+    """
+    Aggregates the samples into buckets of a fixed duration, aligned on multiples of that duration.
+    A bucket is closed as soon as a sample arrives after its end, it's then kept in memory and saved by the writer
+    if there's one. The buckets saved in a file can be loaded to avoid summarizing their samples again.
+    """
+
+    def __init__(self, resolution: int, bucket_type, max_buckets: int):
+        self.resolution = resolution
+        self.bucket_type = bucket_type
+        self.rollups: Deque = deque(maxlen=max_buckets)
+        self.bucket = None
+        self.writer: Optional[RollupWriter] = None
+        # the buckets loaded from a file, put in the tier when the samples reach them (see load)
+        self.loaded: Deque = deque(maxlen=max_buckets)
+        # the samples before this time are already summarized by the buckets loaded
+        self.loaded_until: float = -math.inf
+        # the last bucket loaded, only used if no sample comes after its start (see use_loaded)
+        self.last_loaded = None
+
+    def save_to(self, saving_path: str, commit_records: int = 100, commit_interval: float = 60):
+        """
+        From now on, the closed buckets are appended to this file, in groups (see GroupCommit)
+        """
+        self.writer = RollupWriter(saving_path, self, commit_records, commit_interval)
+
+    def load(self, path: str, start: Optional[float] = None, end: Optional[float] = None):
+        """
+        Reads the buckets saved in a file (see save_to) overlapping a time range. They're put in the tier once the
+        samples added reach the first of them, or by finish_loading, and the samples they summarize are then ignored.
+
+        :param start: the start of the time range, None for no limit
+        :param end: the end of the time range, None for no limit
+        """
+        rollup_type = self.bucket_type.rollup_type
+        self.loaded.clear()
+        with open(path, "r") as f:
+            for line in f:
+                # a line without end of line was cut by a crash while it was written
+                if not line.endswith("\n"):
+                    continue
+                try:
+                    rollup = rollup_type.from_csv(line, self.resolution)
+                except ValueError:
+                    continue
+                if start is not None and rollup.start + self.resolution <= start \
+                        or end is not None and rollup.start > end:
+                    continue
+                if self.loaded and self.loaded[-1].start == rollup.start:
+                    # a bucket written in two parts by an older version, when the program was restarted during it
+                    self.loaded[-1] = self.loaded[-1].merge(rollup)
+                else:
+                    self.loaded.append(rollup)
+
+    def use_loaded(self):
+        """
+        Puts the buckets loaded in the tier after the ones already closed. The last one may have been saved when the
+        program stopped, before the end of its samples, so it's summarized again from the samples if some of them
+        are added.
+        """
+        if not self.loaded:
+            return
+        if self.bucket is not None:
+            self.close_bucket()
+        self.last_loaded = self.loaded.pop()
+        self.rollups.extend(self.loaded)
+        self.loaded_until = self.last_loaded.start
+        self.loaded.clear()
+
+    def finish_loading(self):
+        """
+        Puts the buckets loaded that the samples added didn't reach in the tier
+        """
+        self.use_loaded()
+        if self.last_loaded is not None:
+            self.rollups.append(self.last_loaded)
+            self.loaded_until = self.last_loaded.start + self.resolution
+            self.last_loaded = None
+
+    def add(self, timestamp: int, *values):
+        if self.loaded and timestamp >= self.loaded[0].start:
+            self.use_loaded()
+        if timestamp < self.loaded_until:
+            return
+        self.last_loaded = None
+        start = int(timestamp - timestamp % self.resolution)
+        if self.bucket is not None and self.bucket.start != start:
+            self.close_bucket()
+        if self.bucket is None:
+            self.bucket = self.bucket_type(start, self.resolution)
+        self.bucket.add(*values)
+
+    def close_bucket(self):
+        rollup = self.bucket.finish()
+        self.rollups.append(rollup)
+        self.bucket = None
+        if self.writer:
+            self.writer.append(rollup.start, rollup)
+
+    def oldest(self) -> Optional[int]:
+        """
+        :return: the start of the oldest bucket known by the tier
+        """
+        if self.rollups:
+            return self.rollups[0].start
+        return self.bucket.start if self.bucket else None
+
+    def get_rollups(self, start: float, end: float) -> list:
+        """
+        :return: the buckets overlapping the time range, including the one currently filled
+        """
+        rollups = [rollup for rollup in self.rollups if rollup.start + self.resolution > start and rollup.start <= end]
+        if self.bucket is not None and self.bucket.start <= end:
+            rollups.append(self.bucket.finish())
+        return rollups
+
+
+class Rollups:
+    """
+    Maintains the rollup tiers of a history and lets the clients get the points to display for a time range from
+    the coarsest tier that is precise enough for what they want to display.
+    """
+
+    def __init__(self, bucket_type, raw: TimeSeriesRingBuffer):
+        """
+        :param bucket_type: the type of buckets to aggregate the samples in (PingBucket or BandwidthBucket)
+        :param raw: the raw history, used as the finest tier
+        """
+        self.raw = raw
+        self.tiers = [RollupTier(resolution, bucket_type, ROLLUP_MAX_BUCKETS[resolution])
+                      for resolution in ROLLUP_RESOLUTIONS]
+        self.latest: Optional[float] = None
+
+    def save_next_to(self, raw_path: str, commit_records: int = 100, commit_interval: float = 60):
+        """
+        From now on, the closed buckets of each tier are appended to a file next to the raw history file, in groups
+        like the samples of the raw history (see GroupCommit)
+        """
+        for tier in self.tiers:
+            tier.save_to(get_rollup_path(raw_path, tier.resolution), commit_records, commit_interval)
+
+    def load_next_to(self, raw_path: str, start: Optional[float] = None, end: Optional[float] = None):
+        """
+        Loads the buckets of a time range saved next to a raw history file (see save_next_to), they're used instead
+        of the samples of the file they summarize. finish_loading must be called once the samples are added.
+        """
+        for tier in self.tiers:
+            path = get_rollup_path(raw_path, tier.resolution)
+            if os.path.exists(path):
+                tier.load(path, start, end)
+
+    def finish_loading(self):
+        """
+        Puts the buckets loaded that the samples added didn't reach in the tiers
+        """
+        for tier in self.tiers:
+            tier.finish_loading()
+
+    def add(self, timestamp: int, *values):
+        for tier in self.tiers:
+            tier.add(timestamp, *values)
+        self.latest = timestamp
+
+    def time_range(self) -> Optional[Tuple[float, float]]:
+        """
+        :return: the time of the oldest and of the latest data known, None if there's no data
+        """
+        oldest = [tier.oldest() for tier in self.tiers if tier.oldest() is not None]
+        latest = [self.latest] if self.latest is not None else []
+        if len(self.raw) > 0:
+            oldest.append(self.raw[0][0])
+            latest.append(self.raw[-1][0])
+        if not oldest:
+            return None
+        return min(oldest), max(latest)
+
+    def select_tier(self, start: float, end: float, resolution: float) -> Optional[RollupTier]:
+        """
+        :param start: the start of the time range wanted
+        :param end: the end of the time range wanted
+        :param resolution: the duration in seconds represented by one point of the display
+        :return: the coarsest tier whose resolution is fine enough, None if it's the raw history
+        """
+        selected = None
+        for tier in self.tiers:
+            if tier.resolution <= resolution and tier.oldest() is not None:
+                selected = tier
+        # the raw history may not go as far back as the range asked, in that case we use a rollup tier even if it's
+        # coarser than wanted
+        if selected is None and (len(self.raw) == 0 or self.raw[0][0] > start):
+            selected = next((tier for tier in self.tiers if tier.oldest() is not None), None)
+        return selected
+
+    def get_points(self, start: float, end: float, resolution: float) -> List[Tuple[float, float]]:
+        """
+        :return: the points to display for the time range, from the coarsest tier fine enough for the resolution
+        """
+        tier = self.select_tier(start, end, resolution)
+        if tier is None:
+            return self.raw_points(start, end)
+        return [self.rollup_point(rollup) for rollup in tier.get_rollups(start, end)]
+
+    def raw_points(self, start: float, end: float) -> List[Tuple[float, float]]:
+        raise NotImplementedError
+
+    def rollup_point(self, rollup) -> Tuple[float, float]:
+        raise NotImplementedError
+
+
+class PingRollups(Rollups):
+
+    def __init__(self, raw: TimeSeriesRingBuffer):
+        super().__init__(PingBucket, raw)
+
+    def raw_points(self, start: float, end: float) -> List[Tuple[float, float]]:
+        # timeouts are displayed as a ping of 0
+        return [(timestamp, max(0, ping)) for timestamp, ping in self.raw.slice(start, end)]
+
+    def rollup_point(self, rollup: PingRollup) -> Tuple[float, float]:
+        return rollup.start, max(0, rollup.mean_ping)
+
+
+class BandwidthRollups(Rollups):
+    """
+    The rollups of the bandwidth are computed from the differences between two consecutive samples, so they stay
+    correct whatever the bucket a sample falls in
+    """
+
+    def __init__(self, raw: TimeSeriesRingBuffer):
+        super().__init__(BandwidthBucket, raw)
+        self.previous: Optional[Tuple[int, float]] = None
+
+    def add_total(self, timestamp: int, total_use: float):
+        """
+        :param timestamp: the time of the sample
+        :param total_use: the total network use in Kbits since the start of the monitoring
+        """
+        if self.previous is not None:
+            previous_time, previous_total = self.previous
+            self.add(timestamp, total_use - previous_total, timestamp - previous_time)
+        self.previous = (timestamp, total_use)
+
+    def raw_points(self, start: float, end: float) -> List[Tuple[float, float]]:
+        points = []
+        # the speed at a sample is computed with the sample before it, even if that one is out of the range
+        first = max(0, self.raw.index_of(start) - 1)
+        previous = None
+        for i in range(first, self.raw.index_of(end, after=True)):
+            timestamp, total = self.raw[i]
+            if previous is not None and timestamp > previous[0]:
+                points.append((timestamp, (total - previous[1]) / (timestamp - previous[0])))
+            previous = (timestamp, total)
+        return points
+
+    def rollup_point(self, rollup: BandwidthRollup) -> Tuple[float, float]:
+        return rollup.start, rollup.speed()
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from typing import Optional
+
+
+# the latest timestamp returned and the monotonic time it was taken at
+last_timestamp: Optional[float] = None
+last_monotonic: float = 0
+
+# the smallest step between two timestamps, they are rounded to the millisecond
+TIMESTAMP_RESOLUTION = 0.001
+
+
+def get_timestamp() -> float:
+    """
+    The recorded timestamps follow the wall clock, so they stay right after a step forward of the system clock or a
+    suspend of the machine, but they never go back: after a step back of the system clock they keep going forward
+    with the monotonic clock until the wall clock catches up, so the durations between the samples stay positive
+    and the histories stay sorted
+
+    :return: the current time in seconds since epoch, with a millisecond precision, always after the previous one
+    """
+    global last_timestamp, last_monotonic
+    now = round(time.time(), 3)
+    monotonic = time.monotonic()
+    if last_timestamp is not None and now <= last_timestamp:
+        now = round(last_timestamp + max(monotonic - last_monotonic, TIMESTAMP_RESOLUTION), 3)
+    last_timestamp, last_monotonic = now, monotonic
+    return now
+
+
+class PeriodicScheduler:
+    """
+    Wakes up a loop at fixed deadlines (start + n * period) measured with the monotonic clock of the event loop,
+    so the duration of the work done at each tick doesn't shift the following ones and changes of the system
+    clock have no effect.
+    When the work takes longer than a period, the deadlines that are already over are skipped and counted as
+    missed instead of being run late one after the other.
+    """
+
+    def __init__(self, period: float):
+        """
+        :param period: the time in seconds between two ticks
+        """
+        self.period = period
+        self.next_deadline: Optional[float] = None
+        self.nb_ticks = 0
+        self.missed_ticks = 0
+        # how late the loop was woken up compared to the deadline, in seconds
+        self.last_jitter: float = 0
+        self.max_jitter: float = 0
+        self.total_jitter: float = 0
+
+    async def wait_next_tick(self):
+        """
+        Waits until the next deadline, the first tick happens right away
+        """
+        loop = asyncio.get_event_loop()
+        if self.next_deadline is None:
+            self.next_deadline = loop.time()
+        else:
+            self.next_deadline += self.period
+            late = loop.time() - self.next_deadline
+            if late >= self.period:
+                missed = int(late // self.period)
+                self.missed_ticks += missed
+                self.next_deadline += missed * self.period
+            await asyncio.sleep(max(0., self.next_deadline - loop.time()))
+
+        self.last_jitter = max(0., loop.time() - self.next_deadline)
+        self.max_jitter = max(self.max_jitter, self.last_jitter)
+        self.total_jitter += self.last_jitter
+        self.nb_ticks += 1
+
+    def average_jitter(self) -> float:
+        return self.total_jitter / self.nb_ticks if self.nb_ticks else 0
@@ -0,0 +1,178 @@
+import gzip
+import json
+import os
+import shutil
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+from history_store import read_history
+
+# When the saving files are rotated, each closed file (a segment) is listed in an index saved next to the file, in a
+# file with the same name followed by .index. The index has one json object per line with the time range of the
+# segment and a summary of its values, so a time range can be read without opening the segments outside of it.
+
+
+def index_path(path: str) -> str:
+    """
+    :param path: the path of a saving file
+    :return: the path of the index of its segments
+    """
+    return f"{path}.index"
+
+
+class SegmentSummary:
+    """
+    The time range and a summary of the values of a segment, built while its samples are written
+    """
+
+    def __init__(self, path: str = "", start: Optional[float] = None, end: Optional[float] = None,
+                 nb_samples: int = 0, min_value: Optional[float] = None, max_value: Optional[float] = None,
+                 total: float = 0, nb_failed: int = 0):
+        """
+        :param path: the name of the segment file, relative to the directory of the index
+        :param start: the time of the first sample, None if the segment is empty or its start is unknown
+        :param end: the time of the last sample
+        :param nb_failed: the number of negative values (failed checks in internet files)
+        """
+        self.path = path
+        self.start = start
+        self.end = end
+        self.nb_samples = nb_samples
+        self.min_value = min_value
+        self.max_value = max_value
+        self.total = total
+        self.nb_failed = nb_failed
+        # set when some samples of the segment couldn't be read, its time range can't be trusted
+        self.unknown_range = False
+
+    def add(self, timestamp: float, value: Union[int, float]):
+        if self.start is None:
+            self.start = timestamp
+        self.end = timestamp
+        self.nb_samples += 1
+        self.total += value
+        if value < 0:
+            self.nb_failed += 1
+        if self.min_value is None or value < self.min_value:
+            self.min_value = value
+        if self.max_value is None or value > self.max_value:
+            self.max_value = value
+
+    def overlaps(self, start: Optional[float], end: Optional[float]) -> bool:
+        """
+        :return: True if the segment may contain samples between start and end (None for no limit)
+        """
+        if self.unknown_range or self.start is None:
+            return True
+        return (start is None or self.end >= start) and (end is None or self.start <= end)
+
+    def to_dict(self) -> dict:
+        return {"path": self.path, "start": None if self.unknown_range else self.start,
+                "end": None if self.unknown_range else self.end, "nb_samples": self.nb_samples,
+                "min": self.min_value, "max": self.max_value,
+                "mean": self.total / self.nb_samples if self.nb_samples else None, "nb_failed": self.nb_failed}
+
+    @staticmethod
+    def from_dict(values: dict) -> "SegmentSummary":
+        summary = SegmentSummary(values["path"], values["start"], values["end"], values["nb_samples"],
+                                 values["min"], values["max"], (values["mean"] or 0) * values["nb_samples"],
+                                 values["nb_failed"])
+        summary.unknown_range = values["start"] is None and values["nb_samples"] > 0
+        return summary
+
+
+def summarize_file(path: str) -> SegmentSummary:
+    """
+    :return: the summary of the samples already in a file, with an unknown time range if it can't be read
+    """
+    summary = SegmentSummary(os.path.basename(path))
+    try:
+        for timestamp, value in read_history(path):
+            summary.add(timestamp, value)
+    except ValueError:
+        summary.unknown_range = True
+    return summary
+
+
+def append_to_index(path: str, summary: SegmentSummary):
+    """
+    Adds a closed segment to the index of the saving file path
+    """
+    with open(index_path(path), "a") as f:
+        f.write(json.dumps(summary.to_dict()) + "\n")
+
+
+def read_index(path: str) -> List[SegmentSummary]:
+    """
+    :return: the segments listed in the index of the saving file path, sorted by start time, nothing if it has no
+        index
+    """
+    if not os.path.exists(index_path(path)):
+        return []
+    segments = []
+    with open(index_path(path), "r") as f:
+        for line in f:
+            # a line cut by a crash while it was written is ignored
+            try:
+                segments.append(SegmentSummary.from_dict(json.loads(line)))
+            except (ValueError, KeyError):
+                continue
+    segments.sort(key=lambda segment: -float("inf") if segment.start is None else segment.start)
+    return segments
+
+
+def compress_segment(path: str) -> str:
+    """
+    Compresses a closed segment with gzip. The compressed file is only put in place once complete, and the segment
+    is removed afterwards, so one of them is always complete.
+
+    :return: the path of the compressed segment
+    """
+    compressed_path = f"{path}.gz"
+    with open(path, "rb") as source, gzip.open(f"{compressed_path}.tmp", "wb") as destination:
+        shutil.copyfileobj(source, destination)
+    os.replace(f"{compressed_path}.tmp", compressed_path)
+    os.remove(path)
+    return compressed_path
+
+
+def resolve_segment(path: str, segment: SegmentSummary) -> Optional[str]:
+    """
+    :param path: the saving file the segment comes from
+    :return: the path of the segment file, which may still be uncompressed if its compression didn't finish, None
+        if it was deleted
+    """
+    segment_path = os.path.join(os.path.dirname(path), segment.path)
+    if os.path.exists(segment_path):
+        return segment_path
+    if segment_path.endswith(".gz") and os.path.exists(segment_path[:-len(".gz")]):
+        return segment_path[:-len(".gz")]
+    return None
+
+
+def read_history_range(path: str, start: Optional[float] = None, end: Optional[float] = None,
+                       on_invalid_row: Optional[Callable[[str, int, str], None]] = None, round_values: bool = False) \
+        -> Iterator[Tuple[float, Union[int, float]]]:
+    """
+    Reads the samples of a saving file and of its closed segments between two times, only the segments overlapping
+    the time range are opened
+
+    :param path: the path of the saving file, its segments are found with its index
+    :param start: the time of the first samples wanted, None to start from the beginning
+    :param end: the time of the last samples wanted, None to read until the end
+    :param on_invalid_row: called with the path, the number and the content of every csv row skipped
+    :param round_values: whether the values with decimals of csv files are rounded (see CsvHistoryReader)
+    :return: an iterator over the pairs of timestamp and value in the time range, in chronological order
+    """
+    paths = [resolve_segment(path, segment) for segment in read_index(path) if segment.overlaps(start, end)]
+    # the file being written, read even if it has no segment so a missing file is reported
+    if os.path.exists(path) or not paths:
+        paths.append(path)
+    for segment_path in paths:
+        if segment_path is None:
+            continue
+        for timestamp, value in read_history(segment_path, on_invalid_row, round_values):
+            if end is not None and timestamp > end:
+                # the samples of a file are in chronological order, nothing after this one is wanted
+                break
+            if start is None or timestamp >= start:
+                yield timestamp, value
@@ -0,0 +1,141 @@
+import sqlite3
+from typing import Iterator, List, Optional, Tuple, Union
+from urllib.parse import quote
+
+from history_store import INTERNET_MAGIC, BANDWIDTH_MAGIC
+from log_writer import GroupCommit
+from outage_index import OutageIndex
+
+# The internet and bandwidth histories can also be saved in a SQLite database (--database), with an index on the time so
+# a time range is read without scanning the whole history. The disconnection periods are saved in their own table
+# as they happen, so questions like "the disconnections longer than a minute last week" are a single query.
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+# the table and the column of the values of each kind of history
+TABLES = {INTERNET_MAGIC: ("internet", "ping"), BANDWIDTH_MAGIC: ("bandwidth", "use")}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS internet (timestamp REAL NOT NULL, ping INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS internet_timestamp ON internet (timestamp);
+CREATE TABLE IF NOT EXISTS bandwidth (timestamp REAL NOT NULL, use REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS bandwidth_timestamp ON bandwidth (timestamp);
+CREATE TABLE IF NOT EXISTS outages (start_time REAL NOT NULL, end_time REAL NOT NULL, duration REAL NOT NULL,
+                                    nb_samples INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS outages_start_time ON outages (start_time);
+"""
+
+
+def is_database(path: str) -> bool:
+    """
+    :return: True if the file is a SQLite database
+    """
+    with open(path, "rb") as f:
+        return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+
+
+class HistoryDatabase:
+    """
+    A SQLite database the histories are saved in, in WAL mode so it can be read while the program writes to it
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # in WAL mode, a commit is only synced to the disk at checkpoints, which is enough since the samples waiting
+        # in memory would be lost anyway if the program is killed
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def insert(self, magic: bytes, samples: List[Tuple[float, Union[int, float]]],
+               outages: List[Tuple[float, float, float, int]]):
+        """
+        Inserts samples and disconnection periods in a single transaction
+
+        :param magic: the kind of history (INTERNET_MAGIC or BANDWIDTH_MAGIC)
+        :param samples: the (timestamp, value) pairs to insert
+        :param outages: the (start, end, duration, number of failed checks) of the disconnection periods to insert
+        """
+        table, column = TABLES[magic]
+        with self.connection:
+            self.connection.executemany(f"INSERT INTO {table} (timestamp, {column}) VALUES (?, ?)", samples)
+            if outages:
+                self.connection.executemany("INSERT INTO outages (start_time, end_time, duration, nb_samples) "
+                                            "VALUES (?, ?, ?, ?)", outages)
+
+    def close(self):
+        self.connection.close()
+
+
+class DatabaseWriter(GroupCommit):
+    """
+    Inserts samples in a history database in groups (see GroupCommit), one transaction per group. For the internet
+    history, the disconnection periods are followed by an OutageIndex as the samples are written and saved when
+    they're over.
+    """
+
+    def __init__(self, database: HistoryDatabase, magic: bytes, commit_records: int = 100,
+                 commit_interval: float = 60):
+        """
+        :param database: the database to insert into
+        :param magic: the kind of history (INTERNET_MAGIC or BANDWIDTH_MAGIC)
+        """
+        super().__init__(commit_records, commit_interval)
+        self.database = database
+        self.magic = magic
+        self.outages = OutageIndex()
+
+    def write(self, samples: List[Tuple[float, Union[int, float]]]):
+        outages = []
+        if self.magic == INTERNET_MAGIC:
+            for timestamp, ping in samples:
+                finished = self.outages.add(timestamp, ping)
+                if finished is not None:
+                    outages.append(self.outages.get(finished))
+        self.database.insert(self.magic, samples, outages)
+
+    def close(self):
+        super().close()
+        # a disconnection still in progress is saved as ending at the last check, like at the end of a history
+        current = self.outages.current()
+        if current is not None:
+            self.database.insert(self.magic, [], [current])
+
+
+def load_outages(path: str) -> OutageIndex:
+    """
+    :param path: the path of a database, opened read only
+    :return: the index of the disconnection periods saved in the database
+    """
+    outages = OutageIndex()
+    connection = sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True)
+    try:
+        for start, end, nb_samples in connection.execute("SELECT start_time, end_time, nb_samples FROM outages "
+                                                         "ORDER BY start_time"):
+            outages.add_outage(start, end, nb_samples)
+    finally:
+        connection.close()
+    return outages
+
+
+def read_database(path: str, magic: bytes, start: Optional[float] = None, end: Optional[float] = None) \
+        -> Iterator[Tuple[float, Union[int, float]]]:
+    """
+    Reads a history from a database with a single query on a time range, using the index on the time
+
+    :param path: the path of the database, opened read only
+    :param magic: the kind of history (INTERNET_MAGIC or BANDWIDTH_MAGIC)
+    :param start: the time of the first samples wanted, None to start from the beginning
+    :param end: the time of the last samples wanted, None to read until the end
+    :return: an iterator over the pairs of timestamp and value in the time range, in chronological order
+    """
+    table, column = TABLES[magic]
+    connection = sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True)
+    try:
+        cursor = connection.execute(f"SELECT timestamp, {column} FROM {table} WHERE timestamp BETWEEN ? AND ? "
+                                    f"ORDER BY timestamp", (-float("inf") if start is None else start,
+                                                            float("inf") if end is None else end))
+        yield from cursor
+    finally:
+        connection.close()
@@ -0,0 +1,402 @@
+import bisect
+import math
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Structures computing statistics over a stream of samples, updated in constant (or logarithmic) time per sample
+# whatever the number of samples already seen.
+
+# durations in seconds of the sliding windows over which the recent statistics are computed by default
+DEFAULT_WINDOWS = [60, 15 * 60, 3600]
+
+
+class SlidingMax:
+    """
+    Maximum of the values of a sliding time window, kept in a monotonic deque: a value is dropped as soon as a
+    greater one arrives after it since it can't be the maximum anymore, so each value is added and removed once.
+    """
+
+    def __init__(self):
+        self.candidates: Deque[Tuple[float, float]] = deque()
+
+    def add(self, timestamp: float, value: float):
+        while self.candidates and self.candidates[-1][1] <= value:
+            self.candidates.pop()
+        self.candidates.append((timestamp, value))
+
+    def evict(self, oldest: float):
+        """
+        Drops the values older than the oldest timestamp of the window
+        """
+        while self.candidates and self.candidates[0][0] < oldest:
+            self.candidates.popleft()
+
+    def max(self) -> Optional[float]:
+        return self.candidates[0][1] if self.candidates else None
+
+
+class LogHistogram:
+    """
+    Quantile sketch in the manner of DDSketch: the positive values are counted in buckets whose bounds grow
+    geometrically, so any quantile is known with a relative error of at most relative_accuracy while the number of
+    buckets only grows with the logarithm of the range of the values. Values can be removed as well as added, which
+    lets the sketch follow a sliding window.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.counts: Dict[int, int] = {}
+        # the indexes of the buckets that are not empty, in increasing order
+        self.indexes: List[int] = []
+        # values lower or equal to 0 can't be put in a logarithmic bucket, they are counted in a bucket of their own
+        self.zero_count = 0
+        self.count = 0
+
+    def index(self, value: float) -> Optional[int]:
+        """
+        :return: the index of the bucket of the value, None for the zero bucket
+        """
+        return math.ceil(math.log(value) / self.log_gamma) if value > 0 else None
+
+    def add(self, value: float, index: Optional[int] = None):
+        """
+        :param value: the value to add
+        :param index: the index of the bucket of the value if it's already known, to avoid computing it again
+        """
+        self.add_to_bucket(self.index(value) if index is None else index)
+
+    def remove(self, value: float, index: Optional[int] = None):
+        """
+        Removes a value previously added
+
+        :param value: the value to remove
+        :param index: the index of the bucket of the value if it's already known, to avoid computing it again
+        """
+        self.remove_from_bucket(self.index(value) if index is None else index)
+
+    def add_to_bucket(self, index: Optional[int]):
+        self.count += 1
+        if index is None:
+            self.zero_count += 1
+        elif index in self.counts:
+            self.counts[index] += 1
+        else:
+            self.counts[index] = 1
+            bisect.insort(self.indexes, index)
+
+    def remove_from_bucket(self, index: Optional[int]):
+        self.count -= 1
+        if index is None:
+            self.zero_count -= 1
+            return
+        count = self.counts[index] - 1
+        if count:
+            self.counts[index] = count
+        else:
+            del self.counts[index]
+            del self.indexes[bisect.bisect_left(self.indexes, index)]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        :param q: the quantile wanted, between 0 and 1
+        :return: an estimation of the quantile of the values, None if there's no value
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0
+        seen = self.zero_count
+        for index in self.indexes:
+            seen += self.counts[index]
+            if seen > rank:
+                # middle of the bucket, in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** self.indexes[-1] / (self.gamma + 1)
+
+
+class Ewma:
+    """
+    Exponentially weighted moving average of irregularly spaced samples: the weight of a sample decreases with its
+    age, by a factor e every time_constant seconds
+    """
+
+    def __init__(self, time_constant: float):
+        self.time_constant = time_constant
+        self.value: Optional[float] = None
+        self.last_time: Optional[float] = None
+        # the samples usually come at a fixed interval, so the weight of the last interval is reused
+        self.last_interval: Optional[float] = None
+        self.last_weight: float = 0
+
+    def add(self, timestamp: float, value: float):
+        if self.value is None:
+            self.value = value
+        else:
+            interval = timestamp - self.last_time
+            if interval != self.last_interval:
+                self.last_interval = interval
+                self.last_weight = 1 - math.exp(-max(0., interval) / self.time_constant)
+            self.value += self.last_weight * (value - self.value)
+        self.last_time = timestamp
+
+
+class WindowStatistics:
+    """
+    Statistics of the values of a sliding window
+    """
+
+    def __init__(self, duration: float, nb_samples: int, peak: float, p50: float, p95: float, ewma: float):
+        self.duration = duration
+        self.nb_samples = nb_samples
+        self.peak = peak
+        self.p50 = p50
+        self.p95 = p95
+        self.ewma = ewma
+
+
+class SlidingWindow:
+    """
+    Maintains the peak, the median and the 95th percentile of the values of the last duration seconds, and a moving
+    average whose time constant is the duration. The samples of the window are kept to be removed from the sketch
+    once they leave the window, so the memory used depends on the duration of the window and not on the time the
+    program has been running.
+    """
+
+    def __init__(self, duration: float):
+        self.duration = duration
+        # timestamp and bucket index in the histogram of each sample of the window
+        self.samples: Deque[Tuple[float, Optional[int]]] = deque()
+        self.peak = SlidingMax()
+        self.histogram = LogHistogram()
+        self.ewma = Ewma(duration)
+
+    def clear(self):
+        """
+        Empties the window, the moving average is kept
+        """
+        self.samples = deque()
+        self.peak = SlidingMax()
+        self.histogram = LogHistogram()
+
+    def add(self, timestamp: float, value: float, index: Optional[int] = None):
+        """
+        Adds a sample to the window, without updating the moving average (see Ewma.add)
+
+        :param timestamp: the time of the sample, samples must be added in chronological order
+        :param value: the value of the sample
+        :param index: the index of the bucket of the value in the histogram if it's already known (the windows
+            with the same relative accuracy share the same buckets)
+        """
+        if index is None:
+            index = self.histogram.index(value)
+        self.samples.append((timestamp, index))
+        self.peak.add(timestamp, value)
+        self.histogram.add_to_bucket(index)
+        oldest = timestamp - self.duration
+        samples = self.samples
+        while samples[0][0] < oldest:
+            self.histogram.remove_from_bucket(samples.popleft()[1])
+        self.peak.evict(oldest)
+
+    def get_statistics(self) -> WindowStatistics:
+        if not self.samples:
+            return WindowStatistics(self.duration, 0, 0, 0, 0, 0)
+        return WindowStatistics(self.duration, len(self.samples), self.peak.max(), self.histogram.quantile(0.5),
+                                self.histogram.quantile(0.95), self.ewma.value)
+
+
+class SlidingWindows:
+    """
+    Several sliding windows of different durations over the same values.
+    The samples are only put in the windows when their statistics are asked: until then they are kept in a queue
+    holding at most the duration of the longest window, so reading a long history costs almost nothing more than
+    putting the samples of its end in the windows. The moving averages are still updated for every sample.
+    """
+
+    def __init__(self, durations: List[float]):
+        self.windows = [SlidingWindow(duration) for duration in durations]
+        self.longest = max(durations, default=0)
+        self.pending: Deque[Tuple[float, float]] = deque()
+        # whether samples of the queue were dropped before being put in the windows
+        self.skipped = False
+
+    def add(self, timestamp: float, value: float):
+        if not self.windows:
+            return
+        for window in self.windows:
+            window.ewma.add(timestamp, value)
+        pending = self.pending
+        pending.append((timestamp, value))
+        oldest = timestamp - self.longest
+        while pending[0][0] < oldest:
+            pending.popleft()
+            self.skipped = True
+
+    def flush(self):
+        """
+        Puts the samples of the queue in the windows
+        """
+        if self.skipped:
+            # what's in the windows is older than the samples dropped from the queue, so it's out of every window
+            for window in self.windows:
+                window.clear()
+            self.skipped = False
+        for timestamp, value in self.pending:
+            # the windows share the same buckets, the index of a value is only computed once
+            index = self.windows[0].histogram.index(value)
+            for window in self.windows:
+                window.add(timestamp, value, index)
+        self.pending.clear()
+
+    def get_statistics(self) -> List[WindowStatistics]:
+        self.flush()
+        return [window.get_statistics() for window in self.windows]
+
+
+class LatencyStatistics:
+    """
+    Percentiles, jitter and loss of the pings of a window of time (or of the whole life of the program)
+    """
+
+    def __init__(self, duration: Optional[float], nb_samples: int, p50: float, p95: float, p99: float,
+                 jitter: float, loss_ratio: float):
+        # None for the statistics of the whole life of the program
+        self.duration = duration
+        self.nb_samples = nb_samples
+        # -1 when no ping succeeded
+        self.p50 = p50
+        self.p95 = p95
+        self.p99 = p99
+        self.jitter = jitter
+        self.loss_ratio = loss_ratio
+
+
+class LatencyWindow:
+    """
+    Maintains the percentiles of the pings, their average variation between two consecutive successful pings (the
+    jitter) and the ratio of failed pings, over the last duration seconds or over all the pings if there's no
+    duration. A window without duration doesn't keep its samples, its memory only grows with the number of buckets
+    of its histogram.
+    """
+
+    def __init__(self, duration: Optional[float] = None):
+        self.duration = duration
+        # timestamp, whether the ping failed, bucket index and variation since the previous successful ping of each
+        # sample of the window
+        self.samples: Deque[Tuple[float, bool, Optional[int], Optional[float]]] = deque()
+        self.histogram = LogHistogram()
+        self.nb_samples = 0
+        self.nb_lost = 0
+        self.total_variation: float = 0
+        self.nb_variations = 0
+
+    def clear(self):
+        self.samples = deque()
+        self.histogram = LogHistogram()
+        self.nb_samples = 0
+        self.nb_lost = 0
+        self.total_variation = 0
+        self.nb_variations = 0
+
+    def add(self, timestamp: float, lost: bool, index: Optional[int], variation: Optional[float]):
+        """
+        :param timestamp: the time of the ping, pings must be added in chronological order
+        :param lost: whether the ping failed, it's then not put in the histogram
+        :param index: the index of the bucket of the ping in the histogram, None for the zero bucket (pings of 0ms)
+        :param variation: the absolute difference with the previous successful ping, None if there's none
+        """
+        self.add_sample(lost, index, variation, 1)
+        if self.duration is None:
+            return
+        samples = self.samples
+        samples.append((timestamp, lost, index, variation))
+        oldest = timestamp - self.duration
+        while samples[0][0] < oldest:
+            _, old_lost, old_index, old_variation = samples.popleft()
+            self.add_sample(old_lost, old_index, old_variation, -1)
+
+    def add_sample(self, lost: bool, index: Optional[int], variation: Optional[float], sign: int):
+        # adds the sample if sign is 1, removes it if sign is -1
+        self.nb_samples += sign
+        if lost:
+            self.nb_lost += sign
+        elif sign > 0:
+            self.histogram.add_to_bucket(index)
+        else:
+            self.histogram.remove_from_bucket(index)
+        if variation is not None:
+            self.total_variation += sign * variation
+            self.nb_variations += sign
+
+    def get_statistics(self) -> LatencyStatistics:
+        if self.histogram.count == 0:
+            p50 = p95 = p99 = -1
+        else:
+            p50, p95, p99 = [self.histogram.quantile(q) for q in [0.5, 0.95, 0.99]]
+        # the sum of the variations is updated incrementally, it can drift slightly below 0 with rounding errors
+        jitter = max(0., self.total_variation / self.nb_variations) if self.nb_variations else 0
+        loss_ratio = self.nb_lost / self.nb_samples if self.nb_samples else 0
+        return LatencyStatistics(self.duration, self.nb_samples, p50, p95, p99, jitter, loss_ratio)
+
+
+class LatencyWindows:
+    """
+    Latency statistics of the pings over several sliding windows and over the whole life of the program, plus the
+    interarrival jitter estimator of RFC 3550 (J += (|D| - J) / 16, D being the difference between two consecutive
+    successful pings).
+    Like in SlidingWindows, the pings are only put in the sliding windows when their statistics are asked.
+    """
+
+    def __init__(self, durations: List[float]):
+        self.lifetime = LatencyWindow()
+        self.windows = [LatencyWindow(duration) for duration in durations]
+        self.longest = max(durations, default=0)
+        self.pending: Deque[Tuple[float, bool, Optional[int], Optional[float]]] = deque()
+        self.skipped = False
+        self.previous_ping: Optional[float] = None
+        self.jitter: float = 0
+
+    def add(self, timestamp: float, ping: float):
+        """
+        :param timestamp: the time of the ping
+        :param ping: the ping, negative if it failed (a ping of 0ms succeeded, it's put in the zero bucket)
+        """
+        lost = ping < 0
+        index = None if lost else self.lifetime.histogram.index(ping)
+        variation = None
+        if not lost:
+            if self.previous_ping is not None:
+                variation = abs(ping - self.previous_ping)
+                self.jitter += (variation - self.jitter) / 16
+            self.previous_ping = ping
+        self.lifetime.add(timestamp, lost, index, variation)
+        if not self.windows:
+            return
+        pending = self.pending
+        pending.append((timestamp, lost, index, variation))
+        oldest = timestamp - self.longest
+        while pending[0][0] < oldest:
+            pending.popleft()
+            self.skipped = True
+
+    def flush(self):
+        """
+        Puts the pings of the queue in the sliding windows
+        """
+        if self.skipped:
+            for window in self.windows:
+                window.clear()
+            self.skipped = False
+        for sample in self.pending:
+            for window in self.windows:
+                window.add(*sample)
+        self.pending.clear()
+
+    def get_statistics(self) -> Tuple[LatencyStatistics, List[LatencyStatistics]]:
+        """
+        :return: the statistics over the whole life of the program and the statistics of each sliding window
+        """
+        self.flush()
+        return self.lifetime.get_statistics(), [window.get_statistics() for window in self.windows]
@@ -0,0 +1,41 @@
+from bandwidth_statistics import CumulativeCounter, stitch_resets
+
+
+def test_counter_from_first_reading():
+    counter = CumulativeCounter()
+    assert counter.update(1000) == 0
+    assert counter.update(1500) == 500
+    assert counter.update(1500) == 500
+    assert counter.update(2000) == 1000
+
+
+def test_counter_reset():
+    counter = CumulativeCounter(1000)
+    assert counter.update(1500) == 500
+    # reboot: the counter starts again from 0, the use since then is counted
+    assert counter.update(200) == 700
+    assert counter.update(700) == 1200
+    # wrap around of a 32 bits counter
+    counter = CumulativeCounter(2 ** 32 - 100)
+    assert counter.update(2 ** 32 - 50) == 50
+    assert counter.update(30) == 80
+
+
+def test_counter_total_never_decreases():
+    counter = CumulativeCounter(0)
+    totals = [counter.update(value) for value in [10, 50, 5, 5, 60, 0, 0, 40, 30]]
+    assert totals == sorted(totals)
+    assert totals[-1] == 50 + 60 + 40 + 30
+
+
+def test_stitch_resets():
+    # three runs of the program, each starting from 0
+    samples = [(0, 0), (10, 100), (20, 250), (30, 0), (40, 50), (50, 20), (60, 80)]
+    assert list(stitch_resets(samples)) == [(0, 0), (10, 100), (20, 250), (30, 250), (40, 300), (50, 320),
+                                            (60, 380)]
+
+
+def test_stitch_without_reset():
+    samples = [(0, 0), (10, 100), (20, 100), (30, 150)]
+    assert list(stitch_resets(samples)) == samples
+    assert list(stitch_resets([])) == []
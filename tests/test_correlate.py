@@ -0,0 +1,54 @@
+from main_correlate import ALL_PROBES, correlate_outages
+
+
+def write_probe(path: str, start: int, end: int, down):
+    """
+    Writes an internet file with a check every 10s from start to end (excluded), failing during the (start, end)
+    periods of down
+    """
+    with open(path, "w") as f:
+        for timestamp in range(start, end, 10):
+            failed = any(down_start <= timestamp < down_end for down_start, down_end in down)
+            f.write(f"{timestamp},{-1 if failed else 20}\n")
+
+
+def summarize(outages):
+    return sorted((outage.probe, outage.start, outage.end, outage.others_down_duration, outage.all_down_duration,
+                   outage.classification()) for outage in outages)
+
+
+def test_classification(tmp_path):
+    paths = [str(tmp_path / f"{name}.csv") for name in "abc"]
+    # every probe is down from 50 to 80, a and b from 110 to 140, c alone from 160 to 180
+    write_probe(paths[0], 0, 200, [(50, 80), (110, 140)])
+    write_probe(paths[1], 0, 200, [(50, 80), (110, 140)])
+    write_probe(paths[2], 0, 200, [(50, 80), (160, 180)])
+    assert summarize(correlate_outages(paths, ["a", "b", "c"])) == [
+        (ALL_PROBES, 50, 80, 30, 30, "global"),
+        ("a", 50, 80, 30, 30, "global"),
+        ("a", 110, 140, 30, 0, "partial"),
+        ("b", 50, 80, 30, 30, "global"),
+        ("b", 110, 140, 30, 0, "partial"),
+        ("c", 50, 80, 30, 30, "global"),
+        ("c", 160, 180, 0, 0, "local"),
+    ]
+
+
+def test_overlapping_outages(tmp_path):
+    paths = [str(tmp_path / f"{name}.csv") for name in "ab"]
+    # b is down during a part of the outage of a only
+    write_probe(paths[0], 0, 200, [(50, 120)])
+    write_probe(paths[1], 0, 200, [(100, 150)])
+    assert summarize(correlate_outages(paths, ["a", "b"])) == [
+        (ALL_PROBES, 100, 120, 20, 20, "global"),
+        ("a", 50, 120, 20, 20, "global"),
+        ("b", 100, 150, 20, 20, "global"),
+    ]
+
+
+def test_only_the_probes_monitoring_count(tmp_path):
+    paths = [str(tmp_path / f"{name}.csv") for name in "ab"]
+    # b stops monitoring at 90: a is alone when it's down
+    write_probe(paths[0], 0, 200, [(110, 140)])
+    write_probe(paths[1], 0, 100, [])
+    assert summarize(correlate_outages(paths)) == [("a", 110, 140, 0, 0, "local")]
@@ -0,0 +1,84 @@
+import math
+import random
+
+from decimation import IncrementalDecimation, lttb, min_max
+
+
+def make_points(nb_points: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [(float(i), math.sin(i / 50) * 100 + rng.uniform(-10, 10)) for i in range(nb_points)]
+
+
+def test_lttb_keeps_endpoints_and_number_of_points():
+    points = make_points(10000)
+    for threshold in [3, 10, 500, 9999]:
+        sampled = lttb(points, threshold)
+        assert len(sampled) == threshold
+        assert sampled[0] == points[0]
+        assert sampled[-1] == points[-1]
+        # points of the series, in order
+        assert all(point in points for point in sampled)
+        assert sampled == sorted(sampled)
+
+
+def test_lttb_keeps_a_spike():
+    points = [(float(i), 0.) for i in range(1000)]
+    points[567] = (567., 1000.)
+    assert (567., 1000.) in lttb(points, 20)
+
+
+def test_lttb_nothing_to_downsample():
+    points = make_points(100)
+    assert lttb(points, 100) == points
+    assert lttb(points, 200) == points
+    assert lttb(points, 2) == points
+    assert lttb([], 10) == []
+
+
+def test_min_max():
+    points = make_points(10000)
+    sampled = min_max(points, 0, 10000, 100)
+    assert len(sampled) <= 200
+    assert sampled == sorted(sampled)
+    # the lowest and highest points of every bucket are kept
+    buckets = {}
+    for point in points:
+        buckets.setdefault(int(point[0] / 10000 * 100), []).append(point)
+    assert len(buckets) == 100
+    for values in buckets.values():
+        assert min(values, key=lambda point: point[1]) in sampled
+        assert max(values, key=lambda point: point[1]) in sampled
+    assert min_max(points[:150], 0, 150, 100) == points[:150]
+
+
+def test_incremental_decimation_grows():
+    points = make_points(20000, 1)
+    decimation = IncrementalDecimation(0, 10000, 100, use_lttb=False)
+    assert decimation.is_valid_for(0, 10000, 100)
+    for end in range(10000, 20000, 1000):
+        tail = [point for point in points if decimation.kept_end <= point[0] <= end]
+        sampled = decimation.points(tail, end)
+        assert sampled == sorted(sampled)
+        # the spikes are kept whether their bucket was decimated before or now
+        shown = points[:end + 1]
+        assert min(shown, key=lambda point: point[1]) in sampled
+        assert max(shown, key=lambda point: point[1]) in sampled
+        assert len(sampled) <= 2 * 100 * end / 10000 + 2
+    # the complete buckets were decimated once and kept
+    assert decimation.kept_end > 0
+    assert decimation.is_valid_for(0, 20000, 100)
+    assert not decimation.is_valid_for(0, 20001, 100)
+    assert not decimation.is_valid_for(1, 10000, 100)
+    assert not decimation.is_valid_for(0, 10000, 200)
+
+
+def test_incremental_decimation_with_lttb():
+    points = make_points(5000, 2)
+    decimation = IncrementalDecimation(0, 5000, 50, use_lttb=True)
+    sampled = decimation.points(points, 4999)
+    assert sampled[0] == points[0]
+    assert sampled[-1] == points[-1]
+    # the complete buckets are downsampled to a point each, the last bucket isn't complete yet
+    assert len(decimation.kept) == 49
+    assert sampled[:49] == decimation.kept
+    assert all(point in points for point in sampled)
@@ -0,0 +1,182 @@
+import gzip
+from datetime import datetime
+
+import pytest
+
+from client import Client
+from history_store import BANDWIDTH_MAGIC, FORMAT_VERSION, HEADER, INTERNET_MAGIC, RECORDS, BinaryHistoryReader, \
+    BinaryHistoryWriter, InvalidRowsCounter, convert_history, get_binary_format, read_history
+from vectorized_stats import numpy
+
+
+def write_file(path: str, content: str):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+class RecordingClient(Client):
+
+    def __init__(self):
+        self.statistics = None
+        self.history = []
+        self.nb_rows = 0
+        self.nb_invalid_rows = 0
+
+    def update_internet_statistics(self, stats):
+        self.statistics = stats
+
+    def update_internet_history(self, points):
+        self.history = points
+
+    def update_file_loaded(self, file_path, nb_rows, time_to_first_display, nb_invalid_rows=0):
+        self.nb_rows = nb_rows
+        self.nb_invalid_rows = nb_invalid_rows
+
+
+def test_csv_skips_invalid_rows(tmp_path):
+    path = str(tmp_path / "internet.csv")
+    write_file(path, "1700000000,12\n"
+                     "not a row\n"
+                     "\n"
+                     "1700000010,abc\n"
+                     "1700000020,-1\n"
+                     "1700000030,1,2\n"
+                     "1700000040,15\n"
+                     "1700000050,1")
+    invalid_rows = InvalidRowsCounter()
+    assert list(read_history(path, invalid_rows)) == [(1700000000, 12), (1700000020, -1), (1700000040, 15)]
+    # the empty line isn't counted, the last line has no end of line: it was cut while it was written
+    assert invalid_rows.count == 4
+
+
+def test_csv_decimals_and_datetimes(tmp_path):
+    path = str(tmp_path / "internet.csv")
+    write_file(path, "1700000000.5,1.5\n"
+                     f"{datetime.fromtimestamp(1700000010)},20\n")
+    samples = list(read_history(path))
+    assert samples == [(1700000000.5, 1.5), (1700000010, 20)]
+    assert isinstance(samples[1][1], int)
+    assert list(read_history(path, round_values=True)) == [(1700000000.5, 2), (1700000010, 20)]
+
+
+def test_compressed_csv(tmp_path):
+    path = str(tmp_path / "internet.csv.gz")
+    with gzip.open(path, "wt") as f:
+        f.write("1700000000,12\n1700000010,-1\n")
+    assert list(read_history(path)) == [(1700000000, 12), (1700000010, -1)]
+
+
+def test_convert_pings_with_decimals(tmp_path):
+    source = str(tmp_path / "internet.csv")
+    destination = str(tmp_path / "internet.bin")
+    write_file(source, "1700000000,12.5\n1700000010,-1\n1700000020,30.2\n")
+    assert convert_history(source, destination, INTERNET_MAGIC) == 3
+    assert list(read_history(destination)) == [(1700000000, 12), (1700000010, -1), (1700000020, 30)]
+
+
+def test_read_internet_file_with_decimals(tmp_path):
+    # utils needs psutil
+    pytest.importorskip("psutil")
+    from utils import read_internet_file
+    path = str(tmp_path / "internet.csv")
+    write_file(path, "1700000000,12.5\nnot a row\n1700000010,-1\n1700000020,30.2\n")
+    client = RecordingClient()
+    read_internet_file(client, path, False, 10)
+    assert client.nb_rows == 3
+    assert client.nb_invalid_rows == 1
+    assert client.statistics.nb_disconnection == 1
+    assert client.statistics.max_ping == 30
+    assert client.history
+
+
+def write_binary(path: str, magic: bytes, samples):
+    writer = BinaryHistoryWriter(path, magic)
+    for timestamp, value in samples:
+        writer.append(timestamp, value)
+    writer.close()
+
+
+@pytest.mark.parametrize("magic, samples", [
+    (INTERNET_MAGIC, [(1700000000.125, 12), (1700000010.5, -1), (1700000020, 30)]),
+    (BANDWIDTH_MAGIC, [(1700000000.125, 0.), (1700000010.5, 125.25), (1700000020, 300.5)]),
+])
+def test_binary_round_trip(tmp_path, magic, samples):
+    path = str(tmp_path / "history.bin")
+    write_binary(path, magic, samples[:2])
+    # appending to an existing file keeps its header
+    write_binary(path, magic, samples[2:])
+    with open(path, "rb") as f:
+        assert HEADER.unpack(f.read(HEADER.size)) == (magic, FORMAT_VERSION)
+    assert get_binary_format(path) == (magic, FORMAT_VERSION)
+    with BinaryHistoryReader(path) as reader:
+        assert len(reader) == 3
+        assert list(reader) == samples
+    assert list(read_history(path)) == samples
+
+
+def test_binary_version_1(tmp_path):
+    # the files saved before the timestamps were floats are still read and appended to in their version
+    path = str(tmp_path / "internet.bin")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(INTERNET_MAGIC, 1))
+        f.write(RECORDS[(INTERNET_MAGIC, 1)].pack(1700000000, 12))
+    write_binary(path, INTERNET_MAGIC, [(1700000010.6, -1)])
+    assert get_binary_format(path) == (INTERNET_MAGIC, 1)
+    with BinaryHistoryReader(path) as reader:
+        assert reader.version == 1
+        assert list(reader) == [(1700000000, 12), (1700000011, -1)]
+
+
+@pytest.mark.skipif(numpy is None, reason="numpy is not installed")
+@pytest.mark.parametrize("version", [1, 2])
+def test_binary_array_view(tmp_path, version):
+    path = str(tmp_path / "bandwidth.bin")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(BANDWIDTH_MAGIC, version))
+        for timestamp, use in [(1700000000, 0.), (1700000010, 125.5)]:
+            f.write(RECORDS[(BANDWIDTH_MAGIC, version)].pack(timestamp, use))
+    with BinaryHistoryReader(path) as reader:
+        array = reader.as_array()
+        assert array["timestamp"].tolist() == [1700000000, 1700000010]
+        assert array["use"].tolist() == [0., 125.5]
+        del array
+
+
+def test_binary_incomplete_record(tmp_path):
+    path = str(tmp_path / "internet.bin")
+    write_binary(path, INTERNET_MAGIC, [(1700000000, 12), (1700000010, 15)])
+    with open(path, "ab") as f:
+        # a record cut by a crash
+        f.write(b"\x00\x01\x02")
+    with BinaryHistoryReader(path) as reader:
+        assert list(reader) == [(1700000000, 12), (1700000010, 15)]
+
+
+def test_binary_invalid_headers(tmp_path):
+    path = str(tmp_path / "history.bin")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(INTERNET_MAGIC, FORMAT_VERSION + 1))
+    with pytest.raises(ValueError):
+        get_binary_format(path)
+
+    write_file(path, "1700000000,12\n")
+    assert get_binary_format(path) is None
+    with pytest.raises(ValueError):
+        BinaryHistoryReader(path)
+
+    other = str(tmp_path / "internet.bin")
+    write_binary(other, INTERNET_MAGIC, [(1700000000, 12)])
+    with pytest.raises(ValueError):
+        BinaryHistoryWriter(other, BANDWIDTH_MAGIC)
+
+
+def test_convert_round_trip(tmp_path):
+    source = str(tmp_path / "bandwidth.csv")
+    binary = str(tmp_path / "bandwidth.bin")
+    destination = str(tmp_path / "bandwidth-converted.csv")
+    write_file(source, "1700000000.5,0\n1700000010,125.25\n")
+    assert convert_history(source, binary, BANDWIDTH_MAGIC) == 2
+    assert get_binary_format(binary) == (BANDWIDTH_MAGIC, FORMAT_VERSION)
+    assert convert_history(binary, destination) == 2
+    # the csv files store whole values
+    assert list(read_history(destination)) == [(1700000000.5, 0), (1700000010, 125)]
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import signal
+import sys
+
+import pytest
+
+import log_writer
+from history_store import INTERNET_MAGIC, read_history
+from log_writer import GroupCommit, GroupCommitWriter, close_all_writers, open_writers
+from segments import read_index
+
+
+class RecordingCommit(GroupCommit):
+
+    def __init__(self, commit_records: int, commit_interval: float):
+        super().__init__(commit_records, commit_interval)
+        self.groups = []
+
+    def write(self, samples):
+        self.groups.append(list(samples))
+
+
+def count_fsync(monkeypatch) -> list:
+    synced = []
+    fsync = os.fsync
+
+    def recording_fsync(fd):
+        synced.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(log_writer.os, "fsync", recording_fsync)
+    return synced
+
+
+def test_commit_by_number_of_records():
+    writer = RecordingCommit(3, 0)
+    for i in range(7):
+        writer.append(i, i)
+    assert writer.groups == [[(0, 0), (1, 1), (2, 2)], [(3, 3), (4, 4), (5, 5)]]
+    assert writer.pending == [(6, 6)]
+    assert writer in open_writers
+    writer.close()
+    assert writer.groups[-1] == [(6, 6)]
+    assert writer not in open_writers
+
+
+def test_commit_by_interval():
+    async def append_and_wait(writer: RecordingCommit):
+        writer.append(0, 0)
+        writer.append(1, 1)
+        assert writer.groups == []
+        await asyncio.sleep(0.1)
+        assert writer.groups == [[(0, 0), (1, 1)]]
+        # the timer starts again with the next sample
+        writer.append(2, 2)
+        await asyncio.sleep(0.1)
+
+    writer = RecordingCommit(100, 0.05)
+    asyncio.run(append_and_wait(writer))
+    assert writer.groups == [[(0, 0), (1, 1)], [(2, 2)]]
+    assert writer.timer is None
+    writer.close()
+
+
+def test_interval_outside_of_a_loop():
+    # without an event loop, the samples are only written when enough of them are waiting
+    writer = RecordingCommit(2, 0.05)
+    writer.append(0, 0)
+    assert writer.timer is None
+    writer.append(1, 1)
+    assert writer.groups == [[(0, 0), (1, 1)]]
+    writer.close()
+
+
+def test_close_writes_everything(tmp_path, monkeypatch):
+    synced = count_fsync(monkeypatch)
+    path = str(tmp_path / "internet.csv")
+    writer = GroupCommitWriter(path, INTERNET_MAGIC, "csv", False, commit_records=100, commit_interval=60)
+    samples = [(1700000000 + i, i) for i in range(250)]
+    for timestamp, ping in samples:
+        writer.append(timestamp, ping)
+    # only the full groups are written so far
+    assert list(read_history(path)) == samples[:200]
+    assert synced == []
+    close_all_writers()
+    assert writer not in open_writers
+    assert list(read_history(path)) == samples
+    assert len(synced) == 1
+
+
+@pytest.mark.parametrize("file_format", ["csv", "binary"])
+def test_rotation_syncs_the_segments(tmp_path, monkeypatch, file_format):
+    synced = count_fsync(monkeypatch)
+    path = str(tmp_path / f"internet.{file_format}")
+    writer = GroupCommitWriter(path, INTERNET_MAGIC, file_format, False, commit_records=5, commit_interval=0,
+                               max_bytes=100)
+    samples = [(1700000000 + 10 * i, i) for i in range(100)]
+    for timestamp, ping in samples:
+        writer.append(timestamp, ping)
+    writer.close()
+    segments = read_index(path)
+    assert len(segments) > 1
+    # every segment is synced before it's renamed, and the current file when the writer is closed
+    assert len(synced) == len(segments) + 1
+    read = []
+    for segment in segments:
+        read.extend(read_history(str(tmp_path / segment.path)))
+    read.extend(read_history(path))
+    assert read == samples
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="no signal handlers in the event loops of Windows")
+def test_samples_written_on_sigterm(tmp_path):
+    # like main_loop: SIGTERM stops the loop and the writers are closed before leaving
+    path = str(tmp_path / "internet.bin")
+    writer = GroupCommitWriter(path, INTERNET_MAGIC, "binary", False, commit_records=100, commit_interval=60)
+    samples = [(1700000000 + i, i) for i in range(42)]
+
+    async def append_then_stop():
+        for timestamp, ping in samples:
+            writer.append(timestamp, ping)
+            await asyncio.sleep(0)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    loop = asyncio.new_event_loop()
+    loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    try:
+        loop.create_task(append_then_stop())
+        loop.run_forever()
+        assert list(read_history(path)) == []
+    finally:
+        close_all_writers()
+        loop.remove_signal_handler(signal.SIGTERM)
+        loop.close()
+    assert list(read_history(path)) == samples
@@ -0,0 +1,88 @@
+from log_writer import close_all_writers, open_writers
+from outage_index import OutageIndex, get_outages_path
+
+# (timestamp, ping) of the checks: outages from 10 to 30, from 3600 to 3660 and from 3700 to 3710
+CHECKS = [(0, 20), (10, -1), (20, -1), (30, 25), (3600, -1), (3630, -1), (3660, 30), (3700, -1), (3710, 15),
+          (7200, 20)]
+
+
+def make_index(checks=CHECKS) -> OutageIndex:
+    index = OutageIndex()
+    for timestamp, ping in checks:
+        index.add(timestamp, ping)
+    return index
+
+
+def test_periods():
+    index = make_index()
+    assert len(index) == 3
+    assert index.count() == 3
+    assert index.get(0) == (10, 30, 20, 2)
+    assert index.get(1) == (3600, 3660, 60, 2)
+    assert index.get(2) == (3700, 3710, 10, 1)
+    assert index.current() is None
+    assert index.longest() == (3600, 60)
+    assert index.total_duration() == 90
+
+
+def test_period_in_progress():
+    index = make_index(CHECKS + [(7210, -1), (7300, -1)])
+    assert len(index) == 3
+    assert index.count() == 4
+    assert index.current() == (7210, 7300, 90, 2)
+    # the period in progress is the longest one
+    assert index.longest() == (7210, 90)
+    assert index.total_duration() == 180
+
+
+def test_between():
+    index = make_index()
+    assert index.between() == [index.get(0), index.get(1), index.get(2)]
+    # start included, end excluded
+    assert index.between(3600, 3700) == [index.get(1)]
+    assert index.between(3601, 3701) == [index.get(2)]
+    assert index.between(min_duration=20) == [index.get(0), index.get(1)]
+    assert index.between(4000, 5000) == []
+    assert index.summary_between() == (3, 90)
+    assert index.summary_between(3600) == (2, 70)
+    assert index.summary_between(end=3600) == (1, 20)
+
+
+def test_per_bucket():
+    index = make_index()
+    assert index.per_bucket(0, 7200) == [(0, 1, 20), (3600, 2, 70)]
+    # the first bucket starts at the hour of start
+    assert index.per_bucket(1800, 7201) == [(0, 1, 20), (3600, 2, 70), (7200, 0, 0)]
+    assert index.per_bucket(0, 7200, resolution=60)[:2] == [(0, 1, 20), (60, 0, 0)]
+    assert index.per_bucket(3600, 3720, resolution=60) == [(3600, 1, 60), (3660, 1, 10)]
+
+
+def test_save_and_load(tmp_path):
+    path = get_outages_path(str(tmp_path / "internet.csv"))
+    index = OutageIndex()
+    index.save_to(path)
+    for timestamp, ping in CHECKS + [(7210, -1), (7300, -1)]:
+        index.add(timestamp, ping)
+    assert index in open_writers
+    # the program stops during an outage: it's saved as ending at the latest check, like in a database
+    close_all_writers()
+    assert index not in open_writers
+    with open(path, "a") as f:
+        # a line cut by a crash
+        f.write("7400,74")
+
+    loaded = OutageIndex.load(path)
+    assert len(loaded) == 4
+    assert loaded.between() == index.between() + [(7210, 7300, 90, 2)]
+    assert loaded.current() is None
+
+
+def test_close_without_outage_in_progress(tmp_path):
+    path = get_outages_path(str(tmp_path / "internet.csv"))
+    index = OutageIndex()
+    index.save_to(path)
+    for timestamp, ping in CHECKS:
+        index.add(timestamp, ping)
+    index.close()
+    assert index not in open_writers
+    assert OutageIndex.load(path).between() == index.between()
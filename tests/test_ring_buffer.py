@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from bandwidth_statistics import BandwidthStatisticsAccumulator
+from ring_buffer import TimeSeriesRingBuffer
+
+
+def test_size_retention_keeps_the_latest_samples_in_order():
+    buffer = TimeSeriesRingBuffer("i", max_size=100)
+    # enough samples to wrap around the arrays several times
+    for i in range(1000):
+        buffer.append((i, i * 2))
+    assert len(buffer) == 100
+    assert buffer.capacity() == 100
+    assert list(buffer) == [(i, i * 2) for i in range(900, 1000)]
+    assert [buffer[i] for i in range(-100, 100)] == list(buffer) * 2
+    with pytest.raises(IndexError):
+        buffer[100]
+
+
+def test_age_retention():
+    buffer = TimeSeriesRingBuffer("d", max_age=60)
+    for i in range(0, 1000, 10):
+        buffer.append((i, 1.5))
+    assert [timestamp for timestamp, _ in buffer] == list(range(930, 1000, 10))
+    buffer.set_retention(max_size=3)
+    assert [timestamp for timestamp, _ in buffer] == [970, 980, 990]
+
+
+def test_slice_after_wrap_around():
+    buffer = TimeSeriesRingBuffer("i", max_size=50)
+    for i in range(130):
+        buffer.append((i, i))
+    assert buffer.slice(90.5, 100) == [(i, i) for i in range(91, 101)]
+    assert buffer.slice(0, 85) == [(i, i) for i in range(80, 86)]
+    assert buffer.slice(200, 300) == []
+
+
+def test_bandwidth_accumulator_matches_batch():
+    # utils needs psutil
+    pytest.importorskip("psutil")
+    from utils import get_bandwidth_stats
+    generator = random.Random(0)
+    history = []
+    timestamp, total = 1_700_000_000, 0.
+    accumulator = BandwidthStatisticsAccumulator([])
+    for _ in range(200):
+        timestamp += generator.choice([1, 5, 10])
+        total += generator.uniform(0, 1000)
+        history.append((timestamp, total))
+        accumulator.add(timestamp, total)
+        expected = get_bandwidth_stats(history, 10)
+        actual = accumulator.get_statistics(10)
+        for name in ["current_network_use", "current_time", "current_network_speed", "average_network_use",
+                     "total_use", "total_duration"]:
+            assert getattr(actual, name) == pytest.approx(getattr(expected, name)), name
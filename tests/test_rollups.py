@@ -0,0 +1,85 @@
+import pytest
+
+from log_writer import close_all_writers
+from ring_buffer import TimeSeriesRingBuffer
+from rollups import PingRollup, PingRollups, BandwidthRollups, Rollups, get_rollup_path
+
+
+def ping_at(timestamp: int) -> int:
+    return -1 if timestamp % 70 == 0 else timestamp % 50
+
+
+def read_lines(path: str) -> list:
+    with open(path, "r") as f:
+        return f.read().splitlines()
+
+
+def test_bucket_in_progress_is_merged_after_a_restart(tmp_path):
+    raw_path = str(tmp_path / "internet.csv")
+    rollups = PingRollups(TimeSeriesRingBuffer("i"))
+    rollups.save_next_to(raw_path, 1, 0)
+    for timestamp in range(0, 90, 10):
+        rollups.add(timestamp, 20)
+    close_all_writers()
+    # the minute in progress is written when the program stops
+    assert read_lines(get_rollup_path(raw_path, 60)) == ["0,6,20,20,20.0,20,0.0000", "60,3,20,20,20.0,20,0.0000"]
+
+    rollups = PingRollups(TimeSeriesRingBuffer("i"))
+    rollups.save_next_to(raw_path, 1, 0)
+    for timestamp in [90, 100, 110, 120]:
+        rollups.add(timestamp, 40 if timestamp < 120 else -1)
+    close_all_writers()
+    assert read_lines(get_rollup_path(raw_path, 60)) == ["0,6,20,20,20.0,20,0.0000", "60,6,20,40,30.0,40,0.0000",
+                                                         "120,1,-1,-1,-1.0,-1,1.0000"]
+
+
+def test_saved_tiers_are_loaded_by_the_readers(tmp_path):
+    raw_path = str(tmp_path / "internet.csv")
+    saved = PingRollups(TimeSeriesRingBuffer("i"))
+    saved.save_next_to(raw_path, 100, 0)
+    for timestamp in range(0, 20000, 10):
+        saved.add(timestamp, ping_at(timestamp))
+    close_all_writers()
+
+    rebuilt = PingRollups(TimeSeriesRingBuffer("i", max_size=10))
+    loaded = PingRollups(TimeSeriesRingBuffer("i", max_size=10))
+    loaded.load_next_to(raw_path)
+    # the samples after the buckets saved are still summarized
+    for timestamp in range(0, 25000, 10):
+        rebuilt.add(timestamp, ping_at(timestamp))
+        loaded.add(timestamp, ping_at(timestamp))
+    loaded.finish_loading()
+    assert loaded.time_range() == rebuilt.time_range()
+    for resolution in [60, 3600]:
+        expected = rebuilt.get_points(0, 25000, resolution)
+        actual = loaded.get_points(0, 25000, resolution)
+        assert [point[0] for point in actual] == [point[0] for point in expected]
+        assert [point[1] for point in actual] == pytest.approx([point[1] for point in expected], abs=0.05)
+
+
+def test_loaded_range(tmp_path):
+    raw_path = str(tmp_path / "bandwidth.csv")
+    saved = BandwidthRollups(TimeSeriesRingBuffer("d"))
+    saved.save_next_to(raw_path, 100, 0)
+    for timestamp in range(0, 1000, 10):
+        saved.add_total(timestamp, timestamp * 100)
+    close_all_writers()
+    loaded = BandwidthRollups(TimeSeriesRingBuffer("d"))
+    loaded.load_next_to(raw_path, 300, 500)
+    loaded.finish_loading()
+    assert loaded.get_points(300, 500, 60) == [(300, 100), (360, 100), (420, 100), (480, 100)]
+
+
+def test_ping_rollups_merge():
+    first = PingRollup(0, 60, 4, 10, 30, 20, 30, 0.5)
+    second = PingRollup(0, 60, 2, 5, 15, 10, 15, 0)
+    merged = first.merge(second)
+    assert (merged.nb_samples, merged.min_ping, merged.max_ping, merged.p95_ping) == (6, 5, 30, 30)
+    assert merged.mean_ping == pytest.approx(15)
+    assert merged.loss_ratio == pytest.approx(2 / 6)
+
+
+def test_points_are_abstract():
+    rollups = Rollups(None, TimeSeriesRingBuffer("i"))
+    with pytest.raises(NotImplementedError):
+        rollups.raw_points(0, 1)
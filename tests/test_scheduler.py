@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import scheduler
+from scheduler import PeriodicScheduler, get_timestamp
+
+
+def run_ticks(periodic: PeriodicScheduler, work_durations):
+    async def ticks():
+        for duration in work_durations:
+            await periodic.wait_next_tick()
+            # blocking on purpose: the work of a tick delays the loop like a slow check would
+            time.sleep(duration)
+
+    asyncio.run(ticks())
+
+
+def test_ticks_on_time():
+    periodic = PeriodicScheduler(0.02)
+    start = time.monotonic()
+    run_ticks(periodic, [0] * 5)
+    assert periodic.nb_ticks == 5
+    assert periodic.missed_ticks == 0
+    # the first tick is right away and the next ones are a period apart
+    assert time.monotonic() - start >= 4 * 0.02
+    assert 0 <= periodic.last_jitter <= periodic.max_jitter
+    assert periodic.average_jitter() == periodic.total_jitter / 5
+    assert periodic.average_jitter() <= periodic.max_jitter
+
+
+def test_missed_deadlines_are_skipped():
+    periodic = PeriodicScheduler(0.05)
+    # the work of the first tick takes more than three periods: only the latest deadline over is kept
+    run_ticks(periodic, [0.17, 0, 0])
+    assert periodic.nb_ticks == 3
+    assert periodic.missed_ticks == 2
+    # the late deadlines are skipped instead of being run one after the other, so the next tick waits for its
+    # deadline and is on time
+    assert periodic.last_jitter < 0.05
+    assert periodic.max_jitter < 0.05
+
+
+def test_jitter_of_a_late_tick():
+    periodic = PeriodicScheduler(0.1)
+    # late by less than a period: the tick runs right away, late, and nothing is missed
+    run_ticks(periodic, [0.13, 0])
+    assert periodic.missed_ticks == 0
+    assert periodic.nb_ticks == 2
+    assert periodic.last_jitter >= 0.02
+    assert periodic.max_jitter == periodic.last_jitter
+    assert periodic.average_jitter() == periodic.total_jitter / 2
+
+
+def test_no_tick_average_jitter():
+    assert PeriodicScheduler(1).average_jitter() == 0
+
+
+def test_timestamps_keep_going_forward_after_a_clock_step_back(monkeypatch):
+    clock = {"wall": 1700000000., "monotonic": 100.}
+    monkeypatch.setattr(scheduler, "last_timestamp", None)
+    monkeypatch.setattr(time, "time", lambda: clock["wall"])
+    monkeypatch.setattr(time, "monotonic", lambda: clock["monotonic"])
+
+    def advance(seconds: float, wall_step: float = 0):
+        clock["wall"] += seconds + wall_step
+        clock["monotonic"] += seconds
+
+    timestamps = [get_timestamp()]
+    advance(1)
+    timestamps.append(get_timestamp())
+    # the system clock is set back an hour
+    advance(1, -3600)
+    timestamps.append(get_timestamp())
+    advance(1)
+    timestamps.append(get_timestamp())
+    # the same millisecond
+    timestamps.append(get_timestamp())
+    assert timestamps == [1700000000, 1700000001, 1700000002, 1700000003, 1700000003.001]
+
+    # the timestamps follow the monotonic clock until the wall clock is after them again
+    advance(3600)
+    assert get_timestamp() == 1700003603.001
+    advance(1, 3600)
+    assert get_timestamp() == clock["wall"] == 1700003604
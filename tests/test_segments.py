@@ -0,0 +1,51 @@
+import gzip
+import os
+
+from history_store import INTERNET_MAGIC
+from log_writer import GroupCommitWriter
+from main_analyze import list_files
+from segments import read_history_range, read_index
+
+
+def write_file(path: str, content: str):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def write_segments(path: str, file_format: str, nb_samples: int):
+    # a new segment every few samples, compressed
+    writer = GroupCommitWriter(path, INTERNET_MAGIC, file_format, False, commit_records=1, commit_interval=0,
+                               max_bytes=100, compress=True)
+    for i in range(nb_samples):
+        writer.append(1700000000 + 10 * i, -1 if i % 7 == 0 else i)
+    writer.close()
+
+
+def test_segment_range_reads(tmp_path):
+    for file_format in ["csv", "binary"]:
+        path = str(tmp_path / f"internet.{file_format}")
+        write_segments(path, file_format, 200)
+        assert len(read_index(path)) > 1
+        expected = [(1700000000 + 10 * i, -1 if i % 7 == 0 else i) for i in range(200)]
+        assert list(read_history_range(path)) == expected
+        start, end = 1700000000 + 10 * 37, 1700000000 + 10 * 151
+        assert list(read_history_range(path, start, end)) == expected[37:152]
+        assert list(read_history_range(path, end=1700000000)) == expected[:1]
+        assert list(read_history_range(path, start=1700000000 + 10 * 200)) == []
+
+
+def test_segment_with_unfinished_compression(tmp_path):
+    path = str(tmp_path / "internet.csv")
+    write_segments(path, "csv", 50)
+    # the segment is still uncompressed, as if the program stopped while compressing it
+    segment = read_index(path)[0]
+    compressed_path = os.path.join(str(tmp_path), segment.path)
+    with gzip.open(compressed_path, "rb") as f:
+        write_file(compressed_path[:-len(".gz")], f.read().decode())
+    os.remove(compressed_path)
+    assert list(read_history_range(path)) == [(1700000000 + 10 * i, -1 if i % 7 == 0 else i) for i in range(50)]
+
+
+def test_segments_are_listed_with_their_file(tmp_path):
+    write_segments(str(tmp_path / "internet.csv"), "csv", 50)
+    assert list_files([str(tmp_path)]) == [str(tmp_path / "internet.csv")]
@@ -0,0 +1,65 @@
+from history_store import BANDWIDTH_MAGIC, INTERNET_MAGIC
+from log_writer import close_all_writers
+from sqlite_store import DatabaseWriter, HistoryDatabase, is_database, load_outages, read_database
+
+PINGS = [(1700000000 + 10 * i, -1 if 3 <= i < 6 or i >= 18 else 20 + i) for i in range(20)]
+USES = [(1700000000.5 + 10 * i, 125.5 * i) for i in range(20)]
+
+
+def write_database(path: str):
+    database = HistoryDatabase(path)
+    internet = DatabaseWriter(database, INTERNET_MAGIC, commit_records=3, commit_interval=0)
+    bandwidth = DatabaseWriter(database, BANDWIDTH_MAGIC, commit_records=3, commit_interval=0)
+    for ping, use in zip(PINGS, USES):
+        internet.append(*ping)
+        bandwidth.append(*use)
+    # the samples committed can be read while the program is writing
+    assert list(read_database(path, INTERNET_MAGIC)) == PINGS[:18]
+    close_all_writers()
+    database.close()
+
+
+def test_round_trip(tmp_path):
+    # the path is quoted in the uri of the read only connections
+    path = str(tmp_path / "history #1.sqlite")
+    write_database(path)
+    assert is_database(path)
+    assert list(read_database(path, INTERNET_MAGIC)) == PINGS
+    assert list(read_database(path, BANDWIDTH_MAGIC)) == USES
+
+
+def test_time_range(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    write_database(path)
+    assert list(read_database(path, INTERNET_MAGIC, 1700000050, 1700000100)) == PINGS[5:11]
+    assert list(read_database(path, BANDWIDTH_MAGIC, start=1700000150)) == USES[15:]
+    assert list(read_database(path, BANDWIDTH_MAGIC, end=1700000010)) == USES[:1]
+    assert list(read_database(path, INTERNET_MAGIC, 1800000000)) == []
+
+
+def test_outages(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    write_database(path)
+    outages = load_outages(path)
+    # the outage in progress when the writer was closed ends at the last check
+    assert outages.between() == [(1700000030, 1700000060, 30, 3), (1700000180, 1700000190, 10, 2)]
+    assert outages.longest() == (1700000030, 30)
+
+
+def test_append_to_database(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    write_database(path)
+    database = HistoryDatabase(path)
+    writer = DatabaseWriter(database, INTERNET_MAGIC, commit_records=1, commit_interval=0)
+    writer.append(1700000200, 30)
+    writer.close()
+    database.close()
+    assert list(read_database(path, INTERNET_MAGIC)) == PINGS + [(1700000200, 30)]
+    assert len(load_outages(path)) == 2
+
+
+def test_is_database(tmp_path):
+    path = str(tmp_path / "internet.csv")
+    with open(path, "w") as f:
+        f.write("1700000000,20\n")
+    assert not is_database(path)
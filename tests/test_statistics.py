@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from connection_statistics import ConnectionStatisticsAccumulator
+from vectorized_stats import numpy, get_disconnection_stats_array
+
+STATISTICS = ["current_ping", "current_time", "current_duration", "longest_duration", "start_longest",
+              "average_duration", "nb_disconnection", "average_nb_disc_hour", "min_ping", "max_ping", "average_ping"]
+LATENCY = ["nb_samples", "p50", "p95", "p99", "jitter", "loss_ratio"]
+
+
+def random_history(seed: int) -> list:
+    """
+    :return: a history with disconnections of various lengths, irregular delays and some pings of 0ms
+    """
+    generator = random.Random(seed)
+    history = []
+    timestamp = 1_700_000_000.
+    for _ in range(generator.randint(1, 300)):
+        timestamp += generator.choice([1, 10, 10, 10, 35.5])
+        ping = generator.choice([-1, -1, 0, generator.randint(1, 500), generator.randint(1, 50)])
+        history.append((timestamp, ping))
+    return history
+
+
+def assert_same_statistics(expected, actual, names: list):
+    for name in names:
+        assert getattr(actual, name) == pytest.approx(getattr(expected, name)), name
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_accumulator_matches_batch_on_every_prefix(seed):
+    # utils needs psutil
+    pytest.importorskip("psutil")
+    from utils import get_disconnection_stats
+    history = random_history(seed)
+    accumulator = ConnectionStatisticsAccumulator([])
+    for i, (timestamp, ping) in enumerate(history):
+        accumulator.add(timestamp, ping)
+        assert_same_statistics(get_disconnection_stats(history[:i + 1], 10), accumulator.get_statistics(),
+                               STATISTICS)
+
+
+@pytest.mark.skipif(numpy is None, reason="numpy is not installed")
+@pytest.mark.parametrize("seed", range(50))
+def test_numpy_matches_accumulator(seed):
+    history = random_history(seed)
+    accumulator = ConnectionStatisticsAccumulator([])
+    for timestamp, ping in history:
+        accumulator.add(timestamp, ping)
+    expected = accumulator.get_statistics()
+    timestamps = numpy.array([timestamp for timestamp, _ in history], dtype=numpy.float64)
+    pings = numpy.array([ping for _, ping in history], dtype=numpy.float64)
+    actual = get_disconnection_stats_array(timestamps, pings)
+    assert_same_statistics(expected, actual, STATISTICS)
+    assert_same_statistics(expected.latency, actual.latency, LATENCY)
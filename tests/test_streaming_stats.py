@@ -0,0 +1,121 @@
+import math
+import random
+
+import pytest
+
+from connection_statistics import ConnectionStatisticsAccumulator
+from streaming_stats import Ewma, LogHistogram, SlidingMax, SlidingWindow, SlidingWindows
+
+
+def test_zero_ping_is_not_lost():
+    accumulator = ConnectionStatisticsAccumulator([60])
+    for timestamp, ping in [(0, 0), (10, 0), (20, -1), (30, 20)]:
+        accumulator.add(timestamp, ping)
+    statistics = accumulator.get_statistics()
+    for latency in [statistics.latency] + statistics.latency_windows:
+        assert latency.loss_ratio == 0.25
+        assert latency.p50 == 0
+
+
+def test_histogram_zero_bucket():
+    histogram = LogHistogram()
+    for value in [0, 0, 10, 100]:
+        histogram.add(value)
+    assert histogram.zero_count == 2
+    assert histogram.quantile(0) == 0
+    assert histogram.quantile(1) == pytest.approx(100, rel=0.01)
+    histogram.remove(0)
+    histogram.remove(0)
+    assert histogram.quantile(0) == pytest.approx(10, rel=0.01)
+
+
+def test_sliding_max_expires():
+    peak = SlidingMax()
+    for timestamp, value in [(0, 50), (10, 20), (20, 30), (30, 10)]:
+        peak.add(timestamp, value)
+    assert peak.max() == 50
+    peak.evict(5)
+    assert peak.max() == 30
+    peak.evict(25)
+    assert peak.max() == 10
+    peak.evict(31)
+    assert peak.max() is None
+
+
+def test_sliding_max_matches_the_window():
+    rng = random.Random(0)
+    values = [rng.uniform(0, 100) for _ in range(1000)]
+    peak = SlidingMax()
+    for timestamp, value in enumerate(values):
+        peak.add(timestamp, value)
+        peak.evict(timestamp - 20)
+        assert peak.max() == max(values[max(0, timestamp - 20):timestamp + 1])
+
+
+def test_histogram_quantiles():
+    rng = random.Random(1)
+    values = [rng.uniform(1, 1000) for _ in range(5000)]
+    histogram = LogHistogram(0.01)
+    for value in values:
+        histogram.add(value)
+    ordered = sorted(values)
+    for q in [0, 0.5, 0.95, 0.99, 1]:
+        expected = ordered[round(q * (len(ordered) - 1))]
+        assert histogram.quantile(q) == pytest.approx(expected, rel=0.01)
+    for value in values[:4000]:
+        histogram.remove(value)
+    ordered = sorted(values[4000:])
+    assert histogram.count == 1000
+    assert histogram.quantile(0.5) == pytest.approx(ordered[round(0.5 * 999)], rel=0.01)
+    assert LogHistogram().quantile(0.5) is None
+
+
+def test_window_expires():
+    window = SlidingWindow(60)
+    # a spike, then a minute of low values
+    window.add(0, 500)
+    for timestamp in range(10, 61, 10):
+        window.add(timestamp, 10)
+    statistics = window.get_statistics()
+    assert statistics.nb_samples == 7
+    assert statistics.peak == 500
+    assert window.histogram.quantile(1) == pytest.approx(500, rel=0.01)
+    window.add(61, 10)
+    statistics = window.get_statistics()
+    # the spike left the window
+    assert statistics.nb_samples == 7
+    assert statistics.peak == 10
+    assert statistics.p50 == statistics.p95 == pytest.approx(10, rel=0.01)
+
+
+def test_windows_of_several_durations():
+    windows = SlidingWindows([60, 600])
+    windows.add(0, 500)
+    for timestamp in range(10, 301, 10):
+        windows.add(timestamp, 10)
+    short, long = windows.get_statistics()
+    assert (short.nb_samples, short.peak) == (7, 10)
+    assert (long.nb_samples, long.peak) == (31, 500)
+    # samples dropped from the queue before being put in the windows
+    for timestamp in range(310, 1001, 10):
+        windows.add(timestamp, 20)
+    short, long = windows.get_statistics()
+    assert (short.nb_samples, short.peak) == (7, 20)
+    assert (long.nb_samples, long.peak) == (61, 20)
+    assert SlidingWindows([]).get_statistics() == []
+
+
+def test_ewma():
+    average = Ewma(60)
+    average.add(0, 0)
+    assert average.value == 0
+    # a step: after a time constant, the average went 1 - 1/e of the way
+    for timestamp in range(1, 61):
+        average.add(timestamp, 100)
+    assert average.value == pytest.approx(100 * (1 - math.exp(-1)))
+    for timestamp in range(61, 1000):
+        average.add(timestamp, 100)
+    assert average.value == pytest.approx(100)
+    # irregular intervals
+    average.add(1029, 0)
+    assert average.value == pytest.approx(100 * math.exp(-0.5))
@@ -1,12 +1,12 @@
 import asyncio
-import socket
+import os
+import signal
 import time
 from asyncio import AbstractEventLoop
-from typing import List, Tuple
+from typing import Callable, Iterator, List, Tuple, Optional, Dict, Union
 
 import psutil
 import argparse
-from datetime import datetime
 
 # my network is so bad that I have to take some of my time to write software to demonstrate it to my internet provider
 # based on: https://stackoverflow.com/questions/3764291/how-can-i-see-if-theres-an-available-and-active-network-connection-in-python
@@ -14,31 +14,101 @@ from datetime import datetime
 
 
 # global variables for real time display
-from bandwidth_statistics import BandwidthStatistics
+from bandwidth_statistics import BandwidthStatistics, BandwidthStatisticsAccumulator, CumulativeCounter, stitch_resets
 from client import Client
-from connection_statistics import ConnectionStatistics
+from connection_statistics import ConnectionStatistics, ConnectionStatisticsAccumulator
+from history_store import INTERNET_MAGIC, BANDWIDTH_MAGIC, FILE_FORMATS, InvalidRowsCounter, parse_time
+from log_writer import GroupCommitWriter, close_all_writers
+from outage_index import get_outages_path
+from ring_buffer import TimeSeriesRingBuffer
+from rollups import PingRollups, BandwidthRollups
+from scheduler import PeriodicScheduler, get_timestamp
+from segments import read_history_range
+from sqlite_store import HistoryDatabase, DatabaseWriter, is_database, read_database
+from streaming_stats import DEFAULT_WINDOWS
+
+# the raw histories only keep the samples allowed by their retention (see configure_history), the statistics over
+# the whole life of the program are kept by the accumulators which are updated in constant time for each new sample
+internet = TimeSeriesRingBuffer("i")
+bandwidth = TimeSeriesRingBuffer("d")
+# durations in seconds of the sliding windows over which the recent statistics are computed (see configure_windows)
+statistics_windows: List[float] = list(DEFAULT_WINDOWS)
+internet_statistics = ConnectionStatisticsAccumulator(statistics_windows)
+bandwidth_statistics = BandwidthStatisticsAccumulator(statistics_windows)
+# statistics of each target, when several targets are checked (their pings are only followed by the accumulators)
+targets_statistics: Dict[str, ConnectionStatisticsAccumulator] = {}
+# statistics of each interface and direction (see interface_series_name)
+interfaces_statistics: Dict[str, BandwidthStatisticsAccumulator] = {}
+# summaries of the histories at coarser resolutions (1 minute, 1 hour), kept for much longer than the raw histories
+internet_rollups = PingRollups(internet)
+bandwidth_rollups = BandwidthRollups(bandwidth)
+# the number of points of history sent to the clients after a file is read
+HISTORY_POINTS = 2000
+# the number of raw samples kept when a file is read without being added to the real time history, so the memory
+# used doesn't depend on the size of the file: the points sent to the client come from the rollups when the raw
+# samples don't cover the file
+READ_HISTORY_SIZE = 60 * HISTORY_POINTS
+# how the saving files are written (see GroupCommitWriter), set by configure_saving
+saving_options = {"commit_records": 100, "commit_interval": 60, "max_bytes": 0, "rotate_period": None,
+                  "compress": False}
+
+
+def configure_history(max_size: int, max_age: float):
+    """
+    Sets how many samples are kept in the real time histories
+
+    :param max_size: the maximum number of samples kept in each history, 0 for no limit
+    :param max_age: the maximum age in seconds of the samples kept in each history, 0 for no limit
+    """
+    for history in [internet, bandwidth]:
+        history.set_retention(max_size, max_age)
+
+
+def configure_windows(windows: List[float]):
+    """
+    Sets the durations of the sliding windows over which the recent statistics are computed
+
+    :param windows: the durations in seconds of the windows
+    """
+    statistics_windows[:] = windows
+    for accumulator in [internet_statistics, bandwidth_statistics] + list(targets_statistics.values()) \
+            + list(interfaces_statistics.values()):
+        accumulator.set_windows(statistics_windows)
 
-internet: List[Tuple[int, bool]] = []
-bandwidth: List[Tuple[int, float]] = []
 
+def configure_saving(commit_records: int, commit_interval: float, max_bytes: int, rotate_period: Optional[str],
+                     compress: bool):
+    """
+    Sets how the samples are written to the saving files, see GroupCommitWriter for the meaning of the parameters
+    """
+    saving_options.update(commit_records=commit_records, commit_interval=commit_interval, max_bytes=max_bytes,
+                          rotate_period=rotate_period, compress=compress)
 
-def is_internet_working(host: str = "8.8.8.8", port: int = 53, timeout: int = 3) -> float:
+
+async def is_internet_working(host: str = "8.8.8.8", port: int = 53, timeout: float = 3) -> float:
     """
     Tries to connect to the host with the given port and timeout, and if successful returns the
-    time it took to connect in seconds, otherwise returns -1.0
+    time it took to connect in seconds, otherwise returns -1.0.
+    The connection is made without blocking the event loop and is closed right after being established.
 
     :param host: the host to connect to
     :param port: the port at which we try to connect
     :param timeout: the timeout duration in seconds
     :return: The time it took to connect if the connection is successful, -1.0 otherwise
     """
+    start = time.perf_counter()
     try:
-        socket.setdefaulttimeout(timeout)
-        start = time.perf_counter()
-        socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
-        return time.perf_counter() - start
-    except socket.error as ex:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
         return -1.0
+    duration = time.perf_counter() - start
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        # the connection worked, we don't care if it wasn't closed cleanly
+        pass
+    return duration
 
 
 def get_next_disconnected_period(internet_connection_history: List[Tuple[int, int]], start_index: int) \
@@ -58,9 +128,10 @@ def get_next_disconnected_period(internet_connection_history: List[Tuple[int, in
     """
     start = -1
     end = -1
-    for i, (_, ping) in enumerate(internet_connection_history[start_index:]):
-        if ping < 0:
-            start = start_index + i
+    # we iterate over the indices instead of slicing the history, which would copy its whole tail at each call
+    for i in range(start_index, len(internet_connection_history)):
+        if internet_connection_history[i][1] < 0:
+            start = i
             end = start + 1
             while end < len(internet_connection_history) and internet_connection_history[end][1] < 0:
                 end += 1
@@ -155,26 +226,118 @@ def get_disconnection_stats(internet_connection_history: List[Tuple[int, int]],
            average_disconnection_per_hour, min_ping, max_ping, average_ping)
 
 
-async def check_internet_loop(client: Client, host: str, port: int, timeout: int, save_real_time: bool,
+def parse_targets(targets: List[str], default_port: int) -> List[Tuple[str, int]]:
+    """
+    Transforms the targets given in parameter of the program into a list of hosts and ports to check
+
+    :param targets: a list of "host:port" or "host" strings, or paths to files containing one of those per line
+        (empty lines and lines starting with # are ignored)
+    :param default_port: the port used for the targets that don't specify one
+    :return: a list of pairs of host and port
+    """
+    result: List[Tuple[str, int]] = []
+    for target in targets:
+        if os.path.isfile(target):
+            with open(target, "r") as f:
+                lines = [line.strip() for line in f]
+            result += parse_targets([line for line in lines if line and not line.startswith("#")], default_port)
+            continue
+        # ipv6 addresses have to be written between brackets if a port is specified: [::1]:53
+        if target.startswith("["):
+            host, _, port = target[1:].partition("]")
+            port = port[1:]
+        elif target.count(":") == 1:
+            host, _, port = target.partition(":")
+        else:
+            host, port = target, ""
+        result.append((host, int(port) if port else default_port))
+    return result
+
+
+def target_to_str(target: Tuple[str, int]) -> str:
+    host, port = target
+    return f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+
+
+async def check_targets(targets: List[Tuple[str, int]], timeout: float, max_concurrent_probes: int) -> List[float]:
+    """
+    Checks the connection to all the targets concurrently, with at most max_concurrent_probes checks running at the
+    same time, so if there are enough concurrent probes allowed the total duration is at most the timeout
+
+    :param targets: the list of host and port to check
+    :param timeout: the timeout of each check in seconds
+    :param max_concurrent_probes: the maximum number of checks running at the same time
+    :return: the result of is_internet_working for each target, in the same order
+    """
+    semaphore = asyncio.Semaphore(max_concurrent_probes)
+
+    async def check(host: str, port: int) -> float:
+        async with semaphore:
+            return await is_internet_working(host, port, timeout)
+
+    return await asyncio.gather(*[check(host, port) for host, port in targets])
+
+
+def aggregate_pings(pings: List[int], quorum: int) -> int:
+    """
+    Combines the pings to several targets into a single value representing the internet connection
+
+    :param pings: the pings to each target in ms, negative when the target couldn't be reached
+    :param quorum: the number of targets that must be reached to consider that internet is working
+    :return: the best ping if at least quorum targets answered, -1 otherwise
+    """
+    answered = [ping for ping in pings if ping >= 0]
+    if len(answered) < max(1, quorum):
+        return -1
+    return min(answered)
+
+
+async def check_internet_loop(client: Client, targets: List[Tuple[str, int]], timeout: float, save_real_time: bool,
                               internet_check_delay: int, saving_file_path: str,
-                              saving_as_datetime: bool):
-    global internet
+                              saving_as_datetime: bool, file_format: str = "csv", quorum: int = 1,
+                              max_concurrent_probes: int = 16, database: Optional[HistoryDatabase] = None):
     if saving_file_path:
-        internet_file = open(saving_file_path, "a")
-
+        internet_file = GroupCommitWriter(saving_file_path, INTERNET_MAGIC, file_format, saving_as_datetime,
+                                          **saving_options)
+        internet_rollups.save_next_to(saving_file_path, saving_options["commit_records"],
+                                      saving_options["commit_interval"])
+        internet_statistics.outages.save_to(get_outages_path(saving_file_path))
+    if database:
+        internet_database = DatabaseWriter(database, INTERNET_MAGIC, saving_options["commit_records"],
+                                           saving_options["commit_interval"])
+
+    names = [target_to_str(target) for target in targets]
+    for name in names:
+        targets_statistics.setdefault(name, ConnectionStatisticsAccumulator(statistics_windows))
+
+    scheduler = PeriodicScheduler(internet_check_delay)
     while True:
-        ping = int(is_internet_working(host, port, timeout) * 1000) # we express ping in ms
-        now = int(time.time())
+        await scheduler.wait_next_tick()
+        now = get_timestamp()
+        # we express ping in ms
+        pings = [int(result * 1000) for result in await check_targets(targets, timeout, max_concurrent_probes)]
+        ping = aggregate_pings(pings, quorum)
+        if save_real_time:
+            # with a single target the aggregated statistics are already the statistics of this target
+            if len(targets) > 1:
+                for name, target_ping in zip(names, pings):
+                    targets_statistics[name].add(now, target_ping)
+                client.update_targets_statistics({name: targets_statistics[name].get_statistics() for name in names})
+            internet.append((now, ping))
+            internet_statistics.add(now, ping)
+        elif saving_file_path:
+            # the disconnection periods are still followed to be saved next to the file
+            internet_statistics.outages.add(now, ping)
+        internet_rollups.add(now, ping)
         if save_real_time:
-            internet += [(now, ping)]
-            stats = get_disconnection_stats(internet, internet_check_delay)
+            stats = internet_statistics.get_statistics()
+            stats.set_scheduling(scheduler)
             client.update_internet_statistics(stats)
 
         if saving_file_path:
-            internet_file.write(f"{datetime.fromtimestamp(now) if saving_as_datetime else now},{ping}\n")
-            internet_file.flush()
-
-        await asyncio.sleep(internet_check_delay)
+            internet_file.append(now, ping)
+        if database:
+            internet_database.append(now, ping)
 
 
 def bytes_to_kbits(value: int) -> float:
@@ -205,34 +368,94 @@ def get_bandwidth_stats(bandwidth_history: List[Tuple[int, float]],
     return BandwidthStatistics(current_use, last[0], current_speed, avg, duration, total)
 
 
-def get_total_kbits_use_since_boot():
-    return bytes_to_kbits(psutil.net_io_counters().bytes_sent + psutil.net_io_counters().bytes_recv)
+def get_interfaces_kbits_use(interfaces: Optional[List[str]] = None) -> Dict[str, Tuple[float, float]]:
+    """
+    Takes a single snapshot of the counters of every network interface
+
+    :param interfaces: the names of the interfaces to keep, None to keep all of them
+    :return: for each interface, the Kbits sent and received since boot
+    """
+    counters = psutil.net_io_counters(pernic=True)
+    return {name: (bytes_to_kbits(counter.bytes_sent), bytes_to_kbits(counter.bytes_recv))
+            for name, counter in counters.items() if interfaces is None or name in interfaces}
+
+
+def get_total_kbits_use_since_boot(interfaces: Optional[List[str]] = None) -> float:
+    """
+    :param interfaces: the names of the interfaces to count, None to count all of them
+    :return: the Kbits sent and received since boot by the interfaces
+    """
+    return sum(sent + received for sent, received in get_interfaces_kbits_use(interfaces).values())
+
+
+def interface_series_name(interface: str, direction: str) -> str:
+    """
+    :param interface: the name of a network interface
+    :param direction: "upload" or "download"
+    :return: the name of the history and statistics of the network use of the interface in that direction
+    """
+    return f"{interface} {direction}"
 
 
 async def check_bandwidth_usage(client: Client, bandwidth_refresh_rate: int, save_real_time: bool,
-                                saving_bandwidth_file: str, saving_as_datetime: bool, initial_bandwidth_use: int):
-    global bandwidth
+                                saving_bandwidth_file: str, saving_as_datetime: bool,
+                                initial_interfaces_use: Dict[str, Tuple[float, float]], file_format: str = "csv",
+                                interfaces: Optional[List[str]] = None, database: Optional[HistoryDatabase] = None):
+    """
+    Samples the network use of the interfaces at a fixed rate. The use is computed from the difference between two
+    readings of each counter, so the total saved only goes up even if a counter is reset or an interface appears
+    or disappears.
 
+    :param initial_interfaces_use: the Kbits sent and received by each interface when the program started, the
+        use is counted from there (interfaces appearing later are counted from the first time they are seen)
+    """
     if saving_bandwidth_file:
-        bandwidth_file = open(saving_bandwidth_file, "a")
-
+        bandwidth_file = GroupCommitWriter(saving_bandwidth_file, BANDWIDTH_MAGIC, file_format, saving_as_datetime,
+                                           **saving_options)
+        bandwidth_rollups.save_next_to(saving_bandwidth_file, saving_options["commit_records"],
+                                       saving_options["commit_interval"])
+    if database:
+        bandwidth_database = DatabaseWriter(database, BANDWIDTH_MAGIC, saving_options["commit_records"],
+                                            saving_options["commit_interval"])
+    counters: Dict[str, CumulativeCounter] = {}
+    for interface, use in initial_interfaces_use.items():
+        for direction, initial_value in zip(["upload", "download"], use):
+            counters[interface_series_name(interface, direction)] = CumulativeCounter(initial_value)
+    # when a file was read in the real time history, the total continues from the total of the file
+    initial_total = bandwidth_statistics.last[1] if save_real_time and bandwidth_statistics.last else 0
+
+    scheduler = PeriodicScheduler(bandwidth_refresh_rate)
     while True:
-
-        new_value = get_total_kbits_use_since_boot() - initial_bandwidth_use
-        new_time = int(time.time())
+        await scheduler.wait_next_tick()
+        interfaces_use = get_interfaces_kbits_use(interfaces)
+        new_time = get_timestamp()
+        names = []
+        for interface, use in interfaces_use.items():
+            for direction, value in zip(["upload", "download"], use):
+                name = interface_series_name(interface, direction)
+                counters.setdefault(name, CumulativeCounter()).update(value)
+                names.append(name)
+        new_value = initial_total + sum(counter.total for counter in counters.values())
         if save_real_time:
-            bandwidth += [(new_time, new_value)]
+            bandwidth.append((new_time, new_value))
+            bandwidth_statistics.add(new_time, new_value)
+            for name in names:
+                if name not in interfaces_statistics:
+                    interfaces_statistics[name] = BandwidthStatisticsAccumulator(statistics_windows)
+                interfaces_statistics[name].add(new_time, counters[name].total)
+            client.update_interfaces_statistics({name: interfaces_statistics[name].get_statistics(
+                bandwidth_refresh_rate) for name in names})
+        bandwidth_rollups.add_total(new_time, new_value)
 
         if saving_bandwidth_file:
-            bandwidth_file.write(f"{datetime.fromtimestamp(new_time) if saving_as_datetime else new_time},"
-                                 f"{round(new_value)}\n")
-            bandwidth_file.flush()
+            bandwidth_file.append(new_time, new_value)
+        if database:
+            bandwidth_database.append(new_time, new_value)
         if save_real_time:
-            stats = get_bandwidth_stats(bandwidth, bandwidth_refresh_rate)
+            stats = bandwidth_statistics.get_statistics(bandwidth_refresh_rate)
+            stats.set_scheduling(scheduler)
             client.update_bandwidth_statistics(stats)
 
-        await asyncio.sleep(bandwidth_refresh_rate)
-
 
 def kbits_to_str(kbits: float) -> str:
     if kbits < 1024:
@@ -258,41 +481,179 @@ def duration_to_str(duration: float) -> str:
     elif duration < 3600:
         return f"{duration//60:02.0f}m{duration % 60:02.0f}"
     else:
-        return f"{duration//3600}h{(duration % 3600) //60:02.0f}m{duration % 60:02.0f}s"
-
+        return f"{duration//3600:.0f}h{(duration % 3600) //60:02.0f}m{duration % 60:02.0f}s"
 
-def read_internet_file(client: Client, read_internet_file: str, save_real_time: bool, delay_internet: int):
-    global internet
 
-    pings = internet if save_real_time else []
-
-    f = open(read_internet_file, "r")
-    for timestamp, ping in [[int(i) for i in line.split(",")] for line in f.readlines()]:
-        pings += [(timestamp, ping)]
-        stats = get_disconnection_stats(pings, delay_internet)
-        # TODO: it shouldn't be the default delay, we could update an average through the reading to get an approximate
-        client.update_internet_statistics(stats)
+def window_to_str(duration: float) -> str:
+    """
+    :return: a short name for a window of time, in the largest unit dividing its duration (e.g. 15m or 1h)
+    """
+    if duration >= 3600 and duration % 3600 == 0:
+        return f"{duration // 3600:.0f}h"
+    if duration >= 60 and duration % 60 == 0:
+        return f"{duration // 60:.0f}m"
+    return f"{duration:.0f}s"
 
-    if save_real_time:
-        pings.sort()# just to make sure we don't mess with incoming data
-    f.close()
 
+class ReplayUpdatePolicy:
+    """
+    Decides when the client should be updated while replaying a file, so that a big file doesn't trigger one
+    update of the display per line read. By default the client is only updated once, at the end of the file.
+    """
 
-def read_bandwidth_file(client: Client, read_bandwidth_file: str, save_real_time: bool, delay_bandwidth: int):
-    global bandwidth
+    def __init__(self, every_rows: int = 0, every_seconds: float = 0):
+        """
+        :param every_rows: if positive, the client is also updated every time this number of rows has been read
+        :param every_seconds: if positive, the client is also updated every time this duration (in seconds) has
+            passed since the last update
+        """
+        self.every_rows = every_rows
+        self.every_seconds = every_seconds
+        self.start = time.perf_counter()
+        self.last_update = self.start
+        self.first_update: Optional[float] = None
+        self.rows_since_update = 0
+
+    def row_read(self) -> bool:
+        """
+        Registers that a new row has been read
+
+        :return: True if the client should be updated now
+        """
+        self.rows_since_update += 1
+        if 0 < self.every_rows <= self.rows_since_update:
+            return True
+        # we don't want to call perf_counter for every row, so we only check the time every 1000 rows
+        return self.every_seconds > 0 and self.rows_since_update % 1000 == 0 \
+            and time.perf_counter() - self.last_update >= self.every_seconds
+
+    def updated(self):
+        """
+        Registers that the client has just been updated
+        """
+        self.last_update = time.perf_counter()
+        self.rows_since_update = 0
+        if self.first_update is None:
+            self.first_update = self.last_update
+
+    def time_to_first_display(self) -> float:
+        """
+        :return: the time in seconds between the start of the replay and the first update of the client
+        """
+        return (self.first_update if self.first_update is not None else time.perf_counter()) - self.start
+
+
+def read_samples(path: str, magic: bytes, start: Optional[float], end: Optional[float],
+                 on_invalid_row: Optional[Callable[[str, int, str], None]] = None) \
+        -> Iterator[Tuple[float, Union[int, float]]]:
+    """
+    :param path: a saving file, read with its segments, or a database saved with --database
+    :param magic: the kind of history to read (INTERNET_MAGIC or BANDWIDTH_MAGIC)
+    :return: the samples of the history between start and end (None for no limit), in chronological order
+    """
+    if is_database(path):
+        return read_database(path, magic, start, end)
+    # the pings are kept as integers, a ping with decimals in a csv file edited by another program is rounded
+    return read_history_range(path, start, end, on_invalid_row, round_values=magic == INTERNET_MAGIC)
 
-    usage = bandwidth if save_real_time else []
 
-    f = open(read_bandwidth_file, "r")
-    for timestamp, use in [[int(i) for i in line.split(",")] for line in f.readlines()]:
-        usage += [(timestamp, use)]
-        stats = get_bandwidth_stats(usage, delay_bandwidth)
-        # TODO: it shouldn't be the default delay, we could update an average by reading the file to get an approximate
-        client.update_bandwidth_statistics(stats)
+def read_internet_file(client: Client, read_internet_file: str, save_real_time: bool, delay_internet: int,
+                       policy: Optional[ReplayUpdatePolicy] = None, start: Optional[float] = None,
+                       end: Optional[float] = None):
+    """
+    Reads a file previously saved with the --internet-file option (in csv or binary format) or a database saved
+    with --database in one pass, and updates the client with the statistics of the whole file once it's read (or more
+    often depending on the update policy). The segments of a rotated file are read too, only the ones overlapping
+    the time range, and a database is read with a single query on the time range.
+
+    :param client: the client to update with the statistics of the file
+    :param read_internet_file: the path of the file to read
+    :param save_real_time: if True the data read is added to the real time history
+    :param delay_internet: the expected delay between two checks
+    :param policy: decides how often the client is updated during the reading
+    :param start: the time from which the samples are read, None to start from the beginning
+    :param end: the time until which the samples are read, None to read until the end
+    """
+    policy = policy if policy else ReplayUpdatePolicy()
+    accumulator = internet_statistics if save_real_time else ConnectionStatisticsAccumulator(statistics_windows)
+    history = internet if save_real_time else TimeSeriesRingBuffer("i", max_size=internet.max_size or READ_HISTORY_SIZE,
+                                                                    max_age=internet.max_age)
+    rollups = internet_rollups if save_real_time else PingRollups(history)
+    if not is_database(read_internet_file):
+        # the summaries saved next to the file are used instead of summarizing its samples again
+        rollups.load_next_to(read_internet_file, start, end)
+
+    nb_rows = 0
+    invalid_rows = InvalidRowsCounter()
+    for timestamp, ping in read_samples(read_internet_file, INTERNET_MAGIC, start, end, invalid_rows):
+        history.append((timestamp, ping))
+        accumulator.add(timestamp, ping)
+        rollups.add(timestamp, ping)
+        nb_rows += 1
+        if policy.row_read():
+            client.update_internet_statistics(accumulator.get_statistics())
+            policy.updated()
+
+    if nb_rows > 0 and policy.rows_since_update > 0:
+        client.update_internet_statistics(accumulator.get_statistics())
+        policy.updated()
+    rollups.finish_loading()
+    if nb_rows > 0:
+        start, end = rollups.time_range()
+        client.update_internet_history(rollups.get_points(start, end, (end - start) / HISTORY_POINTS))
+    client.update_file_loaded(read_internet_file, nb_rows, policy.time_to_first_display(), invalid_rows.count)
+
+
+def read_bandwidth_file(client: Client, read_bandwidth_file: str, save_real_time: bool, delay_bandwidth: int,
+                        policy: Optional[ReplayUpdatePolicy] = None, start: Optional[float] = None,
+                        end: Optional[float] = None):
+    """
+    Reads a file previously saved with the --bandwidth-file option (in csv or binary format) or a database saved
+    with --database in one pass, and updates the client with the statistics of the whole file once it's read (or more
+    often depending on the update policy). When the total use decreases in the file (the file was reused after a
+    restart), the following samples are shifted so that the total keeps going up. The segments of a rotated file
+    are read too, only the ones overlapping the time range, and a database is read with a single query on the time
+    range.
+
+    :param client: the client to update with the statistics of the file
+    :param read_bandwidth_file: the path of the file to read
+    :param save_real_time: if True the data read is added to the real time history
+    :param delay_bandwidth: the expected delay between two checks
+    :param policy: decides how often the client is updated during the reading
+    :param start: the time from which the samples are read, None to start from the beginning
+    :param end: the time until which the samples are read, None to read until the end
+    """
+    policy = policy if policy else ReplayUpdatePolicy()
+    accumulator = bandwidth_statistics if save_real_time else BandwidthStatisticsAccumulator(statistics_windows)
+    history = bandwidth if save_real_time else TimeSeriesRingBuffer("d",
+                                                                    max_size=bandwidth.max_size or READ_HISTORY_SIZE,
+                                                                    max_age=bandwidth.max_age)
+    rollups = bandwidth_rollups if save_real_time else BandwidthRollups(history)
+    if not is_database(read_bandwidth_file):
+        # the summaries saved next to the file are used instead of summarizing its samples again
+        rollups.load_next_to(read_bandwidth_file, start, end)
+
+    nb_rows = 0
+    invalid_rows = InvalidRowsCounter()
+    # the file may contain several runs of the program, each one starting again from 0
+    for timestamp, use in stitch_resets(read_samples(read_bandwidth_file, BANDWIDTH_MAGIC, start, end, invalid_rows)):
+        history.append((timestamp, use))
+        accumulator.add(timestamp, use)
+        rollups.add_total(timestamp, use)
+        nb_rows += 1
+        if policy.row_read():
+            client.update_bandwidth_statistics(accumulator.get_statistics(delay_bandwidth))
+            policy.updated()
+
+    if nb_rows > 0 and policy.rows_since_update > 0:
+        client.update_bandwidth_statistics(accumulator.get_statistics(delay_bandwidth))
+        policy.updated()
+    rollups.finish_loading()
+    if nb_rows > 0:
+        start, end = rollups.time_range()
+        client.update_bandwidth_history(rollups.get_points(start, end, (end - start) / HISTORY_POINTS))
+    client.update_file_loaded(read_bandwidth_file, nb_rows, policy.time_to_first_display(), invalid_rows.count)
 
-    if save_real_time:
-        usage.sort() # just to make sure we don't mess with incoming data
-    f.close()
 
 def main_loop(client: Client, args: argparse.Namespace, loop: AbstractEventLoop):
     """
@@ -305,18 +666,45 @@ def main_loop(client: Client, args: argparse.Namespace, loop: AbstractEventLoop)
         the arguments passed to the program
     """
     asyncio.set_event_loop(loop)
+    configure_history(args.history_size, args.history_age)
+    configure_windows(args.statistics_windows)
+    rotate_period = "hour" if args.rotate_hourly else "day" if args.rotate_daily else None
+    configure_saving(args.commit_records, args.commit_interval, int(args.rotate_size * 1024 * 1024), rotate_period,
+                     args.compress_segments)
     if args.read_internet_file:
-        read_internet_file(client, args.read_internet_file, args.internet_real_time, args.delay_internet)
+        read_internet_file(client, args.read_internet_file, args.internet_real_time, args.delay_internet,
+                           ReplayUpdatePolicy(args.replay_update_rows, args.replay_update_interval),
+                           args.time_from, args.time_to)
     if args.read_bandwidth_file:
-        read_bandwidth_file(client, args.read_bandwidth_file, args.bandwidth_real_time, args.delay_bandwidth)
+        read_bandwidth_file(client, args.read_bandwidth_file, args.bandwidth_real_time, args.delay_bandwidth,
+                            ReplayUpdatePolicy(args.replay_update_rows, args.replay_update_interval),
+                            args.time_from, args.time_to)
+    database = HistoryDatabase(args.database) if args.database else None
     if args.internet_real_time or args.internet_file:
-        loop.create_task(check_internet_loop(client, args.host, args.port, args.timeout, args.internet_real_time,
-                                             args.delay_internet, args.internet_file, args.datetime))
+        targets = parse_targets(args.targets, args.port) if args.targets else [(args.host, args.port)]
+        loop.create_task(check_internet_loop(client, targets, args.timeout, args.internet_real_time,
+                                             args.delay_internet, args.internet_file, args.datetime,
+                                             args.file_format, args.quorum, args.max_concurrent_probes, database))
     if args.bandwidth_real_time or args.bandwidth_file:
-        initial_bandwidth_use = get_total_kbits_use_since_boot()
+        initial_interfaces_use = get_interfaces_kbits_use(args.interfaces)
         loop.create_task(check_bandwidth_usage(client, args.delay_bandwidth, args.bandwidth_real_time,
-                                               args.bandwidth_file, args.datetime, initial_bandwidth_use))
-    loop.run_forever()
+                                               args.bandwidth_file, args.datetime, initial_interfaces_use,
+                                               args.file_format, args.interfaces, database))
+    # kill and systemctl stop send SIGTERM, which would end the program without writing the samples waiting in
+    # memory: the loop is stopped instead so they're written below
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signal_number, loop.stop)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # not available on Windows, nor outside of the main thread (the client then handles the signals)
+            pass
+    try:
+        loop.run_forever()
+    finally:
+        # the samples not committed yet are written and the files synced on the disk before leaving
+        close_all_writers()
+        if database:
+            database.close()
 
 
 def init_arguments() -> argparse.Namespace:
@@ -330,13 +718,23 @@ def init_arguments() -> argparse.Namespace:
     # parameters for internet checking
     parser.add_argument("--host", default="8.8.8.8", help="The host to connect to when checking the internet "
                                                           "connection.")
-    parser.add_argument("-p", "--port", default=53, type=float,
+    parser.add_argument("-p", "--port", default=53, type=int,
                         help="The port of the host to connect to when checking the internet connection")
+    parser.add_argument("--targets", nargs="+", required=False,
+                        help="A list of targets to check concurrently instead of the single host, written as "
+                             "host:port (or just host to use the port option), or files containing one target per "
+                             "line. Statistics are computed for each target, and internet is considered working "
+                             "if at least quorum targets answered.")
+    parser.add_argument("--quorum", default=1, type=int,
+                        help="The number of targets that must answer to consider that internet is working.")
+    parser.add_argument("--max-concurrent-probes", default=16, type=int,
+                        help="The maximum number of targets checked at the same time.")
     parser.add_argument("-t", "--timeout", default=3, type=float, help="The time in seconds to timeout when checking "
                                                                        "the internet connection")
     parser.add_argument("-di", "--delay-internet", default=10, type=float,
-                        help="The preferred time in between two checks of the internet connection. This time won't "
-                             "necessarily be met, it depends on your computer load level")
+                        help="The time in between two checks of the internet connection. The checks are done at "
+                             "fixed intervals, if a check takes longer than this delay the next ones are skipped and "
+                             "counted as missed")
     parser.add_argument("-irt", "--internet-real-time", action="store_true", help="Use this option to get real time "
                                                                                   "overview of your network "
                                                                                   "connections and disconnections "
@@ -346,23 +744,81 @@ def init_arguments() -> argparse.Namespace:
 
     # Parameters for bandwidth checks
     parser.add_argument("-db", "--delay-bandwidth", default=10, type=float,
-                        help="The preferred time in between two checks of the real bandwidth consumption. This time "
-                             "won't necessarily be met, it depends on your computer load level")
+                        help="The time in between two checks of the real bandwidth consumption. The checks are done "
+                             "at fixed intervals, if a check takes longer than this delay the next ones are skipped "
+                             "and counted as missed")
     parser.add_argument("-brt", "--bandwidth-real-time", action="store_true", help="Use this option to get real time "
                                                                                    "overview of your network bandwidth "
                                                                                    "usage.")
+    parser.add_argument("--interfaces", nargs="+", required=False,
+                        help="The network interfaces whose use is monitored (for example eth0 wlan0), to leave out "
+                             "the loopback or virtual interfaces. The upload and download of each interface are also "
+                             "displayed separately. By default every interface is monitored.")
     parser.add_argument("-bf", "--bandwidth-file", type=str, required=False, help="Use this option to save the "
                                                                                   "bandwidth use data into a file.")
 
     # general options
     parser.add_argument("--datetime", action="store_true", help="Use to save the time in files in the format "
                                                                 "of a datetime instead of the default timestamp.")
+    parser.add_argument("--file-format", default="csv", choices=FILE_FORMATS,
+                        help="The format of the internet and bandwidth files. The binary format is more compact and "
+                             "much faster to read back, use main_convert.py to convert files between formats. The "
+                             "--datetime option has no effect on binary files.")
+
+    parser.add_argument("--database", type=str, required=False,
+                        help="Also save the internet and bandwidth data checked (with -irt, -if, -brt or -bf), and "
+                             "the disconnection periods, into this SQLite database. The database can be read like a "
+                             "file with -rif and -rbf.")
+
+    parser.add_argument("--commit-records", default=100, type=int,
+                        help="The samples are written to the files in groups to limit the writes to the disk, a "
+                             "group is written as soon as this number of samples is waiting. Use 1 to write every "
+                             "sample right away.")
+    parser.add_argument("--commit-interval", default=60, type=float,
+                        help="The maximum time in seconds a sample waits before being written to its file, which is "
+                             "the maximum duration of data lost if the program is killed. 0 for no limit.")
+    parser.add_argument("--rotate-size", default=0, type=float,
+                        help="The size in MB above which a saving file is renamed with a date suffix and a new file "
+                             "is started. By default the files are never rotated.")
+    parser.add_argument("--rotate-daily", action="store_true",
+                        help="Start a new saving file every day, the file of the previous day is renamed with its "
+                             "date as suffix.")
+    parser.add_argument("--rotate-hourly", action="store_true",
+                        help="Start a new saving file every hour, the file of the previous hour is renamed with its "
+                             "date and hour as suffix.")
+    parser.add_argument("--compress-segments", action="store_true",
+                        help="Compress the rotated files with gzip. They are still read when reading the saving "
+                             "file.")
+
+    parser.add_argument("--history-size", default=0, type=int,
+                        help="The maximum number of samples kept in memory for each history. Older samples are "
+                             "dropped but still counted in the statistics. By default everything is kept.")
+    parser.add_argument("--history-age", default=0, type=float,
+                        help="The maximum age in seconds of the samples kept in memory. Older samples are dropped "
+                             "but still counted in the statistics. By default everything is kept.")
+
+    parser.add_argument("--statistics-windows", nargs="+", default=DEFAULT_WINDOWS, type=float,
+                        help="The durations in seconds of the sliding windows over which the peak, percentiles and "
+                             "moving average of the recent values are computed. By default the last minute, 15 "
+                             "minutes and hour.")
 
     # file reading
     parser.add_argument("-rif", "--read-internet-file", type=str, required=False, help="Use this option to read a "
                                                                                        "previously saved internet file.")
     parser.add_argument("-rbf", "--read-bandwidth-file", type=str, required=False, help="Use this option to read a "
                                                                                         "previously saved bandwidth file.")
+    parser.add_argument("--from", dest="time_from", type=parse_time, required=False,
+                        help="When reading a file, only read the samples from this time, given as a timestamp or a "
+                             "datetime (for example 2024-05-14 or \"2024-05-14 08:00\"). Only the rotated files "
+                             "overlapping the time range are opened.")
+    parser.add_argument("--to", dest="time_to", type=parse_time, required=False,
+                        help="When reading a file, only read the samples until this time, given like --from.")
+    parser.add_argument("--replay-update-rows", default=0, type=int,
+                        help="When reading a file, also update the display every time this number of rows has been "
+                             "read. By default the display is only updated once the whole file is read.")
+    parser.add_argument("--replay-update-interval", default=0, type=float,
+                        help="When reading a file, also update the display every time this number of seconds has "
+                             "passed. By default the display is only updated once the whole file is read.")
 
     return parser.parse_args()
 
@@ -0,0 +1,122 @@
+import math
+from array import array
+from typing import Iterable, Tuple, Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from connection_statistics import ConnectionStatistics
+from streaming_stats import LatencyStatistics, LogHistogram
+
+# NumPy versions of the computations of the statistics of a whole history, for the offline analysis of big files.
+# Each function gives the same results as its pure python equivalent (get_next_disconnected_period,
+# get_disconnection_stats, the lifetime latency of ConnectionStatisticsAccumulator), numpy is optional and the callers
+# must check it's available before using them.
+
+
+def history_to_arrays(samples: Iterable[Tuple[float, Union[int, float]]]) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+    """
+    :param samples: the (timestamp, ping) pairs of a history
+    :return: the timestamps and the pings of the history as two numpy arrays of floats, the pings of csv files may
+        have decimals
+    """
+    timestamps = array("d")
+    pings = array("d")
+    for timestamp, ping in samples:
+        timestamps.append(timestamp)
+        pings.append(ping)
+    return numpy.frombuffer(timestamps, dtype=numpy.float64), numpy.frombuffer(pings, dtype=numpy.float64)
+
+
+def find_disconnected_periods(pings: "numpy.ndarray") -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+    """
+    :param pings: the pings of a history, negative when the check failed
+    :return: the indices of the starts of the disconnection periods, and the indices of their ends (the first
+        successful check after them, or the length of the history), like get_next_disconnected_period returns them
+    """
+    failed = numpy.zeros(len(pings) + 2, dtype=numpy.int8)
+    failed[1:-1] = pings < 0
+    changes = numpy.diff(failed)
+    return numpy.flatnonzero(changes == 1), numpy.flatnonzero(changes == -1)
+
+
+def get_latency_statistics_array(pings: "numpy.ndarray") -> LatencyStatistics:
+    """
+    :return: the latency statistics of all the pings, with the same buckets as the LogHistogram of the accumulators
+        (the pings of 0ms are successful and put in its zero bucket)
+    """
+    successful = pings[pings >= 0]
+    nb_lost = len(pings) - len(successful)
+    loss_ratio = nb_lost / len(pings) if len(pings) else 0
+    if len(successful) == 0:
+        return LatencyStatistics(None, len(pings), -1, -1, -1, 0, loss_ratio)
+
+    histogram = LogHistogram()
+    # the zero bucket comes before every other bucket
+    indexes = numpy.full(len(successful), -numpy.inf)
+    positive = successful > 0
+    indexes[positive] = numpy.ceil(numpy.log(successful[positive]) / histogram.log_gamma)
+    ranks = [math.floor(q * (len(successful) - 1)) for q in [0.5, 0.95, 0.99]]
+    indexes = numpy.partition(indexes, ranks)
+    p50, p95, p99 = [2 * histogram.gamma ** indexes[rank].item() / (histogram.gamma + 1)
+                     if indexes[rank] > -numpy.inf else 0 for rank in ranks]
+    jitter = numpy.abs(numpy.diff(successful)).mean().item() if len(successful) > 1 else 0
+    return LatencyStatistics(None, len(pings), p50, p95, p99, jitter, loss_ratio)
+
+
+def get_disconnection_stats_array(timestamps: "numpy.ndarray", pings: "numpy.ndarray") -> ConnectionStatistics:
+    """
+    Computes the same statistics as get_disconnection_stats in bulk on the columns of a history
+
+    :param timestamps: the timestamps of the checks, in chronological order
+    :param pings: the pings of the checks, negative when the check failed
+    :return: the statistics of the history, including its latency statistics
+    """
+    nb_samples = len(pings)
+    starts, ends = find_disconnected_periods(pings)
+    nb_disconnection = len(starts)
+    longest_time = 0
+    start_time_longest_disconnection = 0
+    average_time: float = 0
+    if nb_disconnection > 0:
+        # the last period may not be over, its duration is then estimated with the last check
+        durations = timestamps[numpy.minimum(ends, nb_samples - 1)] - timestamps[starts]
+        longest = int(numpy.argmax(durations))
+        if durations[longest] > 0:
+            longest_time = durations[longest].item()
+            start_time_longest_disconnection = timestamps[starts[longest]].item()
+        average_time = durations.mean().item()
+
+    average_disconnection_per_hour: float = 0
+    total_history_duration = (timestamps[-1] - timestamps[0]).item() / 3600
+    if total_history_duration > 0:
+        average_disconnection_per_hour = nb_disconnection / total_history_duration
+
+    successful = pings[pings > 0]
+    if len(successful):
+        min_ping = successful.min().item()
+        max_ping = successful.max().item()
+        average_ping = successful.mean().item()
+    else:
+        min_ping = max_ping = -1
+        average_ping = 0
+
+    # the state only changes on a ping of the opposite sign (pings of 0 don't change it), and starts at the opposite
+    # of the first ping so the first check always changes it, the latest duration is counted from the last change
+    not_zero = numpy.flatnonzero(pings != 0)
+    connected = pings[not_zero] > 0
+    previous_connected = numpy.empty_like(connected)
+    previous_connected[1:] = connected[:-1]
+    if len(connected):
+        previous_connected[0] = pings[0] < 0
+    changes = not_zero[connected != previous_connected]
+    # without any change the duration is counted from 0, like get_disconnection_stats does
+    latest_duration = timestamps[-1].item() - (timestamps[changes[-1]].item() if len(changes) else 0)
+
+    stats = ConnectionStatistics(pings[-1].item(), timestamps[-1].item(), int(latest_duration), longest_time,
+                                 start_time_longest_disconnection, average_time, nb_disconnection,
+                                 average_disconnection_per_hour, min_ping, max_ping, average_ping)
+    stats.latency = get_latency_statistics_array(pings)
+    return stats